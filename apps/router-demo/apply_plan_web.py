@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
+import argparse
 import json
 import hashlib
+import sys
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+import lib_genindex  # noqa: E402
+import lib_run  # noqa: E402
+
 ROOT = Path(__file__).resolve().parents[2]
-LATEST = ROOT / "artifacts" / "runs" / "LATEST"
 GENERATED = ROOT / "apps" / "generated"
 
 TEMPLATE = """import Link from "next/link";
@@ -138,11 +143,14 @@ def write_page(gen_dir: Path, app_title: str, tagline: str, nav_json: str, page_
     return out
 
 def main() -> int:
-    if not LATEST.exists():
-        print("[apply_plan_web] Missing artifacts/runs/LATEST")
-        return 2
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--run-dir", default="", help="default: $RUN_DIR, else artifacts/runs/LATEST")
+    args = ap.parse_args()
 
-    run_dir = Path(LATEST.read_text(encoding="utf-8").strip())
+    run_dir = lib_run.resolve_run(args.run_dir)
+    if run_dir is None:
+        print("[apply_plan_web] no run: pass --run-dir, set RUN_DIR or create artifacts/runs/LATEST")
+        return 2
     plan_path = run_dir / "plan.web.json"
     if not plan_path.exists():
         print(f"[apply_plan_web] Missing {plan_path}")
@@ -163,7 +171,8 @@ def main() -> int:
         return 2
 
     plan_hash = canonical_hash(plan)
-    gen_dir = GENERATED / f"{name}__{plan_hash}"
+    # scaffold_web.py --update writes into the existing <name>__<oldhash> dir: the index knows which
+    gen_dir = lib_genindex.by_run(run_dir) or GENERATED / f"{name}__{plan_hash}"
     if not gen_dir.exists():
         print(f"[apply_plan_web] gen_dir not found: {gen_dir}")
         return 2
@@ -1,41 +1,24 @@
 #!/usr/bin/env python3
-import argparse, json, os, sys, time, uuid, re
+import argparse, json, os, sys, time
 from pathlib import Path
 from urllib import request as urlreq
 from urllib.error import HTTPError, URLError
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+import lib_blob  # noqa: E402
+import lib_jsonmode  # noqa: E402
+import lib_jsonscan  # noqa: E402
+import lib_repair  # noqa: E402
+import lib_run  # noqa: E402
+import lib_schema  # noqa: E402
+import lib_trace  # noqa: E402
+
 ROOT = Path("/home/suxiaocong/ai-platform")
 RUNS_DIR = ROOT / "artifacts" / "runs"
 ENV_PATH = ROOT / ".env"
 
-SCHEMA_PATH = ROOT / "apps" / "router-demo" / "schemas" / "plan.schema.json"
-NAME_RE = re.compile(r"^[a-z][a-z0-9_-]{2,40}$")
-
-def validate_schema_file() -> None:
-    # Lightweight sanity check (no jsonschema dependency)
-    if not SCHEMA_PATH.exists():
-        raise SystemExit(f"[fail] missing schema file: {SCHEMA_PATH}")
-    import json as _json
-    obj = _json.loads(SCHEMA_PATH.read_text(encoding="utf-8"))
-    if not isinstance(obj, dict):
-        raise SystemExit("[fail] schema must be a JSON object")
-
-    req = obj.get("required", [])
-    if not isinstance(req, list) or not set(["schema_version","name","type","description","files","run"]).issubset(set(req)):
-        raise SystemExit("[fail] schema.required missing keys")
-
-    props = obj.get("properties", {})
-    if not isinstance(props, dict):
-        raise SystemExit("[fail] schema.properties missing")
-
-    sv = (props.get("schema_version") or {})
-    if not isinstance(sv, dict) or sv.get("const") != 1:
-        raise SystemExit("[fail] schema_version must have const=1")
-
-    # Optional: keep schema aligned with plan.py expectations
-    if props.get("type", {}).get("enum") != ["python-cli"]:
-        raise SystemExit("[fail] schema type enum must be ['python-cli']")
-
+# the schema ships with this script; compiled once per process by lib_schema
+SCHEMA_PATH = Path(__file__).resolve().parent / "schemas" / "plan.schema.json"
 
 def load_master_key() -> str:
     mk = os.environ.get("LITELLM_MASTER_KEY", "").strip()
@@ -60,138 +43,72 @@ def http_post_json(url: str, headers: dict, payload: dict, timeout: int = 120):
         raw = resp.read().decode("utf-8", errors="replace")
         return resp.status, json.loads(raw), raw
 
+class EarlyAbort(ValueError):
+    """The streamed plan already broke the schema; the rest of the completion was never read."""
+
+
+# provider fields kept from the chunks of a streamed completion (cost / token accounting, debugging)
+STREAM_INFO_KEYS = ("id", "model", "created", "system_fingerprint", "usage")
+
+def http_stream_chat(url: str, headers: dict, payload: dict, on_delta, timeout: int = 120):
+    """
+    POST with "stream": true and hand each choices[0].delta.content to on_delta as
+    the SSE events arrive. on_delta returning True stops reading: leaving the
+    with-block closes the connection, which cancels the completion upstream.
+    A plain JSON reply (streaming unsupported) is handed over whole.
+    Returns (status, content, stopped_early, info): info keeps what the provider
+    said besides the text (id, model, created, finish_reason and the usage of the
+    final chunk that stream_options.include_usage asks for; absent when stopped early).
+    """
+    body = json.dumps({**payload, "stream": True, "stream_options": {"include_usage": True}}).encode("utf-8")
+    req = urlreq.Request(url, data=body, headers={**headers, "Content-Type": "application/json"}, method="POST")
+    parts = []
+    info = {}
+    with urlreq.urlopen(req, timeout=timeout) as resp:
+        status = resp.status
+        if "text/event-stream" not in (resp.headers.get("Content-Type") or ""):
+            data = json.loads(resp.read().decode("utf-8", errors="replace"))
+            try:
+                content = data["choices"][0]["message"]["content"]
+            except Exception:
+                raise ValueError("unexpected response format (missing choices[0].message.content)")
+            info = {k: data[k] for k in STREAM_INFO_KEYS if data.get(k) is not None}
+            info["finish_reason"] = data["choices"][0].get("finish_reason")
+            return status, content, bool(on_delta(content)), info
+        for line in resp:
+            line = line.decode("utf-8", errors="replace").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+                info.update({k: chunk[k] for k in STREAM_INFO_KEYS if chunk.get(k) is not None})
+                choice = (chunk.get("choices") or [{}])[0]
+                if choice.get("finish_reason"):
+                    info["finish_reason"] = choice["finish_reason"]
+                delta = (choice.get("delta") or {}).get("content")
+            except (ValueError, AttributeError, IndexError):
+                continue
+            if delta:
+                parts.append(delta)
+                if on_delta(delta):
+                    return status, "".join(parts), True, info
+    return status, "".join(parts), False, info
+
 def extract_json_object(text: str) -> dict:
     """
-    Best-effort extraction:
-    1) direct json.loads
-    2) ```json ... ```
-    3) first '{' .. last '}' slice
+    First complete top-level JSON object in the reply (bare, fenced or
+    wrapped in prose), found in one string-aware pass; see lib_jsonscan.
     """
-    t = (text or "").strip()
-    # 1) direct
-    try:
-        obj = json.loads(t)
-        if isinstance(obj, dict):
-            return obj
-    except Exception:
-        pass
-
-    # 2) fenced
-    m = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", t, flags=re.S | re.I)
-    if m:
-        cand = m.group(1).strip()
-        obj = json.loads(cand)
-        if isinstance(obj, dict):
-            return obj
-
-    # 3) slice
-    i = t.find("{")
-    j = t.rfind("}")
-    if i != -1 and j != -1 and j > i:
-        cand = t[i : j + 1]
-        obj = json.loads(cand)
-        if isinstance(obj, dict):
-            return obj
-
-    raise ValueError("no JSON object found")
-
-def validate_rel_path(p: str):
-    if not isinstance(p, str):
-        raise ValueError("files[].path must be string")
-    p = p.strip()
-    if not p:
-        raise ValueError("files[].path empty")
-    if len(p) > 200:
-        raise ValueError("files[].path too long (>200)")
-    if p.startswith(("/", "\\", "~")):
-        raise ValueError("files[].path must be relative (no leading /, \\, ~)")
-    if re.match(r"^[A-Za-z]:", p):
-        raise ValueError("files[].path must not be windows drive path")
-    # block traversal
-    parts = Path(p).parts
-    if any(seg in ("..",) for seg in parts):
-        raise ValueError("files[].path must not contain '..'")
-    # normalize to forward slashes in output expectation (optional)
-    # allow subfolders, but no weird control chars
-    if any(ord(ch) < 32 for ch in p):
-        raise ValueError("files[].path has control chars")
+    return lib_jsonscan.extract_object(text)
 
 def validate_plan(plan: dict):
-    if not isinstance(plan, dict):
-        raise ValueError("plan must be a JSON object")
-
-    allowed_top = {"schema_version", "name", "type", "description", "files", "run"}
-    extra = set(plan.keys()) - allowed_top
-    if extra:
-        raise ValueError(f"extra top-level keys not allowed: {sorted(extra)}")
-
-    sv = plan.get("schema_version")
-    if sv != 1:
-        raise ValueError("schema_version must be 1")
-
-    name = plan.get("name")
-    if not isinstance(name, str) or not NAME_RE.match(name):
-        raise ValueError("name invalid (must match ^[a-z][a-z0-9_-]{2,40}$)")
-
-    typ = plan.get("type")
-    if typ != "python-cli":
-        raise ValueError("type must be 'python-cli'")
-
-    desc = plan.get("description")
-    if not isinstance(desc, str) or not (1 <= len(desc) <= 280):
-        raise ValueError("description must be 1..280 chars")
-
-    files = plan.get("files")
-    if not isinstance(files, list) or len(files) < 2:
-        raise ValueError("files must be an array with >=2 items")
-
-    saw_pyproject = False
-    saw_src = False
-
-    for i, f in enumerate(files):
-        if not isinstance(f, dict):
-            raise ValueError(f"files[{i}] must be object")
-        allowed_file = {"path", "content"}
-        extra_f = set(f.keys()) - allowed_file
-        if extra_f:
-            raise ValueError(f"files[{i}] extra keys not allowed: {sorted(extra_f)}")
-
-        path = f.get("path")
-        content = f.get("content")
-
-        validate_rel_path(path)
-
-        if not isinstance(content, str) or not content.strip():
-            raise ValueError(f"files[{i}].content empty")
-        if len(content) > 20000:
-            raise ValueError(f"files[{i}].content too long (>20000)")
-
-        if path == "pyproject.toml":
-            saw_pyproject = True
-        if path.startswith("src/"):
-            saw_src = True
-
-    if not (saw_pyproject and saw_src):
-        raise ValueError("files must include pyproject.toml and at least one src/... file")
-
-    run = plan.get("run")
-    if not isinstance(run, dict):
-        raise ValueError("run must be object")
-    extra_run = set(run.keys()) - {"commands"}
-    if extra_run:
-        raise ValueError(f"run extra keys not allowed: {sorted(extra_run)}")
-
-    cmds = run.get("commands")
-    if not isinstance(cmds, list) or len(cmds) < 1:
-        raise ValueError("run.commands must be a non-empty array")
-    if len(cmds) > 20:
-        raise ValueError("run.commands too many (>20)")
-
-    for k, c in enumerate(cmds):
-        if not isinstance(c, str) or not c.strip():
-            raise ValueError(f"run.commands[{k}] empty")
-        if len(c) > 300:
-            raise ValueError(f"run.commands[{k}] too long (>300)")
+    """All schema violations at once (JSON paths), from the compiled plan.schema.json validator."""
+    errs = lib_schema.load_validator(SCHEMA_PATH)(plan)
+    if errs:
+        raise ValueError("; ".join(errs))
 
 def build_system_prompt() -> str:
     return (
@@ -213,7 +130,10 @@ def build_system_prompt() -> str:
     )
 
 def main():
-    validate_schema_file()
+    try:
+        lib_schema.load_validator(SCHEMA_PATH)  # compile once; fail fast on a missing / unsupported schema
+    except lib_schema.SchemaError as e:
+        raise SystemExit(f"[fail] {e}")
     ap = argparse.ArgumentParser()
     ap.add_argument("--api-base", default="http://127.0.0.1:4000")
     ap.add_argument("--model", default="default-chat")
@@ -222,7 +142,16 @@ def main():
     ap.add_argument("--timeout", type=int, default=120)
     ap.add_argument("--retries", type=int, default=3)
     ap.add_argument("--sleep", type=float, default=0.6)
+    ap.add_argument("--run-dir", default=None, help="use this (pre-created) run dir instead of a new one")
+    ap.add_argument("--no-stream", action="store_true",
+                    help="wait for the whole completion instead of validating the stream (also PLAN_STREAM=0)")
+    ap.add_argument("--response-format", choices=lib_jsonmode.MODES, default="off",
+                    help="JSON mode to request (json_only policy decisions pass json_schema); "
+                         "falls back to weaker modes where the provider rejects it")
+    ap.add_argument("--no-repair", action="store_true",
+                    help="regenerate on validation errors instead of repairing the plan in place")
     args = ap.parse_args()
+    stream = not args.no_stream and os.environ.get("PLAN_STREAM", "1") != "0"
 
     if not args.text and not args.text_file:
         raise SystemExit("Provide --text or --text-file")
@@ -240,9 +169,19 @@ def main():
 
     headers = {"Authorization": f"Bearer {master}"} if master else {}
 
-    RUNS_DIR.mkdir(parents=True, exist_ok=True)
-    run_dir = RUNS_DIR / f"run_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
-    run_dir.mkdir(parents=True, exist_ok=True)
+    run = lib_run.open_run(args.run_dir, create=True) if args.run_dir else lib_run.create_run("run", RUNS_DIR)
+    run_dir = run.run_dir
+    jm = lib_jsonmode.JsonMode(args.response_format, args.model, SCHEMA_PATH, name="plan")
+    # patch requests answer {"patch": [...]}, not a plan: plain JSON mode at most
+    patch_jm = lib_jsonmode.JsonMode("off" if args.response_format == "off" else "json_object", args.model)
+
+    def ask_patch(prompt: str) -> str:
+        payload = {"model": args.model, "temperature": 0, "messages": [
+            {"role": "system", "content": lib_repair.PATCH_SYSTEM},
+            {"role": "user", "content": prompt},
+        ]}
+        _, resp_json, _ = patch_jm.call(payload, lambda p: http_post_json(url, headers, p, timeout=args.timeout))
+        return resp_json["choices"][0]["message"]["content"]
 
     # base payload
     sys_prompt = build_system_prompt()
@@ -261,34 +200,84 @@ def main():
             "temperature": 0,
         }
 
-        (run_dir / f"request_attempt_{attempt}.json").write_text(
-            json.dumps(payload, ensure_ascii=False, indent=2) + "\n",
-            encoding="utf-8"
-        )
+        # request / response bodies go to the blob store (system prompt stored once for all runs);
+        # read them back with: lib_blob.py cat RUN_DIR request_attempt_N.json
+        def sent(p: dict) -> dict:
+            # recorded as it goes out: after a JSON-mode fallback this is the weaker body jm.call re-sent
+            lib_blob.write_entry(run_dir, f"request_attempt_{attempt}.json",
+                                 json.dumps(p, ensure_ascii=False), tree=True)
+            return p
 
+        aborted = False
         try:
-            status, resp_json, raw = http_post_json(url, headers, payload, timeout=args.timeout)
+            with lib_trace.span("plan.http", run_dir=str(run_dir), model=args.model, attempt=attempt,
+                                stream=stream) as hsp:
+                try:
+                    if stream:
+                        # validate while it streams; stop at the first violation repair cannot fix
+                        iv = lib_schema.incremental(SCHEMA_PATH)
+                        hard = []
+
+                        def on_delta(d: str) -> bool:
+                            hard.extend(e for e in iv.feed(d)
+                                        if args.no_repair or not lib_repair.locally_fixable(iv.schema, e))
+                            # a complete plan reads on to the end: the final chunk carries usage
+                            return bool(hard) and not iv.done
+
+                        status, content, stopped, info = jm.call(payload, lambda p: http_stream_chat(
+                            url, headers, sent(p), on_delta, timeout=args.timeout))
+                        aborted = bool(hard) and not iv.done  # a complete plan goes to repair instead
+                        # shaped like a chat.completion, so usage / id / model read the same as unstreamed
+                        resp_json = {"id": info.get("id"), "object": "chat.completion",
+                                     "created": info.get("created"), "model": info.get("model"),
+                                     "system_fingerprint": info.get("system_fingerprint"),
+                                     "choices": [{"index": 0,
+                                                  "message": {"role": "assistant", "content": content},
+                                                  "finish_reason": info.get("finish_reason")}],
+                                     "usage": info.get("usage"),
+                                     "stream": True, "aborted": aborted, "errors": iv.errors}
+                        raw = json.dumps(resp_json, ensure_ascii=False, indent=2)
+                        hsp.set(streamed_chars=len(content), early_abort=aborted, stopped_early=stopped,
+                                usage=bool(info.get("usage")))
+                    else:
+                        status, resp_json, raw = jm.call(
+                            payload, lambda p: http_post_json(url, headers, sent(p), timeout=args.timeout))
+                except HTTPError as e:
+                    hsp.set(http_status=e.code, response_format=jm.mode)
+                    raise
+                hsp.set(http_status=status, response_bytes=len(raw), response_format=jm.mode)
             last_raw = raw
-            (run_dir / f"response_attempt_{attempt}.json").write_text(raw + "\n", encoding="utf-8")
-
-            # extract model content
-            content = ""
-            try:
-                content = resp_json["choices"][0]["message"]["content"]
-            except Exception:
-                raise ValueError("unexpected response format (missing choices[0].message.content)")
-
-            plan = extract_json_object(content)
-            validate_plan(plan)
-
-            # success -> save plan.json + LATEST
-            (run_dir / "plan.json").write_text(
-                json.dumps(plan, ensure_ascii=False, indent=2) + "\n",
-                encoding="utf-8"
-            )
+            lib_blob.write_entry(run_dir, f"response_attempt_{attempt}.json", raw, tree=True)
+            if aborted:
+                raise EarlyAbort("; ".join(hard))
+
+            with lib_trace.span("plan.validate", run_dir=str(run_dir), attempt=attempt):
+                # extract model content
+                content = ""
+                try:
+                    content = resp_json["choices"][0]["message"]["content"]
+                except Exception:
+                    raise ValueError("unexpected response format (missing choices[0].message.content)")
+
+                plan = extract_json_object(content)
+                errs = lib_schema.load_validator(SCHEMA_PATH)(plan)
+
+            if errs and not args.no_repair:
+                # near-valid: fix locally, else patch only the failing paths (no full regeneration)
+                with lib_trace.span("plan.repair", run_dir=str(run_dir), attempt=attempt) as rsp:
+                    rep = lib_repair.repair(plan, SCHEMA_PATH, ask=ask_patch)
+                    rsp.set(local_fixes=len(rep.local_fixes), patched=rep.patch is not None, ok=rep.ok)
+                run.write_json(f"repair_attempt_{attempt}.json", rep.to_dict())
+                if rep.ok:
+                    plan = rep.doc
+            validate_plan(plan)  # the original errors drive a full retry
+
+            # success -> save plan.json (atomic: a present plan.json is always complete) + LATEST
             (run_dir / "plan_raw.txt").write_text(content + "\n", encoding="utf-8")
+            run.write_json("plan.json", plan)
+            run.write_json("json_mode.json", jm.to_dict())
 
-            (RUNS_DIR / "LATEST").write_text(str(run_dir) + "\n", encoding="utf-8")
+            run.mark_latest()
 
             print(f"[ok] plan saved: {run_dir}/plan.json")
             print(str(run_dir))
@@ -312,8 +301,10 @@ def main():
             {"role": "user", "content": f"Your previous output was invalid: {last_err}. Return corrected JSON ONLY."},
         ]
 
-        time.sleep(args.sleep)
+        if not aborted:  # an early abort already knows what to fix: retry at once
+            time.sleep(args.sleep)
 
+    run.write_json("json_mode.json", jm.to_dict())
     print("[fail] could not produce valid plan.json after retries", file=sys.stderr)
     sys.exit(2)
 
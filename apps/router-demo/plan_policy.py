@@ -7,42 +7,42 @@ import time
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+import lib_events  # noqa: E402
+import lib_jsonmode  # noqa: E402
+import lib_run  # noqa: E402
+import lib_trace  # noqa: E402
+
 
 def _now_ms() -> int:
     return int(time.time() * 1000)
 
 
 def _read_latest(repo: Path) -> str:
-    p = repo / "artifacts" / "runs" / "LATEST"
-    try:
-        return p.read_text(encoding="utf-8").strip()
-    except Exception:
-        return ""
+    # informational only (trace before/after); attempts get their run dir explicitly
+    return str(lib_run.read_latest(repo / "artifacts" / "runs") or "")
 
 
 def _write_json(path: Path, obj: Any) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(json.dumps(obj, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    lib_run.write_atomic(path, json.dumps(obj, ensure_ascii=False, indent=2) + "\n")
 
 
 def _event(repo: Path, run_dir: str, *, kind: str, step: str, phase: str,
            status: str = "ok", rc: int = 0, duration_ms: Optional[int] = None,
            message: str = "", error_class: str = "", ts_ms: Optional[int] = None) -> None:
+    # in-process, buffered (was one event_append.py subprocess per event)
     try:
-        cmd = [sys.executable, str(repo / "scripts" / "event_append.py"),
-               "--step", step, "--phase", phase, "--status", status, "--rc", str(rc),
-               "--kind", kind]
-        if run_dir:
-            cmd += ["--run-dir", run_dir]
-        if duration_ms is not None:
-            cmd += ["--duration-ms", str(duration_ms)]
-        if message:
-            cmd += ["--message", message]
-        if error_class:
-            cmd += ["--error-class", error_class]
-        if ts_ms is not None:
-            cmd += ["--ts-ms", str(ts_ms)]
-        subprocess.run(cmd, check=False, capture_output=True, text=True)
+        lib_events.emit(step, phase, run_dir=run_dir, kind=kind, status=status, rc=rc,
+                        duration_ms=duration_ms, message=message, error_class=error_class,
+                        ts_ms=ts_ms)
+    except Exception:
+        pass
+
+
+def _catalog_upsert(repo: Path, run_dir: str) -> None:
+    try:
+        subprocess.run([sys.executable, str(repo / "scripts" / "run_catalog.py"), "upsert", "--run-dir", run_dir],
+                       check=False, capture_output=True, text=True)
     except Exception:
         pass
 
@@ -90,6 +90,12 @@ def _budget_per_model(max_total: int, candidates: List[str]) -> List[int]:
 
 
 def main() -> int:
+    # root span of the run's trace: decide -> attempts (-> plan.py http/validate spans)
+    with lib_trace.span("plan.policy", task="plan") as root:
+        return _main(root)
+
+
+def _main(root: "lib_trace.Span") -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--text", default="")
     ap.add_argument("--text-file", default="")
@@ -110,7 +116,9 @@ def main() -> int:
     else:
         decide_cmd += ["--text", args.text]
 
-    dec = subprocess.run(decide_cmd, capture_output=True, text=True)
+    with lib_trace.span("policy.decide") as dsp:
+        dec = subprocess.run(decide_cmd, capture_output=True, text=True)
+        dsp.set(rc=dec.returncode)
     if dec.returncode != 0:
         sys.stderr.write(dec.stderr)
         return dec.returncode
@@ -123,6 +131,8 @@ def main() -> int:
 
     retry_on_empty = bool(decision.get("retry_on_empty", False))
     retry_on_http = decision.get("retry_on_http", []) or []
+    # json_only -> response_format on the request (plan*.py falls back to prompt-only where unsupported)
+    response_format = decision.get("response_format") or ("json_object" if decision.get("json_only") else "off")
 
     candidates: List[str] = [base_model] + [m for m in fallbacks if m and m != base_model]
     candidates = candidates[:3]
@@ -150,20 +160,22 @@ def main() -> int:
             step_name = f"plan_attempt_{total_used:02d}"
             a0 = _now_ms()
 
-            # attempt start (best-effort: attach to current LATEST)
-            rd0 = _read_latest(repo)
-            _event(repo, rd0, kind="plan", step=step_name, phase="start", ts_ms=a0)
+            # each attempt gets its own run, passed down explicitly (no LATEST round-trip)
+            run = lib_run.create_run("run", repo / "artifacts" / "runs")
+            run_dir = str(run.run_dir)
+            _event(repo, run_dir, kind="plan", step=step_name, phase="start", ts_ms=a0)
 
-            cmd = [sys.executable, str(plan_py), "--api-base", args.api_base, "--model", model]
+            cmd = [sys.executable, str(plan_py), "--api-base", args.api_base, "--model", model, "--run-dir", run_dir,
+                   "--response-format", response_format]
             if args.text_file:
                 cmd += ["--text-file", args.text_file]
             else:
                 cmd += ["--text", args.text]
 
-            p = subprocess.run(cmd, capture_output=True, text=True)
+            asp = lib_trace.start_span("plan.attempt", attempt=total_used, model=model)
+            p = subprocess.run(cmd, capture_output=True, text=True, env=run.env(lib_trace.child_env(sp=asp)))
             a1 = _now_ms()
 
-            run_dir = _read_latest(repo) or ""
             ok = (p.returncode == 0)
 
             # store attempt log into run_dir if possible
@@ -197,9 +209,12 @@ def main() -> int:
                     "message": "",
                     "stdout_tail": (p.stdout or "")[-1500:],
                     "stderr_tail": (p.stderr or "")[-1500:],
+                    "json_mode": lib_jsonmode.read_run(run_dir),
                 })
                 _event(repo, run_dir, kind="plan", step=step_name, phase="end",
                        status="ok", rc=0, duration_ms=a1 - a0)
+                asp.bind_run(run_dir).set(http_status=http_status)
+                asp.end()
 
                 final_ok = True
                 final_model = model
@@ -242,10 +257,13 @@ def main() -> int:
                 "message": message,
                 "stdout_tail": (p.stdout or "")[-1500:],
                 "stderr_tail": (p.stderr or "")[-1500:],
+                "json_mode": lib_jsonmode.read_run(run_dir),
             })
             _event(repo, run_dir, kind="plan", step=step_name, phase="end",
                    status="fail", rc=p.returncode if not empty_like else 1,
                    duration_ms=a1 - a0, error_class=error_class, message=message)
+            asp.bind_run(run_dir).set(http_status=http_status, transient=transient).fail(error_class, message)
+            asp.end()
 
             if not transient:
                 # break to next model
@@ -263,6 +281,7 @@ def main() -> int:
         "candidates": candidates,
         "per_model_budget": per_model_budget,
         "attempts": attempts,
+        "json_mode": lib_jsonmode.summarize(response_format, attempts),
         "final": {"ok": final_ok, "model": final_model, "run_dir": final_run_dir},
         "before_latest": before_latest,
         "after_latest": after_latest,
@@ -271,9 +290,15 @@ def main() -> int:
 
     _write_json(repo / "artifacts" / "tmp" / "policy.trace.latest.json", trace)
 
-    target_run_dir = final_run_dir or after_latest
+    target_run_dir = final_run_dir or (attempts[-1]["run_dir"] if attempts else "")
+    root.set(attempts=len(attempts), final_model=final_model or None)
+    if not final_ok:
+        root.fail("all_attempts_failed")
     if target_run_dir:
         rd = Path(target_run_dir)
+        # later make steps of this run (scaffold, verify) join the same trace
+        root.bind_run(target_run_dir)
+        lib_trace.bind_run_trace(target_run_dir, root)
         _write_json(rd / "policy.decision.json", decision)
         _write_json(rd / "policy.trace.json", trace)
         _event(repo, target_run_dir, kind="plan", step="plan", phase="start", ts_ms=t0)
@@ -282,11 +307,15 @@ def main() -> int:
                rc=0 if final_ok else 1,
                duration_ms=t1 - t0,
                error_class="" if final_ok else "all_attempts_failed")
+        lib_events.flush()
+        _catalog_upsert(repo, target_run_dir)
 
     if not final_ok:
         sys.stderr.write("[policy] all attempts failed\n")
         return 1
 
+    # the run handle for the next steps: RUN_DIR="$(plan_policy.py ...)"
+    print(target_run_dir)
     return 0
 
 
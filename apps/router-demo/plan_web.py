@@ -3,21 +3,24 @@ import argparse
 import hashlib
 import json
 import os
-import re
+import sys
 import time
-from datetime import datetime
 from pathlib import Path
 from urllib import request, error
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+import lib_jsonmode  # noqa: E402
+import lib_jsonscan  # noqa: E402
+import lib_repair  # noqa: E402
+import lib_run  # noqa: E402
+import lib_schema  # noqa: E402
+import lib_trace  # noqa: E402
+
 
 ROOT = Path(__file__).resolve().parents[2]
 RUNS_DIR = ROOT / "artifacts" / "runs"
-LATEST_FILE = RUNS_DIR / "LATEST"
 DOTENV = ROOT / ".env"
-
-
-def utc_stamp() -> str:
-    return datetime.now().strftime("%Y%m%d_%H%M%S")
+SCHEMA_PATH = Path(__file__).resolve().parent / "schemas" / "plan_web.schema.json"
 
 
 def load_dotenv_if_needed() -> None:
@@ -42,61 +45,17 @@ def canonical_hash(obj: dict) -> str:
 
 
 def extract_json(text: str) -> str:
-    t = (text or "").strip()
-    m = re.search(r"```json\s*(\{.*?\})\s*```", t, flags=re.S)
-    if m:
-        return m.group(1).strip()
-    start = t.find("{")
-    end = t.rfind("}")
-    if start != -1 and end != -1 and end > start:
-        return t[start : end + 1].strip()
-    return t
+    # first complete top-level object (one pass, string-aware); else the first
+    # balanced {...} / the whole text, so json.loads reports a useful error
+    sc = lib_jsonscan.ObjectScanner()
+    sc.feed(text or "")
+    sc.finish()
+    return sc.text or sc.first_candidate or (text or "").strip()
 
 
 def validate_plan(plan: dict) -> list[str]:
-    errs: list[str] = []
-    if not isinstance(plan, dict):
-        return ["$: must be an object"]
-
-    if plan.get("project_type") != "nextjs_site":
-        errs.append("$.project_type: must be 'nextjs_site'")
-
-    name = plan.get("name")
-    if not isinstance(name, str) or not re.match(r"^[a-z][a-z0-9-]+$", name) or not (2 <= len(name) <= 40):
-        errs.append("$.name: must match ^[a-z][a-z0-9-]+$ and length 2..40")
-
-    app_title = plan.get("app_title")
-    if not isinstance(app_title, str) or len(app_title.strip()) == 0 or len(app_title) > 80:
-        errs.append("$.app_title: must be non-empty string length <= 80")
-
-    tagline = plan.get("tagline")
-    if tagline is not None and (not isinstance(tagline, str) or len(tagline) > 240):
-        errs.append("$.tagline: must be string length <= 240")
-
-    pages = plan.get("pages")
-    if not isinstance(pages, list) or len(pages) == 0:
-        errs.append("$.pages: must be a non-empty array")
-        return errs
-    if len(pages) > 12:
-        errs.append("$.pages: maxItems is 12")
-
-    for i, p in enumerate(pages):
-        if not isinstance(p, dict):
-            errs.append(f"$.pages[{i}]: must be object")
-            continue
-        route = p.get("route")
-        title = p.get("title")
-        if not isinstance(route, str) or not re.match(r"^/([a-z0-9-]+)?$", route):
-            errs.append(f"$.pages[{i}].route: must match ^/([a-z0-9-]+)?$")
-        if not isinstance(title, str) or len(title.strip()) == 0 or len(title) > 80:
-            errs.append(f"$.pages[{i}].title: must be non-empty string length <= 80")
-
-        sections = p.get("sections")
-        if sections is not None:
-            if not isinstance(sections, list) or any((not isinstance(x, str) or len(x) > 40) for x in sections):
-                errs.append(f"$.pages[{i}].sections: must be array of short strings")
-
-    return errs
+    # every violation of schemas/plan_web.schema.json, as "$.json.path: message"
+    return lib_schema.load_validator(SCHEMA_PATH)(plan)
 
 
 def post_json(url: str, headers: dict[str, str], payload: dict, timeout_s: int) -> dict:
@@ -105,18 +64,13 @@ def post_json(url: str, headers: dict[str, str], payload: dict, timeout_s: int)
     for k, v in headers.items():
         req.add_header(k, v)
     req.add_header("Content-Type", "application/json")
-    try:
-        with request.urlopen(req, timeout=timeout_s) as resp:
-            raw = resp.read().decode("utf-8", errors="replace")
-            return json.loads(raw)
-    except error.HTTPError as e:
-        body = e.read().decode("utf-8", errors="replace") if hasattr(e, "read") else ""
-        raise SystemExit(f"HTTPError {e.code} url={url}\n{body}")
-    except error.URLError as e:
-        raise SystemExit(f"URLError url={url} err={e}")
+    with request.urlopen(req, timeout=timeout_s) as resp:
+        raw = resp.read().decode("utf-8", errors="replace")
+        return json.loads(raw)
 
 
-def call_router(api_base: str, model: str, messages: list[dict], timeout_s: int) -> str:
+def call_router(api_base: str, model: str, messages: list[dict], timeout_s: int,
+                jm: lib_jsonmode.JsonMode) -> str:
     load_dotenv_if_needed()
     key = os.environ.get("LITELLM_MASTER_KEY", "").strip()
     if not key:
@@ -125,7 +79,13 @@ def call_router(api_base: str, model: str, messages: list[dict], timeout_s: int)
     url = api_base.rstrip("/") + "/v1/chat/completions"
     headers = {"Authorization": f"Bearer {key}"}
     payload = {"model": model, "messages": messages, "temperature": 0.2}
-    resp = post_json(url, headers, payload, timeout_s)
+    try:
+        # response_format per the json_only decision; re-sent weaker if the provider rejects it
+        resp = jm.call(payload, lambda p: post_json(url, headers, p, timeout_s))
+    except error.HTTPError as e:
+        raise SystemExit(f"HTTPError {e.code} url={url}\n{lib_jsonmode.error_body(e)}")
+    except error.URLError as e:
+        raise SystemExit(f"URLError url={url} err={e}")
     return resp["choices"][0]["message"]["content"]
 
 
@@ -136,11 +96,27 @@ def main() -> int:
     ap.add_argument("--model", required=True)
     ap.add_argument("--max-attempts", type=int, default=6)
     ap.add_argument("--timeout-s", type=int, default=60)
+    ap.add_argument("--run-dir", default="", help="use this (pre-created) run dir instead of a new one")
+    ap.add_argument("--response-format", choices=lib_jsonmode.MODES, default="off",
+                    help="JSON mode to request (json_only policy decisions pass json_schema)")
+    ap.add_argument("--no-repair", action="store_true",
+                    help="regenerate on validation errors instead of repairing the plan in place")
     args = ap.parse_args()
 
-    RUNS_DIR.mkdir(parents=True, exist_ok=True)
-    run_dir = RUNS_DIR / f"run_plan_web_{utc_stamp()}"
-    run_dir.mkdir(parents=True, exist_ok=True)
+    run = lib_run.open_run(args.run_dir, create=True) if args.run_dir else lib_run.create_run("run_plan_web", RUNS_DIR)
+    run_dir = run.run_dir
+    jm = lib_jsonmode.JsonMode(args.response_format, args.model, SCHEMA_PATH, name="plan_web")
+    # patch requests answer {"patch": [...]}, not a plan: plain JSON mode at most
+    patch_jm = lib_jsonmode.JsonMode("off" if args.response_format == "off" else "json_object", args.model)
+
+    def ask_patch(prompt: str) -> str:
+        try:
+            return call_router(args.api_base, args.model, [
+                {"role": "system", "content": lib_repair.PATCH_SYSTEM},
+                {"role": "user", "content": prompt},
+            ], args.timeout_s, patch_jm)
+        except SystemExit as e:  # a failed patch call falls back to a full retry, not an exit
+            raise RuntimeError(str(e)) from None
 
     text = Path(args.text_file).read_text(encoding="utf-8").strip()
     (run_dir / "plan_web_input.txt").write_text(text, encoding="utf-8")
@@ -176,26 +152,46 @@ def main() -> int:
     meta = {"kind": "plan_web", "api_base": args.api_base, "model": args.model, "attempts": []}
 
     for i in range(1, args.max_attempts + 1):
-        content = call_router(args.api_base, args.model, messages, args.timeout_s)
+        with lib_trace.span("plan_web.http", run_dir=str(run_dir), model=args.model, attempt=i) as hsp:
+            content = call_router(args.api_base, args.model, messages, args.timeout_s, jm)
+            hsp.set(response_format=jm.mode)
         (run_dir / f"attempt_{i:02d}.txt").write_text(content, encoding="utf-8")
 
-        raw = extract_json(content)
-        try:
-            plan = json.loads(raw)
-        except Exception as e:
-            meta["attempts"].append({"i": i, "ok": False, "error": f"json_parse: {e}"})
+        with lib_trace.span("plan_web.validate", run_dir=str(run_dir), attempt=i) as vsp:
+            raw = extract_json(content)
+            try:
+                plan = json.loads(raw)
+            except Exception as e:
+                plan = None
+                vsp.fail("json_parse", str(e))
+            errs = validate_plan(plan) if plan is not None else []
+            if errs:
+                vsp.fail("validate", "; ".join(errs[:5])).set(errors=len(errs))
+        repaired = None
+        if errs and not args.no_repair:
+            # near-valid: fix locally, else patch only the failing paths (no full regeneration)
+            with lib_trace.span("plan_web.repair", run_dir=str(run_dir), attempt=i) as rsp:
+                rep = lib_repair.repair(plan, SCHEMA_PATH, ask=ask_patch)
+                rsp.set(local_fixes=len(rep.local_fixes), patched=rep.patch is not None, ok=rep.ok)
+            run.write_json(f"repair_attempt_{i:02d}.json", rep.to_dict())
+            if rep.ok:
+                plan, errs = rep.doc, []
+                repaired = rep.local_fixes + [f"patch {o.get('op')} {o.get('path')}" for o in rep.patch or []]
+        if plan is None:
+            meta["attempts"].append({"i": i, "ok": False, "error": f"json_parse: {vsp.attrs.get('message', '')}"})
             messages.append({"role": "user", "content": "Invalid JSON. Return ONLY JSON."})
             continue
 
-        errs = validate_plan(plan)
         if not errs:
             plan_hash = canonical_hash(plan)
-            meta["attempts"].append({"i": i, "ok": True, "plan_hash": plan_hash})
+            meta["attempts"].append({"i": i, "ok": True, "plan_hash": plan_hash, "repaired": repaired})
             meta["plan_hash"] = plan_hash
+            meta["json_mode"] = jm.to_dict()
 
-            (run_dir / "plan.web.json").write_text(json.dumps(plan, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-            (run_dir / "meta.plan_web.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
-            LATEST_FILE.write_text(str(run_dir) + "\n", encoding="utf-8")
+            run.write_json("plan.web.json", plan)
+            run.write_json("meta.plan_web.json", meta)
+            run.write_json("json_mode.json", jm.to_dict())
+            run.mark_latest()
 
             print(f"[plan_web] OK run_dir={run_dir} plan_hash={plan_hash}")
             return 0
@@ -204,7 +200,9 @@ def main() -> int:
         messages.append({"role": "user", "content": "Validation failed. Fix and return ONLY JSON.\n- " + "\n- ".join(errs[:20])})
         time.sleep(min(1.5, 0.2 * i))
 
-    (run_dir / "meta.plan_web.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    meta["json_mode"] = jm.to_dict()
+    run.write_json("meta.plan_web.json", meta)
+    run.write_json("json_mode.json", jm.to_dict())
     print(f"[plan_web] FAIL run_dir={run_dir}")
     return 2
 
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
-import argparse, json, os, time, uuid
+import argparse, json, os, sys, time
 from pathlib import Path
 from urllib import request as urlreq
 from urllib.error import HTTPError, URLError
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+import lib_run  # noqa: E402
+
 ROOT = Path("/home/suxiaocong/ai-platform")
 RULES_PATH = ROOT / "infra" / "router_rules.json"
 RUNS_DIR = ROOT / "artifacts" / "runs"
@@ -68,6 +71,7 @@ def main():
     ap.add_argument("--temperature", type=float, default=0.2)
     ap.add_argument("--max-tokens", type=int, default=800)
     ap.add_argument("--timeout", type=int, default=120)
+    ap.add_argument("--run-dir", default=None, help="use this (pre-created) run dir instead of a new one")
     args = ap.parse_args()
 
     long_chars, mode_to_model = load_rules()
@@ -87,9 +91,9 @@ def main():
     if master_key:
         headers["Authorization"] = f"Bearer {master_key}"
 
-    run_id = time.strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:8]
-    run_dir = RUNS_DIR / f"run_{run_id}"
-    run_dir.mkdir(parents=True, exist_ok=True)
+    run = lib_run.open_run(args.run_dir, create=True) if args.run_dir else lib_run.create_run("run", RUNS_DIR)
+    run_dir = run.run_dir
+    run_id = run.run_id[len("run_"):] if run.run_id.startswith("run_") else run.run_id
 
     payload = {
         "model": chosen_model,
@@ -123,7 +127,7 @@ def main():
     meta["duration_s"] = round(meta["ts_end"] - meta["ts_start"], 3)
 
     (run_dir / "response.json").write_text(json.dumps(resp, indent=2, ensure_ascii=False), encoding="utf-8")
-    (run_dir / "meta.json").write_text(json.dumps(meta, indent=2, ensure_ascii=False), encoding="utf-8")
+    run.write_text("meta.json", json.dumps(meta, indent=2, ensure_ascii=False))
 
     # Print assistant content (best-effort)
     content = ""
@@ -135,8 +139,8 @@ def main():
     print(content if content else f"[no content] HTTP={status}")
     print(f"\n[artifacts] {run_dir}")
 
-    # Update latest pointer file (portable)
-    (RUNS_DIR / "LATEST").write_text(str(run_dir), encoding="utf-8")
+    # Update latest pointer file (portable, atomic rename)
+    run.mark_latest()
 
 if __name__ == "__main__":
     main()
@@ -2,16 +2,31 @@
 import argparse
 import hashlib
 import json
-import shutil
+import os
 import time
 import uuid
+import sys
+from contextlib import contextmanager
 from pathlib import Path
 
+try:
+    import fcntl  # POSIX only
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+import lib_blob  # noqa: E402
+import lib_genindex  # noqa: E402
+import lib_gensync  # noqa: E402
+import lib_run  # noqa: E402
+import lib_trace  # noqa: E402
+
 ROOT = Path("/home/suxiaocong/ai-platform")
 GENERATED = ROOT / "apps" / "generated"
 RUNS_DIR = ROOT / "artifacts" / "runs"
 
-META_FILE = ".generated_from_run"
+META_FILE = lib_gensync.META_FILE
+DIFF_LINES = 40  # per-file lines printed; the full list is in scaffold.diff.json
 
 def sha256_text(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8", errors="replace")).hexdigest()
@@ -19,31 +34,18 @@ def sha256_text(s: str) -> str:
 def sha12(sha: str) -> str:
     return (sha or "")[:12]
 
-def safe_join(base: Path, rel: str) -> Path:
+def clean_rel(rel: str) -> str:
+    # containment is checked for all paths at once by lib_gensync.plan_paths
     rel = rel.strip().lstrip("./")
-    if rel.startswith("/") or rel.startswith(".."):
-        raise ValueError(f"unsafe path: {rel}")
-    p = (base / rel).resolve()
-    b = base.resolve()
-    if p != b and not str(p).startswith(str(b) + "/"):
-        raise ValueError(f"path escapes base: {rel}")
-    return p
+    if not rel:
+        raise ValueError("unsafe path: empty")
+    return rel
 
 def read_text(path: Path) -> str:
     return path.read_text(encoding="utf-8", errors="replace")
 
 def read_meta(dirpath: Path) -> dict:
-    mp = dirpath / META_FILE
-    if not mp.exists():
-        return {}
-    meta = {}
-    for line in read_text(mp).splitlines():
-        line = line.strip()
-        if not line or line.startswith("#") or "=" not in line:
-            continue
-        k, v = line.split("=", 1)
-        meta[k.strip()] = v.strip()
-    return meta
+    return lib_gensync.read_meta(dirpath)
 
 def same_hash(stored: str, plan_sha: str) -> bool:
     s = (stored or "").strip()
@@ -69,6 +71,11 @@ def dir_matches_plan(dirpath: Path, name: str, plan_sha: str) -> bool:
     return dirpath.name == suf or dirpath.name.startswith(suf + "__")
 
 def pick_existing_for_plan(name: str, plan_sha: str) -> Path | None:
+    # one indexed lookup (lib_genindex) instead of glob + a marker read per candidate
+    d = lib_genindex.by_plan(plan_sha)
+    if d is not None and dir_matches_plan(d, name, plan_sha):
+        return d
+    # index miss: a failed record() (it is best-effort) must not stop reuse, so check the markers
     prefix = f"{name}__{sha12(plan_sha)}"
     cands = sorted([d for d in GENERATED.glob(prefix + "*") if d.is_dir()])
     for d in cands:
@@ -76,21 +83,38 @@ def pick_existing_for_plan(name: str, plan_sha: str) -> Path | None:
             return d
     return None
 
-def write_meta(out_root: Path, run_dir: Path, plan_sha: str, plan: dict):
-    meta = [
-        f"created={time.strftime('%Y-%m-%d %H:%M:%S')}",
-        f"source_run={run_dir}",
-        f"plan_sha256={plan_sha}",
-        f"plan_sha256_short={sha12(plan_sha)}",
-        f"name={plan.get('name','')}",
-        f"type={plan.get('type','')}",
-        f"schema_version={plan.get('schema_version','')}",
-    ]
-    (out_root / META_FILE).write_text("\n".join(meta) + "\n", encoding="utf-8")
-
-def write_run_instructions(out_root: Path, name: str, run_dir: Path, plan_sha: str, plan: dict):
+@contextmanager
+def name_lock(name: str):
+    # parallel scaffolds of one plan name (pipeline.py jobs) would both see GENERATED/name
+    # free and pick it; choosing the target and writing it happen under one lock per name
+    GENERATED.mkdir(parents=True, exist_ok=True)
+    with (GENERATED / f".{name}.lock").open("a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        yield
+
+def already_generated(d: Path, run_dir: Path, name: str, plan_sha: str, plan: dict) -> None:
+    # this run maps to the reused dir too (verify_generated.sh looks it up by run)
+    lib_genindex.record(d, name=name, plan_hash=plan_sha, run_dir=run_dir, project_type=plan.get("type", ""))
+    print(f"[ok] already generated (same plan hash): {d}")
+    print(f"[run] recommended:")
+    print(f"  cd {d} && cat RUN_INSTRUCTIONS.txt")
+
+def build_meta(run_dir: Path, plan_sha: str, plan: dict) -> dict:
+    # written by lib_gensync.sync_tree, followed by the per-file sha256 lines
+    return {
+        "created": time.strftime('%Y-%m-%d %H:%M:%S'),
+        "source_run": str(run_dir),
+        "plan_sha256": plan_sha,
+        "plan_sha256_short": sha12(plan_sha),
+        "name": plan.get('name', ''),
+        "type": plan.get('type', ''),
+        "schema_version": plan.get('schema_version', ''),
+    }
+
+def render_run_instructions(out_root: Path, name: str, run_dir: Path, plan_sha: str, plan: dict) -> str:
+    # no timestamp: an unchanged plan renders an unchanged file (the marker has created=)
     lines = []
-    lines.append(f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}")
     lines.append(f"Project: {name}")
     lines.append(f"Source run: {run_dir}")
     lines.append(f"Plan sha256: {plan_sha}")
@@ -111,17 +135,28 @@ def write_run_instructions(out_root: Path, name: str, run_dir: Path, plan_sha: s
     cmds = plan.get("run", {}).get("commands", [])
     for c in cmds:
         lines.append(f"  {c}")
-    (out_root / "RUN_INSTRUCTIONS.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return "\n".join(lines) + "\n"
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--run-dir", default=None, help="artifacts/runs/run_*/ (default: LATEST)")
-    ap.add_argument("--force", action="store_true", help="overwrite destination if exists")
+    ap.add_argument("--run-dir", default=None, help="artifacts/runs/run_*/ (default: $RUN_DIR, else LATEST)")
+    ap.add_argument("--force", action="store_true",
+                    help="update the destination in place (only changed files are rewritten)")
+    ap.add_argument("--workers", type=int, default=int(os.environ.get("SCAFFOLD_WORKERS") or 0) or None,
+                    help="threads writing files (default: $SCAFFOLD_WORKERS, else 1 = sequential)")
+    ap.add_argument("--direct", action="store_true",
+                    help="write new files in place (no temp file + rename); fastest for big fresh plans")
     args = ap.parse_args()
 
     GENERATED.mkdir(parents=True, exist_ok=True)
 
-    run_dir = Path(args.run_dir) if args.run_dir else Path((RUNS_DIR / "LATEST").read_text(encoding="utf-8").strip())
+    run_dir = lib_run.resolve_run(args.run_dir, RUNS_DIR)
+    if run_dir is None:
+        raise SystemExit("no run: pass --run-dir, set RUN_DIR or create artifacts/runs/LATEST")
+    with lib_trace.span("scaffold", run_dir=str(run_dir)):
+        scaffold(run_dir, force=args.force, workers=args.workers, direct=args.direct)
+
+def scaffold(run_dir: Path, force: bool = False, workers: int | None = None, direct: bool = False):
     plan_path = run_dir / "plan.json"
     if not plan_path.exists():
         raise SystemExit(f"plan.json not found in {run_dir}")
@@ -133,57 +168,56 @@ def main():
     name = plan["name"]
     base = GENERATED / name
 
-    # 0) If already generated for this plan hash (any matching dir), reuse it
-    existing = pick_existing_for_plan(name, plan_sha)
-    if existing and not args.force:
-        print(f"[ok] already generated (same plan hash): {existing}")
-        print(f"[run] recommended:")
-        print(f"  cd {existing} && cat RUN_INSTRUCTIONS.txt")
-        return
-
-    # 1) decide target dir
-    target = base
-    if target.exists():
-        if dir_matches_plan(target, name, plan_sha) and not args.force:
-            print(f"[ok] already generated (same plan hash): {target}")
-            print(f"[run] recommended:")
-            print(f"  cd {target} && cat RUN_INSTRUCTIONS.txt")
-            return
-        if args.force:
-            shutil.rmtree(target)
-        else:
-            target = GENERATED / f"{name}__{sha12(plan_sha)}"
-
-    # 2) if alt exists, handle idempotent / conflict
-    if target.exists():
-        if dir_matches_plan(target, name, plan_sha) and not args.force:
-            print(f"[ok] already generated (same plan hash): {target}")
-            print(f"[run] recommended:")
-            print(f"  cd {target} && cat RUN_INSTRUCTIONS.txt")
+    with name_lock(name):
+        # 0) If already generated for this plan hash (any matching dir), reuse it
+        existing = pick_existing_for_plan(name, plan_sha)
+        if existing and not force:
+            already_generated(existing, run_dir, name, plan_sha, plan)
             return
-        if args.force:
-            shutil.rmtree(target)
-        else:
-            # collision: add short random suffix
-            target = GENERATED / f"{name}__{sha12(plan_sha)}__{uuid.uuid4().hex[:6]}"
-            if target.exists() and not args.force:
-                raise SystemExit(f"collision: {target} already exists (rerun or use --force)")
-
-    target.mkdir(parents=True, exist_ok=True)
-
-    # 3) write files from plan
-    files = plan.get("files", [])
-    for f in files:
-        rel = f["path"]
-        content = f["content"]
-        outp = safe_join(target, rel)
-        outp.parent.mkdir(parents=True, exist_ok=True)
-        outp.write_text(content, encoding="utf-8")
-
-    write_meta(target, run_dir, plan_sha, plan)
-    write_run_instructions(target, name, run_dir, plan_sha, plan)
+
+        # 1) decide target dir
+        target = base
+        if target.exists():
+            if dir_matches_plan(target, name, plan_sha) and not force:
+                already_generated(target, run_dir, name, plan_sha, plan)
+                return
+            if not force:
+                target = GENERATED / f"{name}__{sha12(plan_sha)}"
+
+        # 2) if alt exists, handle idempotent / conflict
+        if target.exists():
+            if dir_matches_plan(target, name, plan_sha) and not force:
+                already_generated(target, run_dir, name, plan_sha, plan)
+                return
+            if not force:
+                # collision: add short random suffix
+                target = GENERATED / f"{name}__{sha12(plan_sha)}__{uuid.uuid4().hex[:6]}"
+                if target.exists():
+                    raise SystemExit(f"collision: {target} already exists (rerun or use --force)")
+
+        # 3) render files from plan, then write only what differs from the target (--force: in place)
+        files = {}
+        refs = {}
+        for f in plan.get("files", []):
+            rel = clean_rel(f["path"])  # the ref names the file as written, not the raw plan path
+            content = f["content"]
+            files[rel] = content
+            # content-addressed copy: identical files across plans are stored once
+            refs[f"generated/{rel}"] = {"blob": lib_blob.put_text(content), "size": len(content.encode("utf-8"))}
+        files["RUN_INSTRUCTIONS.txt"] = render_run_instructions(target, name, run_dir, plan_sha, plan)
+        lib_blob.record(run_dir, refs)
+
+        res = lib_gensync.sync_tree(target, files, build_meta(run_dir, plan_sha, plan), workers=workers, direct=direct)
+        lib_run.write_atomic(run_dir / "scaffold.diff.json", json.dumps(res.to_dict(), indent=2) + "\n")
+        lib_genindex.record(target, name=name, plan_hash=plan_sha, run_dir=run_dir, project_type=plan.get("type", ""))
 
     print(f"[ok] generated at: {target}")
+    print(res.summary())
+    lines = res.lines()
+    for line in lines[:DIFF_LINES]:
+        print(line)
+    if len(lines) > DIFF_LINES:
+        print(f"  ... {len(lines) - DIFF_LINES} more (see {run_dir / 'scaffold.diff.json'})")
     print("[run] recommended:")
     print(f"  cd {target} && cat RUN_INSTRUCTIONS.txt")
     cmds = plan.get("run", {}).get("commands", [])
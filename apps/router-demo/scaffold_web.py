@@ -1,12 +1,19 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import argparse
 import hashlib
 import json
 import pathlib
 import re
+import sys
 from typing import Any, Dict, List
 
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[2] / "scripts"))
+import lib_genindex  # noqa: E402
+import lib_gensync  # noqa: E402
+import lib_run  # noqa: E402
+
 ROOT = pathlib.Path(__file__).resolve().parents[2]
 RUNS_DIR = ROOT / "artifacts" / "runs"
 GENERATED_DIR = ROOT / "apps" / "generated"
@@ -14,14 +21,11 @@ GENERATED_DIR = ROOT / "apps" / "generated"
 SAFE_NAME_RE = re.compile(r"[^a-z0-9-]+")
 
 
-def read_latest_run_dir() -> pathlib.Path:
-    latest = RUNS_DIR / "LATEST"
-    if latest.is_symlink():
-        return latest.resolve()
-    if latest.exists():
-        s = latest.read_text(encoding="utf-8", errors="ignore").strip()
-        if s and pathlib.Path(s).exists():
-            return pathlib.Path(s).resolve()
+def read_latest_run_dir(explicit: str = "") -> pathlib.Path:
+    """--run-dir, else $RUN_DIR, else LATEST, else the newest run_* dir."""
+    rd = lib_run.resolve_run(explicit, RUNS_DIR)
+    if rd is not None and rd.exists():
+        return rd.resolve()
     cands = sorted(RUNS_DIR.glob("run_*"), key=lambda x: x.stat().st_mtime, reverse=True)
     if not cands:
         raise SystemExit("No runs found under artifacts/runs")
@@ -40,11 +44,6 @@ def sanitize_name(name: str) -> str:
     return n or "site"
 
 
-def write(path: pathlib.Path, content: str) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text(content, encoding="utf-8")
-
-
 def route_to_app_path(route: str) -> pathlib.Path:
     if route == "/":
         return pathlib.Path("app/page.tsx")
@@ -52,11 +51,22 @@ def route_to_app_path(route: str) -> pathlib.Path:
     return pathlib.Path("app", *segs, "page.tsx")
 
 
+def newest_generated(name: str) -> pathlib.Path | None:
+    """Most recently generated site of this name (any plan hash), for --update."""
+    return lib_genindex.by_name(name)
+
+
 def main() -> int:
-    run_dir = read_latest_run_dir()
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--run-dir", default="", help="default: $RUN_DIR, else artifacts/runs/LATEST")
+    ap.add_argument("--update", action="store_true",
+                    help="re-scaffold into the newest existing site of the same name; only changed files are rewritten")
+    args = ap.parse_args()
+
+    run_dir = read_latest_run_dir(args.run_dir)
     plan_path = run_dir / "plan.web.json"
     if not plan_path.exists():
-        raise SystemExit(f"Missing {plan_path}. Put plan.web.json under the latest run dir.")
+        raise SystemExit(f"Missing {plan_path}. Put plan.web.json under the run dir.")
 
     plan: Dict[str, Any] = json.loads(plan_path.read_text(encoding="utf-8"))
     if plan.get("project_type") != "nextjs_site":
@@ -65,10 +75,10 @@ def main() -> int:
     name = sanitize_name(plan.get("name", "site"))
     h = stable_hash(plan)
     out_dir = GENERATED_DIR / f"{name}__{h}"
-    out_dir.mkdir(parents=True, exist_ok=True)
-
-    marker = out_dir / ".generated_from_run"
-    if marker.exists():
+    if args.update:
+        out_dir = newest_generated(name) or out_dir
+    elif lib_gensync.read_meta(out_dir).get("plan_hash") == h:
+        lib_genindex.record(out_dir, name=name, plan_hash=h, run_dir=run_dir, project_type="nextjs_site")
         print(f"[ok] already generated: {out_dir}")
         return 0
 
@@ -77,16 +87,18 @@ def main() -> int:
     pages: List[Dict[str, Any]] = plan.get("pages", []) or [{"route": "/", "title": "Home", "sections": ["Hero"]}]
     nav = plan.get("nav") or [{"label": pg["title"], "route": pg["route"]} for pg in pages]
 
-    write(out_dir / ".gitignore", "node_modules\n.next\nout\ndist\n.env*\n")
+    # the whole site as {path: content}; lib_gensync writes only what differs from out_dir
+    files: Dict[str, str] = {}
+    files[".gitignore"] = "node_modules\n.next\nout\ndist\n.env*\n"
 
-    write(out_dir / "RUN_INSTRUCTIONS.txt", f"""[run]
+    files["RUN_INSTRUCTIONS.txt"] = f"""[run]
 cd {out_dir}
 npm install
 npm run dev
 
 [build]
 npm run build
-""")
+"""
 
     # Pinned stable stack: Next 14 + Tailwind 3 (avoid Tailwind v4/PostCSS changes)
     pkg = {
@@ -107,21 +119,20 @@ npm run build
             "typescript": "5.5.4",
         },
     }
-    write(out_dir / "package.json", json.dumps(pkg, indent=2))
+    files["package.json"] = json.dumps(pkg, indent=2)
 
-    write(out_dir / "next.config.mjs", "/** @type {import('next').NextConfig} */\nconst nextConfig = {};\nexport default nextConfig;\n")
-    write(out_dir / "postcss.config.js", "module.exports = { plugins: { tailwindcss: {}, autoprefixer: {} } };\n")
+    files["next.config.mjs"] = "/** @type {import('next').NextConfig} */\nconst nextConfig = {};\nexport default nextConfig;\n"
+    files["postcss.config.js"] = "module.exports = { plugins: { tailwindcss: {}, autoprefixer: {} } };\n"
 
-    write(out_dir / "tailwind.config.js", """/** @type {import('tailwindcss').Config} */
+    files["tailwind.config.js"] = """/** @type {import('tailwindcss').Config} */
 module.exports = {
   content: ["./app/**/*.{js,ts,jsx,tsx}", "./components/**/*.{js,ts,jsx,tsx}"],
   theme: { extend: {} },
   plugins: [],
 };
-""")
+"""
 
-    write(
-        out_dir / "tsconfig.json",
+    files["tsconfig.json"] = (
         json.dumps(
             {
                 "compilerOptions": {
@@ -143,18 +154,16 @@ module.exports = {
                 "exclude": ["node_modules"],
             },
             indent=2,
-        ),
+        )
     )
 
-    write(out_dir / "next-env.d.ts", '/// <reference types="next" />\n/// <reference types="next/image-types/global" />\n')
+    files["next-env.d.ts"] = '/// <reference types="next" />\n/// <reference types="next/image-types/global" />\n'
 
-    write(
-        out_dir / "app/globals.css",
-        "@tailwind base;\n@tailwind components;\n@tailwind utilities;\n\n:root { color-scheme: light; }\nbody { background: #fff; color: rgb(17 24 39); }\n",
+    files["app/globals.css"] = (
+        "@tailwind base;\n@tailwind components;\n@tailwind utilities;\n\n:root { color-scheme: light; }\nbody { background: #fff; color: rgb(17 24 39); }\n"
     )
 
-    write(
-        out_dir / "components/SiteHeader.tsx",
+    files["components/SiteHeader.tsx"] = (
         """import Link from "next/link";
 type NavItem = { label: string; route: string };
 
@@ -172,11 +181,10 @@ export default function SiteHeader({ title, nav }: { title: string; nav: NavItem
     </header>
   );
 }
-""",
+"""
     )
 
-    write(
-        out_dir / "components/Footer.tsx",
+    files["components/Footer.tsx"] = (
         """export default function Footer() {
   return (
     <footer className="border-t border-neutral-200/60">
@@ -186,18 +194,18 @@ export default function SiteHeader({ title, nav }: { title: string; nav: NavItem
     </footer>
   );
 }
-""",
+"""
     )
 
-    write(
-        out_dir / "app/layout.tsx",
+    description = (tagline or app_title).replace('"', '\\"')
+    files["app/layout.tsx"] = (
         f"""import "./globals.css";
 import SiteHeader from "../components/SiteHeader";
 import Footer from "../components/Footer";
 
 export const metadata = {{
   title: "{app_title}",
-  description: "{(tagline or app_title).replace('"', '\\"')}"
+  description: "{description}"
 }};
 
 const NAV = {json.dumps(nav, indent=2)};
@@ -213,7 +221,7 @@ export default function RootLayout({{ children }}: {{ children: React.ReactNode
     </html>
   );
 }}
-""",
+"""
     )
 
     for pg in pages:
@@ -221,8 +229,7 @@ export default function RootLayout({{ children }}: {{ children: React.ReactNode
         title = pg["title"]
         sections = pg.get("sections", [])
         sec_md = "\\n".join([f"- {s}" for s in sections]) if sections else "- Content"
-        write(
-            out_dir / route_to_app_path(route),
+        files[route_to_app_path(route).as_posix()] = (
             f"""export default function Page() {{
   return (
     <div className="space-y-10">
@@ -238,15 +245,18 @@ export default function RootLayout({{ children }}: {{ children: React.ReactNode
     </div>
   );
 }}
-""",
+"""
         )
 
-    write(
-        out_dir / ".generated_from_run",
-        f"run_dir={run_dir}\nplan_hash={h}\nproject_type=nextjs_site\nplan_file={plan_path}\n",
-    )
+    meta = {"run_dir": str(run_dir), "plan_hash": h, "project_type": "nextjs_site", "plan_file": str(plan_path)}
+    res = lib_gensync.sync_tree(out_dir, files, meta)
+    lib_run.write_atomic(run_dir / "scaffold.diff.json", json.dumps(res.to_dict(), indent=2) + "\n")
+    lib_genindex.record(out_dir, name=name, plan_hash=h, run_dir=run_dir, project_type="nextjs_site")
 
     print(f"[ok] generated web site at: {out_dir}")
+    print(res.summary())
+    for line in res.lines():
+        print(line)
     return 0
 
 
@@ -31,7 +31,7 @@ JSON:
 
 Notes:
   - Default output: assistant content only (stdout).
-  - --meta prints: mode/model/rc/tokens/ms/escalated/profile/format (stderr).
+  - --meta prints: mode/model/rc/tokens/ms/escalated/profile/format/prompt_tokens/completion_tokens/cost_usd (stderr).
 Env:
   LITELLM_BASE_URL    default: http://127.0.0.1:4000/v1
   LITELLM_MASTER_KEY  required (auto-load from .env if missing)
@@ -44,6 +44,25 @@ strip_crlf() { tr -d '\r'; }
 ts_utc() { date -u +"%Y-%m-%dT%H:%M:%SZ"; }
 now_ms() { date +%s%3N; }
 
+# one whole line per append, serialized with other writers (lib_append.py takes the same flock)
+append_log_line() {
+  local f="$1" line="$2" try
+  mkdir -p "$(dirname "$f")" 2>/dev/null || true
+  if ! command -v flock >/dev/null 2>&1; then
+    printf '%s\n' "$line" | python3 "${ROOT_DIR}/scripts/lib_append.py" "$f" 2>/dev/null \
+      || printf '%s\n' "$line" >> "$f"
+    return 0
+  fi
+  for try in 1 2 3 4 5; do
+    (
+      flock -x 9
+      # rotated away between open and lock -> reopen the new live file
+      if [[ "$try" -lt 5 && ! "$f" -ef /dev/fd/9 ]]; then exit 1; fi
+      printf '%s\n' "$line" >&9
+    ) 9>>"$f" && return 0
+  done
+}
+
 # ---------- args ----------
 META=0
 PROFILE_NAME="${ASK_PROFILE:-}"
@@ -290,11 +309,13 @@ printf '__ASK_LAST_CURL_RC:%s\n' "${ASK_LAST_CURL_RC:-0}"
 # ---------- file-based extractor ----------
 extract_from_file() {
   local file="$1"
-  local kind="$2"   # content | tokens
-  python3 - "$file" "$kind" <<'PY'
+  local kind="$2"   # content | tokens | usage
+  local model="${3:-}"
+  python3 - "$file" "$kind" "$model" "${ROOT_DIR}/scripts" <<'PY'
 import json, sys
 path = sys.argv[1]
 kind = sys.argv[2]
+model = sys.argv[3]
 
 try:
   raw = open(path, "r", encoding="utf-8", errors="replace").read().strip()
@@ -357,8 +378,33 @@ def get_tokens(o):
       return str(it + ot)
   return ""
 
+def get_usage(o):
+  # "<total> <prompt> <completion> <cost_usd>", "-" for unknown fields
+  u = o.get("usage")
+  u = u if isinstance(u, dict) else {}
+  pt = u.get("prompt_tokens", u.get("input_tokens"))
+  ct = u.get("completion_tokens", u.get("output_tokens"))
+  pt = pt if isinstance(pt, int) else None
+  ct = ct if isinstance(ct, int) else None
+  total = get_tokens(o) or "-"
+  cost = None
+  if pt is not None and ct is not None and model:
+    try:
+      sys.path.insert(0, sys.argv[4])
+      from lib_pricing import PriceTable
+      cost = PriceTable().cost(model, pt, ct)
+    except Exception:
+      cost = None
+  fields = [total,
+            "-" if pt is None else str(pt),
+            "-" if ct is None else str(ct),
+            "-" if cost is None else f"{cost:.6f}"]
+  return " ".join(fields)
+
 if kind == "content":
   sys.stdout.write(get_content(obj) or "")
+elif kind == "usage":
+  sys.stdout.write(get_usage(obj))
 else:
   sys.stdout.write(get_tokens(obj) or "")
 PY
@@ -433,6 +479,18 @@ print(json.dumps(obj, ensure_ascii=False, indent=2))
 PY
 }
 
+# sets TOKENS / PROMPT_TOKENS / COMPLETION_TOKENS / COST_USD ("" when unknown)
+read_usage() {
+  local usage
+  usage="$(extract_from_file "$1" usage "$2" || true)"
+  read -r TOKENS PROMPT_TOKENS COMPLETION_TOKENS COST_USD <<<"${usage:-- - - -}"
+  [[ "${TOKENS:--}" == "-" ]] && TOKENS=""
+  [[ "${PROMPT_TOKENS:--}" == "-" ]] && PROMPT_TOKENS=""
+  [[ "${COMPLETION_TOKENS:--}" == "-" ]] && COMPLETION_TOKENS=""
+  [[ "${COST_USD:--}" == "-" ]] && COST_USD=""
+  return 0
+}
+
 # ---------- call primary ----------
 ESCALATED=0
 MODEL_USED="${MODEL}"
@@ -455,7 +513,7 @@ RESP=$(printf %s "$OUT" | sed '/^__HTTP_CODE:[0-9][0-9][0-9]$/d' | sed '/^__ASK_
 TMP="$(mktemp)"
 printf "%s" "${RESP}" > "${TMP}"
 CONTENT="$(extract_from_file "${TMP}" content || true)"
-TOKENS="$(extract_from_file "${TMP}" tokens || true)"
+read_usage "${TMP}" "${MODEL}"
 rm -f "${TMP}"
 
 fail_or_empty() {
@@ -492,7 +550,7 @@ if fail_or_empty && [[ "${ALLOW_ESCALATION}" -eq 1 ]]; then
     TMP="$(mktemp)"
     printf "%s" "${RESP}" > "${TMP}"
     CONTENT="$(extract_from_file "${TMP}" content || true)"
-    TOKENS="$(extract_from_file "${TMP}" tokens || true)"
+    read_usage "${TMP}" "${next}"
     rm -f "${TMP}"
   fi
 fi
@@ -530,10 +588,18 @@ LOG_FILE="${ASK_LOG_FILE:-${LOG_FILE_DEFAULT}}"
 LOG_FILE="$(printf "%s" "${LOG_FILE}" | strip_crlf)"
 PROFILE_TAG="${PROFILE_NAME:-}"
 
-printf '%s mode=%s model=%s status=%s rc=%s tokens=%s ms=%s retries=%s last_http=%s last_curl_rc=%s escalated=%s profile=%s format=%s\n' \
+printf -v LOG_LINE '%s mode=%s model=%s status=%s rc=%s tokens=%s ms=%s retries=%s last_http=%s last_curl_rc=%s escalated=%s profile=%s format=%s prompt_tokens=%s completion_tokens=%s cost_usd=%s' \
   "$(ts_utc)" "$MODE" "$MODEL_USED" "$STATUS" "$RC" "${TOKENS:-}" "$MS" \
   "${ASK_RETRIES:-0}" "${ASK_LAST_HTTP:-$RC}" "${ASK_LAST_CURL_RC:-0}" \
-  "$ESCALATED" "$PROFILE_TAG" "$FORMAT_TAG" >> "$LOG_FILE"
+  "$ESCALATED" "$PROFILE_TAG" "$FORMAT_TAG" \
+  "${PROMPT_TOKENS:-}" "${COMPLETION_TOKENS:-}" "${COST_USD:-}"
+append_log_line "$LOG_FILE" "$LOG_LINE"
+
+# size-based rotation: cheap stat here, python only once the live segment is over the limit
+LOG_SIZE="$(stat -c %s "$LOG_FILE" 2>/dev/null || echo 0)"
+if [[ "${LOG_SIZE}" -ge "${LOG_ROTATE_MAX_BYTES:-8388608}" ]]; then
+  python3 "${ROOT_DIR}/scripts/log_rotate.py" "$LOG_FILE" >/dev/null 2>&1 || true
+fi
 
 # ---------- output ----------
 if [[ -n "${CONTENT}" && "${STATUS}" != "empty" && "${STATUS}" != "json_invalid" ]]; then
@@ -550,10 +616,11 @@ else
 fi
 
 if [[ "${META}" -eq 1 ]]; then
-  printf 'meta: mode=%s model=%s rc=%s tokens=%s ms=%s retries=%s last_http=%s last_curl_rc=%s escalated=%s profile=%s format=%s\n' \
+  printf 'meta: mode=%s model=%s rc=%s tokens=%s ms=%s retries=%s last_http=%s last_curl_rc=%s escalated=%s profile=%s format=%s prompt_tokens=%s completion_tokens=%s cost_usd=%s\n' \
     "$MODE" "$MODEL_USED" "$RC" "${TOKENS:-}" "$MS" \
     "${ASK_RETRIES:-0}" "${ASK_LAST_HTTP:-$RC}" "${ASK_LAST_CURL_RC:-0}" \
-    "$ESCALATED" "$PROFILE_TAG" "$FORMAT_TAG"
+    "$ESCALATED" "$PROFILE_TAG" "$FORMAT_TAG" \
+    "${PROMPT_TOKENS:-}" "${COMPLETION_TOKENS:-}" "${COST_USD:-}"
 fi
 
 [[ "${STATUS}" == "ok" ]] || exit 10
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+
+from lib_analytics import REGISTRY, Engine, window_start
+
+def main():
+    ap = argparse.ArgumentParser(description="One pass over ask_history.log -> every registered aggregation as JSON.")
+    ap.add_argument("--log", action="append", default=[], help="log file or glob (repeatable)")
+    ap.add_argument("--since-hours", type=float, default=24.0)
+    ap.add_argument("--jobs", type=int, default=0, help="worker processes (0=cpu count, 1=serial)")
+    ap.add_argument("--agg", action="append", default=[], help=f"limit to aggregation(s): {', '.join(REGISTRY)}")
+    args = ap.parse_args()
+
+    logs = args.log or ["logs/ask_history.log"]
+    res = Engine(args.agg or None).run_many(logs, since=window_start(args.since_hours), jobs=args.jobs)
+    out = {"logs": logs, "window_hours": args.since_hours, **res.to_dict()}
+    sys.stdout.write(json.dumps(out, ensure_ascii=False, indent=2) + "\n")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
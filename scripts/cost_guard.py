@@ -2,126 +2,293 @@
 import argparse
 import datetime as dt
 import os
+import subprocess
 import sys
-import math
-
-def parse_line(line: str):
-    line = line.strip()
-    if not line:
-        return None
-    parts = line.split()
-    if len(parts) < 2:
-        return None
-    ts = parts[0]
-    kv = {}
-    for tok in parts[1:]:
-        if "=" not in tok:
-            continue
-        k, v = tok.split("=", 1)
-        kv[k] = v
-    kv["_ts"] = ts
-    return kv
-
-def parse_ts(ts: str):
+import time
+from collections import deque
+from pathlib import Path
+
+import lib_logseg
+from lib_analytics import Engine, is_ok, parse_line, parse_ts, row_cost, window_start
+from lib_sketch import LogHistogram
+
+def _ms(r) -> int:
     try:
-        return dt.datetime.strptime(ts, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=dt.timezone.utc)
+        return int(r.get("ms","") or 0)
     except Exception:
-        return None
-
-def quantile(vals, q):
-    if not vals:
-        return None
-    vals = sorted(vals)
-    if q <= 0:
-        return vals[0]
-    if q >= 1:
-        return vals[-1]
-    idx = int(math.ceil(q * len(vals))) - 1
-    idx = max(0, min(idx, len(vals) - 1))
-    return vals[idx]
-
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--log", default="logs/ask_history.log")
-    ap.add_argument("--hours", type=float, default=1.0)
-    ap.add_argument("--since-hours", dest="hours", type=float)  # alias
-    ap.add_argument("--min-req", type=int, default=5)
-    ap.add_argument("--max-empty-rate", type=float, default=0.25)
-    ap.add_argument("--max-avg-ms", type=int, default=25000)
-    ap.add_argument("--max-p95-ms", type=int, default=60000)
-    ap.add_argument("--strict", type=int, default=1)  # 1=fail on violation
-    args, _unknown = ap.parse_known_args()
+        return 0
 
-    log_path = args.log
+def check(args, req: int, ok: int, empty: int, avg_ms: int, p95_ms, cost_usd: float = 0.0):
+    """-> (state, message); state in OK | FAIL | LOW (insufficient sample)"""
     hours = float(args.hours)
     min_req = int(args.min_req)
 
-    now = dt.datetime.now(dt.timezone.utc)
-    start = now - dt.timedelta(hours=hours)
+    # budget applies regardless of sample size: one premium call can blow it
+    budget = []
+    if args.max_cost_usd > 0 and cost_usd > args.max_cost_usd:
+        budget.append(f"cost_usd={cost_usd:.4f} > {args.max_cost_usd:.4f}")
 
-    rows = []
-    if os.path.exists(log_path):
-        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
-            for line in f:
-                kv = parse_line(line)
-                if not kv:
-                    continue
-                ts = parse_ts(kv.get("_ts",""))
-                if not ts or ts < start:
-                    continue
-                rows.append(kv)
-
-    req = len(rows)
-    ok = 0
-    empty = 0
-    ms_list = []
-
-    for r in rows:
-        status = r.get("status","")
-        rc = r.get("rc","")
-        try:
-            rc_i = int(rc) if rc else 0
-        except Exception:
-            rc_i = 0
+    if req < min_req and not budget:
+        return "LOW", f"OK: last {hours:g}h (UTC)  requests={req} (<{min_req}) ok={ok} empty={empty} (insufficient sample)"
+
+    violations = list(budget)
+    if req >= min_req:
+        empty_rate = empty / req if req else 0.0
+        if empty_rate > args.max_empty_rate:
+            violations.append(f"empty_rate={empty_rate:.2f} > {args.max_empty_rate:.2f}")
+        if avg_ms > args.max_avg_ms:
+            violations.append(f"avg_ms={avg_ms} > {args.max_avg_ms}")
+        if p95_ms and p95_ms > args.max_p95_ms:
+            violations.append(f"p95_ms={p95_ms} > {args.max_p95_ms}")
+
+    if violations:
+        return "FAIL", f"FAIL: last {hours:g}h (UTC) requests={req} ok={ok} empty={empty} | " + "; ".join(violations)
+
+    return "OK", f"OK: last {hours:g}h (UTC) requests={req} ok={ok} empty={empty} | avg_ms={avg_ms} p95_ms={p95_ms} cost_usd={cost_usd:.4f}"
+
+# ---------------- watch mode ----------------
+
+class Bucket:
+    __slots__ = ("start", "req", "ok", "empty", "cost", "hist")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.req = 0
+        self.ok = 0
+        self.empty = 0
+        self.cost = 0.0
+        self.hist = LogHistogram()
 
-        is_ok = (rc_i == 200) and (status == "ok" or status == "")
-        if status in ("empty", "json_invalid"):
-            is_ok = False
+class SlidingWindow:
+    """
+    Fixed-width time buckets in a deque plus a running aggregate: each row
+    touches one bucket, each eviction subtracts one bucket. Cost per event is
+    O(1) (plus O(#sketch bins) per evicted bucket), independent of window size.
+    """
 
+    def __init__(self, window_s: float, bucket_s: float):
+        self.window_s = window_s
+        self.bucket_s = max(1, int(bucket_s))
+        self.buckets = deque()
+        self.req = 0
+        self.ok = 0
+        self.empty = 0
+        self.cost = 0.0
+        self.hist = LogHistogram()
+
+    def add(self, ts: float, is_ok: bool, ms: int, cost: float = 0.0) -> None:
+        start = int(ts) - int(ts) % self.bucket_s
+        if self.buckets and self.buckets[-1].start == start:
+            b = self.buckets[-1]
+        elif self.buckets and start < self.buckets[-1].start:
+            # late line (clock skew / merged writers): find its bucket, else drop
+            b = next((x for x in self.buckets if x.start == start), None)
+            if b is None:
+                return
+        else:
+            b = Bucket(start)
+            self.buckets.append(b)
+        b.req += 1
+        self.req += 1
+        b.cost += cost
+        self.cost += cost
         if is_ok:
-            ok += 1
+            b.ok += 1
+            self.ok += 1
         else:
-            empty += 1
+            b.empty += 1
+            self.empty += 1
+        if ms > 0:
+            b.hist.add(ms)
+            self.hist.add(ms)
+
+    def evict(self, now: float) -> None:
+        cutoff = now - self.window_s
+        while self.buckets and self.buckets[0].start + self.bucket_s <= cutoff:
+            b = self.buckets.popleft()
+            self.req -= b.req
+            self.ok -= b.ok
+            self.empty -= b.empty
+            self.cost -= b.cost
+            self.hist.subtract(b.hist)
+
+    def stats(self):
+        avg = self.hist.mean()
+        p95 = self.hist.quantile(0.95)
+        return self.req, self.ok, self.empty, int(avg) if avg else 0, int(p95) if p95 else 0, max(0.0, self.cost)
+
+class LogFollower:
+    """
+    Poll-based tail with a byte offset; reopens on rotation (inode change) or
+    truncation. The old file is drained to EOF before switching, so lines a
+    writer appended between the last poll and the rotation are not lost.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.f = None
+        self.ino = None
+        self.buf = ""
 
+    def _open(self) -> None:
         try:
-            ms = int(r.get("ms","") or 0)
-        except Exception:
-            ms = 0
-        if ms > 0:
-            ms_list.append(ms)
+            self.f = self.path.open("r", encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            self.f = None
+            self.ino = None
+            return
+        self.ino = os.fstat(self.f.fileno()).st_ino
+
+    def start(self) -> None:
+        # from offset 0: watch() backfills the archive only, the live file is ours
+        self._open()
+
+    def close(self) -> None:
+        if self.f is not None:
+            self.f.close()
+        self.f = None
+        self.ino = None
+        self.buf = ""
+
+    def live_ino(self):
+        try:
+            return self.path.stat().st_ino
+        except FileNotFoundError:
+            return None
+
+    def _drain(self, out: list) -> None:
+        while True:
+            chunk = self.f.read(65536)
+            if not chunk:
+                break
+            self.buf += chunk
+        if self.buf:
+            parts = self.buf.split("\n")
+            self.buf = parts.pop()
+            out.extend(parts)
+
+    def read_lines(self):
+        if self.f is None:
+            self._open()
+            if self.f is None:
+                return []
+        out = []
+        try:
+            st = self.path.stat()
+            rotated = st.st_ino != self.ino or st.st_size < self.f.tell()
+        except FileNotFoundError:
+            rotated = True
+        # stat first, then read: whatever reached the old file before the switch is kept
+        self._drain(out)
+        if rotated:
+            if self.buf:
+                out.append(self.buf)  # last line of a rotated file, even without its newline
+            self.close()
+            self._open()
+            if self.f is not None:
+                self._drain(out)
+        return out
+
+def run_hook(hook: str, state: str, prev: str, msg: str, stats) -> None:
+    req, ok, empty, avg_ms, p95_ms, cost_usd = stats
+    env = {
+        **os.environ,
+        "GUARD_STATE": state,
+        "GUARD_PREV_STATE": prev,
+        "GUARD_MESSAGE": msg,
+        "GUARD_REQUESTS": str(req),
+        "GUARD_OK": str(ok),
+        "GUARD_EMPTY": str(empty),
+        "GUARD_AVG_MS": str(avg_ms),
+        "GUARD_P95_MS": str(p95_ms),
+        "GUARD_COST_USD": f"{cost_usd:.6f}",
+    }
+    try:
+        subprocess.Popen(hook, shell=True, env=env)
+    except Exception as e:
+        print(f"[guard][warn] hook failed: {e}", file=sys.stderr)
+
+def watch(args) -> int:
+    log_path = Path(args.log[0])
+    window_s = float(args.hours) * 3600.0
+    win = SlidingWindow(window_s, args.bucket_s)
+
+    # backfill the current window from the archive, then follow the live file from offset 0.
+    # The live inode is pinned before the archive is listed; if it is still the live log
+    # afterwards no rotation slipped in between, so every line is read exactly once.
+    since = time.time() - window_s
+    follower = LogFollower(log_path)
+    while True:
+        follower.start()
+        archived = [(p, c) for p, c in lib_logseg.segments(log_path, since=since) if p != log_path]
+        if follower.live_ino() == follower.ino:
+            break
+        follower.close()
+    for line in (ln for p, c in archived for ln in lib_logseg.iter_segment(p, c)):
+        kv = parse_line(line)
+        ts = parse_ts(kv.get("_ts","")) if kv else None
+        if ts and ts.timestamp() >= since:
+            win.add(ts.timestamp(), is_ok(kv), _ms(kv), row_cost(kv)[0])
+
+    state = ""
+    try:
+        while True:
+            cutoff = time.time() - window_s
+            for line in follower.read_lines():
+                kv = parse_line(line)
+                ts = parse_ts(kv.get("_ts","")) if kv else None
+                if ts and ts.timestamp() >= cutoff:
+                    win.add(ts.timestamp(), is_ok(kv), _ms(kv), row_cost(kv)[0])
+            win.evict(time.time())
 
-    if req < min_req:
-        print(f"OK: last {hours:g}h (UTC)  requests={req} (<{min_req}) ok={ok} empty={empty} (insufficient sample)")
+            stats = win.stats()
+            new_state, msg = check(args, *stats)
+            if new_state != state:
+                stamp = dt.datetime.now(dt.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                print(f"{stamp} state={state or '-'}->{new_state} {msg}", flush=True)
+                if args.hook and state:
+                    run_hook(args.hook, new_state, state, msg, stats)
+                state = new_state
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
         return 0
 
-    empty_rate = empty / req if req else 0.0
-    avg_ms = int(sum(ms_list)/len(ms_list)) if ms_list else 0
-    p95_ms = quantile(ms_list, 0.95) if ms_list else 0
+# ---------------- main ----------------
 
-    violations = []
-    if empty_rate > args.max_empty_rate:
-        violations.append(f"empty_rate={empty_rate:.2f} > {args.max_empty_rate:.2f}")
-    if avg_ms > args.max_avg_ms:
-        violations.append(f"avg_ms={avg_ms} > {args.max_avg_ms}")
-    if p95_ms and p95_ms > args.max_p95_ms:
-        violations.append(f"p95_ms={p95_ms} > {args.max_p95_ms}")
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--log", action="append", default=[], help="log file or glob (repeatable; --watch follows the first)")
+    ap.add_argument("--hours", type=float, default=1.0)
+    ap.add_argument("--since-hours", dest="hours", type=float)  # alias
+    ap.add_argument("--min-req", type=int, default=5)
+    ap.add_argument("--max-empty-rate", type=float, default=0.25)
+    ap.add_argument("--max-avg-ms", type=int, default=25000)
+    ap.add_argument("--max-p95-ms", type=int, default=60000)
+    ap.add_argument("--max-cost-usd", type=float, default=0.0, help="budget for the window (0=off)")
+    ap.add_argument("--strict", type=int, default=1)  # 1=fail on violation
+    ap.add_argument("--watch", action="store_true", help="follow the log and report state changes")
+    ap.add_argument("--interval", type=float, default=0.5, help="watch: poll interval seconds")
+    ap.add_argument("--bucket-s", type=float, default=10.0, help="watch: sliding window bucket width")
+    ap.add_argument("--hook", default="", help="watch: shell command run on state change (GUARD_* env)")
+    ap.add_argument("--jobs", type=int, default=0, help="batch: worker processes (0=cpu count, 1=serial)")
+    args, _unknown = ap.parse_known_args()
+    args.log = args.log or ["logs/ask_history.log"]
 
-    if violations:
-        msg = f"FAIL: last {hours:g}h (UTC) requests={req} ok={ok} empty={empty} | " + "; ".join(violations)
-        print(msg)
-        return 2 if args.strict else 0
+    if args.watch:
+        return watch(args)
 
-    print(f"OK: last {hours:g}h (UTC) requests={req} ok={ok} empty={empty} | avg_ms={avg_ms} p95_ms={p95_ms}")
+    tot = Engine(["totals"]).run_many(args.log, since=window_start(float(args.hours)), jobs=args.jobs)["totals"].to_dict()
+
+    req = tot["n"]
+    ok = tot["ok"]
+    empty = req - ok  # empty + json_invalid
+    avg_ms = int(tot["avg_ms"]) if tot["avg_ms"] else 0
+    p95_ms = int(tot["p95_ms"]) if tot["p95_ms"] else 0
+
+    state, msg = check(args, req, ok, empty, avg_ms, p95_ms, tot["cost_usd"])
+    print(msg)
+    if state == "FAIL":
+        return 2 if args.strict else 0
     return 0
 
 if __name__ == "__main__":
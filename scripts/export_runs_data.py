@@ -1,17 +1,36 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
+import gzip
+import hashlib
 import json
 import os
 import re
+import shutil
 import subprocess
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple, List
 
+from lib_runcat import open_catalog
+
 ROOT = Path(__file__).resolve().parent.parent
 RUNS_ROOT = ROOT / "artifacts" / "runs"
 
+MANIFEST_NAME = ".export_manifest.json"
+MANIFEST_VERSION = 2
+# every file a detail/index record is built from
+SOURCE_FILES = ("meta.run.json", "meta.json", "verify_summary.json",
+                "verify.web.json", "verify_web.json", "verify.json", "verify.log")
+
+# paged index for the runs UI: runs_data/index/{manifest.json, page-0001.json, <facet>/<value>/page-0001.json}
+PAGE_SIZE = int(os.environ.get("RUNS_EXPORT_PAGE_SIZE", "50"))
+FACETS = ("kind", "status")
+
+# detail JSON embeds only the tail of verify.log; the full log is a separate asset under runs_data/logs/
+LOG_TAIL_BYTES = int(os.environ.get("RUNS_EXPORT_LOG_TAIL", "16384"))
+LOGS_DIR = "logs"
+
 def _read_text(p: Path, max_bytes: int = 800_000) -> Optional[str]:
     if not p.exists() or not p.is_file():
         return None
@@ -135,19 +154,233 @@ def _pick_gen_dir() -> Path:
         raise SystemExit("[err] cannot find generated websmoke dir (set GEN_DIR=...)")
     return cands[0]
 
-def _list_run_dirs() -> List[Path]:
-    if not RUNS_ROOT.exists():
-        return []
-    ds = [p for p in RUNS_ROOT.iterdir() if p.is_dir() and p.name.startswith("run_")]
-    ds.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    return ds
+def _list_run_dirs(limit: int) -> List[Path]:
+    # newest first, straight from the run catalog index (no directory scan)
+    with open_catalog() as cat:
+        return [Path(r["run_dir"]) for r in cat.list(limit=limit)]
+
+def _read_tail(p: Path, max_bytes: int) -> Optional[Dict[str, Any]]:
+    """Last max_bytes of p (seek, never the whole file), starting at a line boundary."""
+    try:
+        with p.open("rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            offset = max(0, size - max_bytes)
+            f.seek(offset)
+            b = f.read(size - offset)
+    except OSError:
+        return None
+    if offset:
+        nl = b.find(b"\n")
+        if 0 <= nl < len(b) - 1:
+            offset += nl + 1
+            b = b[nl + 1:]
+    return {"text": b.decode("utf-8", errors="replace"), "offset": offset, "end": offset + len(b),
+            "size": size, "truncated": offset > 0}
+
+def _load_verify_log(run_dir: Path, run_id: str, out_dir: Path) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """(tail text, tail info); verify.log is copied whole to runs_data/logs/<run_id>.verify.log."""
+    log = run_dir / "verify.log"
+    asset = out_dir / LOGS_DIR / f"{run_id}.verify.log"
+    tail = _read_tail(log, LOG_TAIL_BYTES) if log.is_file() else None
+    if tail and tail["size"]:
+        asset.parent.mkdir(parents=True, exist_ok=True)
+        tmp = asset.with_name(f".{asset.name}.tmp{os.getpid()}")
+        shutil.copyfile(log, tmp)
+        os.replace(tmp, asset)
+        text = tail.pop("text")
+        tail["url"] = f"/runs_data/{LOGS_DIR}/{asset.name}"
+        return text, tail
+    if asset.exists():
+        asset.unlink()
+    # no verify.log: fall back to the verify_summary.json text, as before
+    return _read_text(run_dir / "verify_summary.json", max_bytes=200_000), None
+
+def _sha256(p: Path) -> str:
+    h = hashlib.sha256()
+    with p.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _fingerprint(run_dir: Path, prev: Dict[str, Any]) -> Dict[str, Any]:
+    """name -> [mtime_ns, size, sha256]; the hash is reused while (mtime, size) is unchanged."""
+    fp: Dict[str, Any] = {}
+    for name in SOURCE_FILES:
+        p = run_dir / name
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        old = prev.get(name)
+        if old and old[0] == st.st_mtime_ns and old[1] == st.st_size:
+            fp[name] = old
+            continue
+        try:
+            fp[name] = [st.st_mtime_ns, st.st_size, _sha256(p)]
+        except OSError:
+            continue
+    return fp
+
+def _same_content(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    # touched-but-identical files do not count as a change
+    return {k: v[2] for k, v in a.items()} == {k: v[2] for k, v in b.items()}
+
+def _load_manifest(out_dir: Path, gen_dir: Path) -> Dict[str, Any]:
+    m = _read_json(out_dir / MANIFEST_NAME)
+    if (not m or m.get("version") != MANIFEST_VERSION or m.get("gen_dir") != str(gen_dir)
+            or os.environ.get("RUNS_EXPORT_FULL", "") == "1"):
+        return {"version": MANIFEST_VERSION, "gen_dir": str(gen_dir), "runs": {}}
+    m.setdefault("runs", {})
+    return m
+
+def _write_atomic(p: Path, text: str) -> None:
+    tmp = p.with_name(f".{p.name}.tmp{os.getpid()}")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, p)
+
+def _dumps_compact(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
 
-def _load_verify_log(run_dir: Path) -> Optional[str]:
-    # prefer verify.log, fallback to verify_summary.json text
-    txt = _read_text(run_dir / "verify.log")
-    if txt:
-        return txt
-    return _read_text(run_dir / "verify_summary.json", max_bytes=200_000)
+def _write_if_changed(p: Path, text: str, gz: bool) -> bool:
+    """Write p (and p.gz when gz) unless the content is already there; True if written."""
+    gz_path = p.with_name(p.name + ".gz")
+    if p.exists() and (not gz or gz_path.exists()) and _read_text(p, max_bytes=1 << 30) == text:
+        return False
+    _write_atomic(p, text)
+    if gz:
+        tmp = gz_path.with_name(f".{gz_path.name}.tmp{os.getpid()}")
+        # mtime=0 keeps the .gz byte-identical for identical pages
+        with gzip.GzipFile(tmp, "wb", compresslevel=9, mtime=0) as f:
+            f.write(text.encode("utf-8"))
+        os.replace(tmp, gz_path)
+    elif gz_path.exists():
+        gz_path.unlink()
+    return True
+
+def _facet_slug(v: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", v or "unknown") or "unknown"
+
+def _write_pages(base: Path, rel: str, items: List[Dict[str, Any]], gz: bool) -> Tuple[Dict[str, Any], set, int]:
+    """Split items into fixed-size pages under base/rel; returns (page set entry, files kept, files written)."""
+    d = base / rel if rel else base
+    d.mkdir(parents=True, exist_ok=True)
+    pages = []
+    keep = set()
+    written = 0
+    for i in range(0, len(items), PAGE_SIZE):
+        chunk = items[i:i + PAGE_SIZE]
+        name = f"page-{i // PAGE_SIZE + 1:04d}.json"
+        written += _write_if_changed(d / name, _dumps_compact(chunk), gz)
+        keep.add(d / name)
+        pages.append({
+            "file": f"{rel}/{name}" if rel else name,
+            "count": len(chunk),
+            "first_start": chunk[0].get("start"),
+            "last_start": chunk[-1].get("start"),
+        })
+    return {"total": len(items), "pages": pages}, keep, written
+
+def _write_paged_index(out_dir: Path, items: List[Dict[str, Any]]) -> Tuple[Path, int]:
+    """
+    Compact paged index (items newest first):
+      index/manifest.json              totals, facet counts, page list per view
+      index/page-NNNN.json             all runs
+      index/<facet>/<value>/page-NNNN  runs filtered by kind / status
+    Only pages whose content changed are rewritten; stale pages are removed.
+    """
+    base = out_dir / "index"
+    gz = os.environ.get("RUNS_EXPORT_GZIP", "") == "1"
+    keep: set = set()
+    written = 0
+
+    view, k, n = _write_pages(base, "", items, gz)
+    keep |= k
+    written += n
+    facets: Dict[str, Any] = {}
+    for facet in FACETS:
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for it in items:
+            groups.setdefault(str(it.get(facet) or "unknown"), []).append(it)
+        facets[facet] = {}
+        for value, group in sorted(groups.items()):
+            fv, k, n = _write_pages(base, f"{facet}/{_facet_slug(value)}", group, gz)
+            keep |= k
+            written += n
+            facets[facet][value] = fv
+
+    manifest = {
+        "version": 1,
+        "page_size": PAGE_SIZE,
+        "total": len(items),
+        "gzip": gz,
+        "all": view,
+        "facets": facets,
+    }
+    manifest_path = base / "manifest.json"
+    written += _write_if_changed(manifest_path, _dumps_compact(manifest), gz)
+    keep.add(manifest_path)
+
+    for p in base.rglob("*.json*"):
+        if p in keep or (gz and p.suffix == ".gz" and p.with_suffix("") in keep):
+            continue
+        p.unlink()
+    for d in sorted((p for p in base.rglob("*") if p.is_dir()), key=lambda p: len(p.parts), reverse=True):
+        if not any(d.iterdir()):
+            d.rmdir()
+    return manifest_path, written
+
+def _export_run(rd: Path, out_dir: Path, gen_dir: Path) -> Dict[str, Any]:
+    run_id = rd.name
+    meta = _read_json(rd / "meta.run.json") or _read_json(rd / "meta.json") or {}
+    verify, verify_file = _load_verify(rd)
+    verify = verify or {}
+    status = _infer_status(meta, verify)
+    kind = _infer_kind(meta, run_id)
+    start = _extract_start_iso(meta, rd, verify)
+
+    # ---- INDEX (for /runs list) ----
+    idx = {
+        "run_id": run_id,
+        "run_dir": str(rd),
+        "kind": kind,
+        "status": status,
+        "start": start,
+    }
+
+    # ---- SUMMARY (for /runs/[id] Summary table) ----
+    # keep keys aligned with UI: kind/status/start/duration_s/last_step/mode/model/run_dir
+    summary = {
+        "kind": kind,
+        "status": status,
+        "start": start,
+        "duration_s": meta.get("duration_s", None),
+        "last_step": meta.get("last_step", None),
+        "mode": meta.get("mode", None),
+        "model": meta.get("model", None),
+        "run_dir": str(rd),
+    }
+
+    verify_log, verify_log_tail = _load_verify_log(rd, run_id, out_dir)
+    detail = {
+        "run_id": run_id,
+        "summary": summary,     # <-- 关键：补回 summary，页面就不会再全是 "-"
+        "index": idx,
+        "meta": meta,
+        "verify": verify,
+        "verify_log": verify_log,          # tail only; see verify_log_tail.url for the full log
+        "verify_log_tail": verify_log_tail,
+        "source": {
+            "run_dir": str(rd),
+            "meta_file": str(rd / "meta.run.json") if (rd / "meta.run.json").exists() else (str(rd / "meta.json") if (rd / "meta.json").exists() else None),
+            "verify_file": str(verify_file) if verify_file else None,
+            "verify_log_file": str(rd / "verify.log") if (rd / "verify.log").exists() else None,
+            "exported_at": _iso_now(),
+            "gen_dir": str(gen_dir),
+        },
+    }
+
+    _write_atomic(out_dir / f"{run_id}.json", json.dumps(detail, ensure_ascii=False, indent=2))
+    return idx
 
 def main() -> int:
     gen_dir = _pick_gen_dir()
@@ -155,69 +388,52 @@ def main() -> int:
     out_dir.mkdir(parents=True, exist_ok=True)
 
     limit = int(os.environ.get("RUNS_EXPORT_LIMIT","80"))
-    run_dirs = _list_run_dirs()[:limit]
+    run_dirs = _list_run_dirs(limit)
 
-    items: List[Dict[str, Any]] = []
-    n_detail = 0
+    manifest = _load_manifest(out_dir, gen_dir)
+    prev_runs: Dict[str, Any] = manifest["runs"]
+    full = not prev_runs
+    runs: Dict[str, Any] = {}
+    n_detail = n_same = 0
 
     for rd in run_dirs:
         run_id = rd.name
-        meta = _read_json(rd / "meta.run.json") or _read_json(rd / "meta.json") or {}
-        verify, verify_file = _load_verify(rd)
-        verify = verify or {}
-        status = _infer_status(meta, verify)
-        kind = _infer_kind(meta, run_id)
-        start = _extract_start_iso(meta, rd, verify)
-
-        # ---- INDEX (for /runs list) ----
-        idx = {
-            "run_id": run_id,
-            "run_dir": str(rd),
-            "kind": kind,
-            "status": status,
-            "start": start,
-        }
-        items.append(idx)
-
-        # ---- SUMMARY (for /runs/[id] Summary table) ----
-        # keep keys aligned with UI: kind/status/start/duration_s/last_step/mode/model/run_dir
-        summary = {
-            "kind": kind,
-            "status": status,
-            "start": start,
-            "duration_s": meta.get("duration_s", None),
-            "last_step": meta.get("last_step", None),
-            "mode": meta.get("mode", None),
-            "model": meta.get("model", None),
-            "run_dir": str(rd),
-        }
-
-        detail = {
-            "run_id": run_id,
-            "summary": summary,     # <-- 关键：补回 summary，页面就不会再全是 "-"
-            "index": idx,
-            "meta": meta,
-            "verify": verify,
-            "verify_log": _load_verify_log(rd),
-            "source": {
-                "run_dir": str(rd),
-                "meta_file": str(rd / "meta.run.json") if (rd / "meta.run.json").exists() else (str(rd / "meta.json") if (rd / "meta.json").exists() else None),
-                "verify_file": str(verify_file) if verify_file else None,
-                "verify_log_file": str(rd / "verify.log") if (rd / "verify.log").exists() else None,
-                "exported_at": _iso_now(),
-                "gen_dir": str(gen_dir),
-            },
-        }
-
-        (out_dir / f"{run_id}.json").write_text(json.dumps(detail, ensure_ascii=False, indent=2), encoding="utf-8")
+        prev = prev_runs.get(run_id) or {}
+        fp = _fingerprint(rd, prev.get("sources") or {})
+        if prev and (out_dir / f"{run_id}.json").exists() and _same_content(fp, prev.get("sources") or {}):
+            runs[run_id] = {"sources": fp, "index": prev["index"]}
+            n_same += 1
+            continue
+        runs[run_id] = {"sources": fp, "index": _export_run(rd, out_dir, gen_dir)}
         n_detail += 1
 
+    # runs that fell out of the export window (or were deleted) lose their detail file;
+    # a fresh export also sweeps details left behind by older, non-incremental runs
+    gone = set(prev_runs) - set(runs)
+    if full:
+        gone |= {p.stem for p in out_dir.glob("run_*.json")} - set(runs)
+    for run_id in gone:
+        for p in (out_dir / f"{run_id}.json", out_dir / LOGS_DIR / f"{run_id}.verify.log"):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+
     # newest first
-    items.sort(key=lambda x: str(x.get("start") or ""), reverse=True)
-    (out_dir / "index.json").write_text(json.dumps(items, ensure_ascii=False, indent=2), encoding="utf-8")
+    items = sorted((r["index"] for r in runs.values()), key=lambda x: str(x.get("start") or ""), reverse=True)
+    # index.json stays as the flat (now compact) list for older pages and e2e checks
+    index_path = out_dir / "index.json"
+    if n_detail or gone or not index_path.exists():
+        _write_atomic(index_path, _dumps_compact(items))
+    pages_manifest, n_pages = _write_paged_index(out_dir, items)
+
+    manifest["runs"] = runs
+    manifest["exported_at"] = _iso_now()
+    _write_atomic(out_dir / MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=1))
 
-    print(f"[ok] wrote {out_dir/'index.json'} items={len(items)}")
-    print(f"[ok] exported details -> {out_dir} exported={n_detail}")
+    print(f"[ok] wrote {index_path} items={len(items)}")
+    print(f"[ok] paged index -> {pages_manifest} page_size={PAGE_SIZE} files_written={n_pages}")
+    print(f"[ok] exported details -> {out_dir} exported={n_detail} unchanged={n_same} removed={len(gone)}")
     return 0
 
 if __name__ == "__main__":
@@ -12,7 +12,7 @@ if [[ "$gen_dir" != /* ]]; then gen_dir="$ROOT/$gen_dir"; fi
 
 mkdir -p "$gen_dir/app/runs" "$gen_dir/app/runs/[id]"
 
-# ---------------- /runs (client fetch index.json) ----------------
+# ---------------- /runs (client fetch paged index, lazy) ----------------
 cat > "$gen_dir/app/runs/page.tsx" <<'TSX'
 'use client';
 
@@ -45,28 +45,88 @@ function badge(status?: string) {
   );
 }
 
+type PageRef = { file: string; count: number; first_start?: string; last_start?: string };
+type PageSet = { total: number; pages: PageRef[] };
+type Manifest = {
+  version: number;
+  page_size: number;
+  total: number;
+  all: PageSet;
+  facets: { [facet: string]: { [value: string]: PageSet } };
+};
+
+async function getJson(url: string): Promise<any> {
+  const r = await fetch(`${url}?t=${Date.now()}`, { cache: 'no-store' });
+  if (!r.ok) throw new Error(`HTTP ${r.status}`);
+  return r.json();
+}
+
+const selectStyle = { border: '1px solid rgba(0,0,0,0.12)', borderRadius: 999, padding: '8px 12px', background: 'white', fontWeight: 700 };
+
 export default function RunsPage() {
+  // paged index (runs_data/index/manifest.json); falls back to the flat index.json
+  const [manifest, setManifest] = useState<Manifest | null>(null);
   const [items, setItems] = useState<IndexItem[] | null>(null);
+  const [loaded, setLoaded] = useState(0);
+  const [busy, setBusy] = useState(false);
   const [err, setErr] = useState<string | null>(null);
+  const [kind, setKind] = useState('');
+  const [status, setStatus] = useState('');
 
   useEffect(() => {
     (async () => {
       try {
-        const r = await fetch(`/runs_data/index.json?t=${Date.now()}`, { cache: 'no-store' });
-        if (!r.ok) throw new Error(`HTTP ${r.status}`);
-        const j = await r.json();
-        setItems(Array.isArray(j) ? j : []);
-      } catch (e: any) {
-        setErr(String(e?.message || e));
-        setItems([]);
+        setManifest((await getJson('/runs_data/index/manifest.json')) as Manifest);
+      } catch {
+        try {
+          const j = await getJson('/runs_data/index.json');
+          setItems(Array.isArray(j) ? j : []);
+        } catch (e: any) {
+          setErr(String(e?.message || e));
+          setItems([]);
+        }
       }
     })();
   }, []);
 
+  // one filter is served by its facet page set; both filters narrow that set client-side
+  const view: PageSet | null = useMemo(() => {
+    if (!manifest) return null;
+    if (status) return manifest.facets?.status?.[status] || { total: 0, pages: [] };
+    if (kind) return manifest.facets?.kind?.[kind] || { total: 0, pages: [] };
+    return manifest.all;
+  }, [manifest, kind, status]);
+
+  const loadNext = async (v: PageSet, n: number, acc: IndexItem[]) => {
+    if (n >= v.pages.length) return;
+    setBusy(true);
+    try {
+      const page = await getJson(`/runs_data/index/${v.pages[n].file}`);
+      setItems([...acc, ...(Array.isArray(page) ? page : [])]);
+      setLoaded(n + 1);
+    } catch (e: any) {
+      setErr(String(e?.message || e));
+    } finally {
+      setBusy(false);
+    }
+  };
+
+  useEffect(() => {
+    if (!view) return;
+    setItems([]);
+    setLoaded(0);
+    loadNext(view, 0, []);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [view]);
+
   const sorted = useMemo(() => {
-    const arr = items || [];
+    const arr = (items || []).filter((it) =>
+      (!kind || (it.kind || 'unknown') === kind) && (!status || (it.status || 'unknown') === status));
     return [...arr].sort((a, b) => (b.start || '').localeCompare(a.start || ''));
-  }, [items]);
+  }, [items, kind, status]);
+
+  const total = view ? view.total : sorted.length;
+  const more = !!view && loaded < view.pages.length;
 
   return (
     <main style={{ maxWidth: 980, margin: '40px auto', padding: '0 16px' }}>
@@ -80,8 +140,25 @@ export default function RunsPage() {
         </button>
       </div>
 
+      {manifest && (
+        <div style={{ marginTop: 10, display: 'flex', gap: 10 }}>
+          <select value={kind} onChange={(e) => setKind(e.target.value)} style={selectStyle}>
+            <option value="">kind: all</option>
+            {Object.entries(manifest.facets?.kind || {}).map(([k, v]) => (
+              <option key={k} value={k}>{k} ({v.total})</option>
+            ))}
+          </select>
+          <select value={status} onChange={(e) => setStatus(e.target.value)} style={selectStyle}>
+            <option value="">status: all</option>
+            {Object.entries(manifest.facets?.status || {}).map(([k, v]) => (
+              <option key={k} value={k}>{k} ({v.total})</option>
+            ))}
+          </select>
+        </div>
+      )}
+
       <div style={{ marginTop: 14, color: 'rgba(0,0,0,0.6)' }}>
-        {err ? `Load error: ${err}` : items === null ? 'Loading...' : `${sorted.length} items`}
+        {err ? `Load error: ${err}` : items === null ? 'Loading...' : `${sorted.length} of ${total} items`}
       </div>
 
       <div style={{ marginTop: 18, display: 'grid', gap: 12 }}>
@@ -105,6 +182,18 @@ export default function RunsPage() {
           </div>
         ))}
       </div>
+
+      {more && view && (
+        <div style={{ marginTop: 18, textAlign: 'center' }}>
+          <button
+            disabled={busy}
+            onClick={() => loadNext(view, loaded, items || [])}
+            style={{ border: '1px solid rgba(0,0,0,0.12)', borderRadius: 999, padding: '10px 16px', background: 'white', fontWeight: 700 }}
+          >
+            {busy ? 'Loading...' : `Load more (${loaded}/${view.pages.length} pages)`}
+          </button>
+        </div>
+      )}
     </main>
   );
 }
@@ -123,6 +212,8 @@ type RunDetail = {
   verify?: any;
   verify_payload?: any;
   events_tail?: any;
+  verify_log?: string | null;
+  verify_log_tail?: { offset: number; end: number; size: number; truncated: boolean; url: string } | null;
 };
 
 function truthyOk(v: any): boolean | null {
@@ -209,6 +300,22 @@ export default function RunPage({ params }: Props) {
 
   const verify = useMemo(() => (data?.verify_payload ?? data?.verify ?? null), [data]);
 
+  // the detail JSON carries only the log tail; the full log is fetched on demand
+  const [fullLog, setFullLog] = useState<string | null>(null);
+  const [logErr, setLogErr] = useState<string | null>(null);
+  const tail = data?.verify_log_tail || null;
+  const loadFullLog = async () => {
+    if (!tail?.url) return;
+    setLogErr(null);
+    try {
+      const r = await fetch(`${tail.url}?t=${Date.now()}`, { cache: 'no-store' });
+      if (!r.ok) throw new Error(`HTTP ${r.status}`);
+      setFullLog(await r.text());
+    } catch (e: any) {
+      setLogErr(String(e?.message || e));
+    }
+  };
+
   return (
     <main style={{ maxWidth: 980, margin: '40px auto', padding: '0 16px' }}>
       <div style={{ display: 'flex', alignItems: 'center', justifyContent: 'space-between', gap: 12 }}>
@@ -265,6 +372,31 @@ export default function RunPage({ params }: Props) {
         </div>
       </section>
 
+      {data?.verify_log && (
+        <section style={{ marginTop: 18, border: '1px solid rgba(0,0,0,0.10)', borderRadius: 18, background: 'rgba(255,255,255,0.7)' }}>
+          <div style={{ padding: 16, display: 'flex', alignItems: 'center', justifyContent: 'space-between', gap: 12 }}>
+            <div style={{ fontWeight: 900, fontSize: 18 }}>Verify log</div>
+            {tail?.truncated && fullLog === null && (
+              <button
+                onClick={loadFullLog}
+                style={{ border: '1px solid rgba(0,0,0,0.12)', borderRadius: 999, padding: '8px 14px', background: 'white', fontWeight: 800 }}
+              >
+                Load full log ({Math.ceil(tail.size / 1024)} KB)
+              </button>
+            )}
+          </div>
+          <div style={{ padding: '0 16px 16px 16px', color: 'rgba(0,0,0,0.65)' }}>
+            {tail?.truncated && fullLog === null && (
+              <div style={{ marginBottom: 8, fontSize: 13 }}>showing bytes {tail.offset}-{tail.end} of {tail.size}</div>
+            )}
+            {logErr && <div style={{ marginBottom: 8 }}>Load error: {logErr}</div>}
+            <pre style={{ margin: 0, padding: 12, borderRadius: 12, background: 'rgba(0,0,0,0.04)', overflow: 'auto', maxHeight: 480 }}>
+              {fullLog ?? data.verify_log}
+            </pre>
+          </div>
+        </section>
+      )}
+
       <details style={{ marginTop: 18 }}>
         <summary style={{ cursor: 'pointer', fontWeight: 900 }}>Raw JSON</summary>
         <pre style={{ marginTop: 10, padding: 12, borderRadius: 12, background: 'rgba(0,0,0,0.04)', overflow: 'auto' }}>
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Single-pass analytics over ask_history.log.
+
+One parser, one ok/empty/json_invalid classification, and a registry of
+aggregations that all consume the same row stream. cost_summary.py,
+route_stats.py and cost_guard.py are views over Engine.run() output.
+
+Every aggregation is mergeable (merge()) and serializable (to_dict()), so
+partial results from different files/windows can be combined. run_many()
+uses that to fan shards (rotated segments, extra files/globs, byte ranges
+of large plain files) out over a multiprocessing pool and merge the partial
+Results in the parent.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import glob
+import multiprocessing as mp
+import os
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import lib_logseg
+from lib_pricing import PriceTable
+from lib_sketch import LogHistogram
+
+OUTCOMES = ("ok", "empty", "json_invalid")
+
+# plain (uncompressed) files above this size are split into byte-range shards
+SHARD_BYTES = int(os.environ.get("ANALYTICS_SHARD_BYTES", str(32 * 1024 * 1024)))
+
+
+# ---------------- parsing ----------------
+
+def parse_line(line: str) -> Optional[Dict[str, str]]:
+    line = line.strip()
+    if not line:
+        return None
+    parts = line.split()
+    if len(parts) < 2:
+        return None
+    ts = parts[0]
+    kv = {}
+    for tok in parts[1:]:
+        if "=" not in tok:
+            continue
+        k, v = tok.split("=", 1)
+        kv[k] = v
+    kv["_ts"] = ts
+    return kv
+
+
+def parse_ts(ts: str) -> Optional[dt.datetime]:
+    # "2026-02-10T12:34:56Z"; fromisoformat is ~10x faster than strptime on the hot path
+    if len(ts) != 20 or ts[10] != "T" or ts[-1] != "Z":
+        return None
+    try:
+        return dt.datetime.fromisoformat(ts[:-1]).replace(tzinfo=dt.timezone.utc)
+    except Exception:
+        return None
+
+
+def _int(v: Any, default: int = 0) -> int:
+    try:
+        return int(v) if v not in (None, "") else default
+    except Exception:
+        return default
+
+
+def outcome(row: Dict[str, str]) -> str:
+    """
+    Canonical classification (ask.sh writes status=ok|empty|json_invalid):
+      json_invalid: model answered but JSON mode rejected it
+      ok:           HTTP 200 and status ok (or missing, for old lines)
+      empty:        everything else (non-200, empty content, unknown status)
+    """
+    status = row.get("status", "")
+    if status == "json_invalid":
+        return "json_invalid"
+    if _int(row.get("rc")) == 200 and status in ("ok", ""):
+        return "ok"
+    return "empty"
+
+
+def is_ok(row: Dict[str, str]) -> bool:
+    return outcome(row) == "ok"
+
+
+_PRICES: Optional[PriceTable] = None
+
+
+def row_cost(row: Dict[str, str]) -> Tuple[float, bool]:
+    """
+    -> (usd, estimated). ask.sh logs cost_usd per request; older lines only
+    have total tokens and are priced at the blended rate (estimated=True).
+    """
+    global _PRICES
+    logged = row.get("cost_usd", "")
+    if logged:
+        try:
+            return float(logged), False
+        except ValueError:
+            pass
+    if _PRICES is None:
+        _PRICES = PriceTable()
+    model = row.get("model", "")
+    pt, ct = _int(row.get("prompt_tokens"), -1), _int(row.get("completion_tokens"), -1)
+    if pt >= 0 and ct >= 0:
+        c = _PRICES.cost(model, pt, ct)
+        return (c or 0.0), c is None
+    c = _PRICES.cost_total_only(model, _int(row.get("tokens")))
+    return (c or 0.0), True
+
+
+# ---------------- aggregations ----------------
+
+class Aggregation:
+    name = ""
+
+    def add(self, row: Dict[str, str]) -> None:
+        raise NotImplementedError
+
+    def merge(self, other: "Aggregation") -> None:
+        raise NotImplementedError
+
+    def to_dict(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+
+REGISTRY: Dict[str, Callable[[], Aggregation]] = {}
+
+
+def register(cls):
+    REGISTRY[cls.name] = cls
+    return cls
+
+
+class _Group:
+    """n / outcome counts / tokens / latency sketch for one key."""
+    __slots__ = ("n", "outcomes", "tokens", "prompt_tokens", "completion_tokens",
+                 "cost_usd", "cost_estimated", "ms")
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.outcomes: Counter = Counter()
+        self.tokens = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost_usd = 0.0
+        self.cost_estimated = 0
+        self.ms = LogHistogram()
+
+    def add(self, row: Dict[str, str]) -> None:
+        self.n += 1
+        self.outcomes[row["_outcome"]] += 1
+        tok = row["_tokens"]
+        if tok > 0:
+            self.tokens += tok
+        self.prompt_tokens += _int(row.get("prompt_tokens"))
+        self.completion_tokens += _int(row.get("completion_tokens"))
+        self.cost_usd += row["_cost"]
+        if row["_cost_estimated"]:
+            self.cost_estimated += 1
+        ms = row["_ms"]
+        if ms > 0:
+            self.ms.add(ms)
+
+    def merge(self, other: "_Group") -> None:
+        self.n += other.n
+        self.outcomes.update(other.outcomes)
+        self.tokens += other.tokens
+        self.prompt_tokens += other.prompt_tokens
+        self.completion_tokens += other.completion_tokens
+        self.cost_usd += other.cost_usd
+        self.cost_estimated += other.cost_estimated
+        self.ms.merge(other.ms)
+
+    @property
+    def ok(self) -> int:
+        return self.outcomes["ok"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "n": self.n,
+            "ok": self.ok,
+            "empty": self.outcomes["empty"],
+            "json_invalid": self.outcomes["json_invalid"],
+            "tokens": self.tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "cost_estimated": self.cost_estimated,
+            "avg_ms": self.ms.mean(),
+            "p50_ms": self.ms.quantile(0.50),
+            "p95_ms": self.ms.quantile(0.95),
+        }
+
+
+@register
+class Totals(Aggregation):
+    name = "totals"
+
+    def __init__(self) -> None:
+        self.g = _Group()
+
+    def add(self, row):
+        self.g.add(row)
+
+    def merge(self, other):
+        self.g.merge(other.g)
+
+    def to_dict(self):
+        return self.g.to_dict()
+
+
+class _Keyed(Aggregation):
+    key = ""
+
+    def __init__(self) -> None:
+        self.groups: Dict[str, _Group] = {}
+
+    def _k(self, row) -> str:
+        return row.get(self.key, "")
+
+    def add(self, row):
+        k = self._k(row)
+        g = self.groups.get(k)
+        if g is None:
+            g = self.groups[k] = _Group()
+        g.add(row)
+
+    def merge(self, other):
+        for k, g in other.groups.items():
+            if k in self.groups:
+                self.groups[k].merge(g)
+            else:
+                self.groups[k] = g
+
+    def to_dict(self):
+        return {k: g.to_dict() for k, g in sorted(self.groups.items(), key=lambda x: x[1].n, reverse=True)}
+
+
+@register
+class ByMode(_Keyed):
+    name = "by_mode"
+    key = "mode"
+
+
+@register
+class ByModel(_Keyed):
+    name = "by_model"
+    key = "model"
+
+
+@register
+class ByProfile(_Keyed):
+    name = "by_profile"
+    key = "profile"
+
+
+@register
+class ByHour(_Keyed):
+    """Hourly rollup (UTC), e.g. spend per hour."""
+    name = "by_hour"
+
+    def _k(self, row) -> str:
+        return row["_ts"][:13] + ":00Z"
+
+    def to_dict(self):
+        return {k: g.to_dict() for k, g in sorted(self.groups.items())}
+
+
+@register
+class Escalation(Aggregation):
+    """premium-chat forced vs escalated, best-effort-chat forced."""
+    name = "escalation"
+
+    def __init__(self) -> None:
+        self.c: Counter = Counter()
+
+    def add(self, row):
+        model = row.get("model", "")
+        mode = row.get("mode", "")
+        escalated = str(row.get("escalated", "0")) == "1"
+        if escalated:
+            self.c["escalated"] += 1
+        if model == "premium-chat":
+            self.c["premium_n"] += 1
+            if mode in ("premium", "premium-chat"):
+                self.c["premium_forced"] += 1
+            if escalated:
+                self.c["premium_escalated"] += 1
+        if model == "best-effort-chat":
+            self.c["best_effort_n"] += 1
+            if mode in ("best-effort", "best-effort-chat", "hard"):
+                self.c["best_effort_forced"] += 1
+
+    def merge(self, other):
+        self.c.update(other.c)
+
+    def to_dict(self):
+        keys = ("escalated", "premium_n", "premium_forced", "premium_escalated",
+                "best_effort_n", "best_effort_forced")
+        return {k: self.c[k] for k in keys}
+
+
+# ---------------- engine ----------------
+
+class Result:
+    """Partial or final engine output: line counters + one instance per aggregation."""
+
+    def __init__(self, names: Iterable[str]) -> None:
+        self.total_lines = 0
+        self.parsed = 0
+        self.filtered = 0
+        self.aggs: Dict[str, Aggregation] = {n: REGISTRY[n]() for n in names}
+
+    def merge(self, other: "Result") -> None:
+        self.total_lines += other.total_lines
+        self.parsed += other.parsed
+        self.filtered += other.filtered
+        for n, a in other.aggs.items():
+            self.aggs[n].merge(a)
+
+    def __getitem__(self, name: str) -> Aggregation:
+        return self.aggs[name]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_lines": self.total_lines,
+            "parsed": self.parsed,
+            "filtered": self.filtered,
+            **{n: a.to_dict() for n, a in self.aggs.items()},
+        }
+
+
+class Engine:
+    def __init__(self, names: Optional[Iterable[str]] = None) -> None:
+        self.names: List[str] = list(names) if names else list(REGISTRY)
+        unknown = [n for n in self.names if n not in REGISTRY]
+        if unknown:
+            raise ValueError(f"unknown aggregations: {unknown}")
+
+    def new_result(self) -> Result:
+        return Result(self.names)
+
+    def feed(self, res: Result, lines: Iterable[str],
+             since: Optional[dt.datetime] = None, until: Optional[dt.datetime] = None) -> Result:
+        aggs = list(res.aggs.values())
+        for line in lines:
+            res.total_lines += 1
+            row = parse_line(line)
+            if not row:
+                continue
+            ts = parse_ts(row["_ts"])
+            if not ts:
+                continue
+            res.parsed += 1
+            if (since and ts < since) or (until and ts > until):
+                continue
+            res.filtered += 1
+            # derived fields computed once per row, shared by every aggregation
+            row["_outcome"] = outcome(row)
+            row["_tokens"] = _int(row.get("tokens"))
+            row["_ms"] = _int(row.get("ms"))
+            row["_cost"], row["_cost_estimated"] = row_cost(row)
+            for a in aggs:
+                a.add(row)
+        return res
+
+    def run(self, log_path: Path | str, since: Optional[dt.datetime] = None,
+            until: Optional[dt.datetime] = None) -> Result:
+        return self.run_many([str(log_path)], since=since, until=until, jobs=1)
+
+    def run_many(self, inputs: Iterable[str], since: Optional[dt.datetime] = None,
+                 until: Optional[dt.datetime] = None, jobs: int = 0) -> Result:
+        """
+        inputs: log paths or globs. Each path expands to its overlapping
+        rotated segments plus the live file; big plain files are split into
+        byte ranges. jobs=0 -> os.cpu_count(), jobs=1 -> serial in-process.
+        """
+        since_ts = since.timestamp() if since else None
+        until_ts = until.timestamp() if until else None
+        shards = plan_shards(inputs, since_ts, until_ts)
+        tasks = [(self.names, sh, since, until) for sh in shards]
+
+        res = self.new_result()
+        jobs = jobs or os.cpu_count() or 1
+        if jobs <= 1 or len(tasks) <= 1:
+            for t in tasks:
+                res.merge(_run_shard(t))
+            return res
+
+        with mp.get_context("fork" if hasattr(os, "fork") else "spawn").Pool(min(jobs, len(tasks))) as pool:
+            for part in pool.imap_unordered(_run_shard, tasks, chunksize=1):
+                res.merge(part)
+        return res
+
+
+# ---------------- sharding ----------------
+
+Shard = Tuple[str, str, int, int]  # (path, codec, byte_start, byte_end); end=-1 -> EOF
+
+
+def expand_inputs(inputs: Iterable[str]) -> List[Path]:
+    out: List[Path] = []
+    seen = set()
+    for spec in inputs:
+        hits = sorted(glob.glob(spec)) if glob.has_magic(spec) else [spec]
+        for h in hits:
+            p = Path(h)
+            if p in seen:
+                continue
+            seen.add(p)
+            out.append(p)
+    return out
+
+
+def plan_shards(inputs: Iterable[str], since_ts: Optional[float] = None,
+                until_ts: Optional[float] = None, shard_bytes: int = SHARD_BYTES) -> List[Shard]:
+    shards: List[Shard] = []
+    for p in expand_inputs(inputs):
+        for seg, codec in lib_logseg.segments(p, since=since_ts, until=until_ts):
+            if codec != "none":
+                shards.append((str(seg), codec, 0, -1))
+                continue
+            try:
+                size = seg.stat().st_size
+            except OSError:
+                continue
+            if shard_bytes <= 0 or size <= shard_bytes:
+                shards.append((str(seg), codec, 0, -1))
+                continue
+            for start in range(0, size, shard_bytes):
+                end = start + shard_bytes
+                shards.append((str(seg), codec, start, end if end < size else -1))
+    # largest-first keeps the pool busy until the end
+    shards.sort(key=lambda s: (s[3] - s[2]) if s[3] >= 0 else _size(s[0]), reverse=True)
+    return shards
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _iter_byte_range(path: str, start: int, end: int) -> Iterator[str]:
+    """
+    Lines whose first byte lies in [start, end). A line straddling `start`
+    belongs to the previous shard, one straddling `end` to this shard.
+    """
+    with open(path, "rb") as f:
+        if start > 0:
+            f.seek(start - 1)
+            if f.read(1) != b"\n":
+                f.readline()  # finish the previous shard's line
+        while True:
+            pos = f.tell()
+            if end >= 0 and pos >= end:
+                break
+            b = f.readline()
+            if not b:
+                break
+            yield b.decode("utf-8", errors="replace")
+
+
+def _run_shard(task) -> Result:
+    names, (path, codec, start, end), since, until = task
+    eng = Engine(names)
+    if codec == "none" and (start > 0 or end >= 0):
+        lines = _iter_byte_range(path, start, end)
+    else:
+        lines = lib_logseg.iter_segment(Path(path), codec)
+    return eng.feed(eng.new_result(), lines, since=since, until=until)
+
+
+def window_start(hours: float) -> dt.datetime:
+    return dt.datetime.now(dt.timezone.utc) - dt.timedelta(hours=hours)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Concurrency-safe appends for shared line logs (logs/events.jsonl,
+logs/ask_history.log, per-run events.jsonl).
+
+Every record is written with O_APPEND:
+  - records up to PIPE_BUF bytes: one os.write() under a shared flock,
+    so small writers never serialize against each other
+  - larger records / batches: exclusive flock, written in a loop until
+    every byte is out, so no other writer can land in between
+Shell writers (ask.sh) take the exclusive lock with flock(1) on the same
+file, and lib_logseg.rotate() renames the live file under the exclusive
+lock. A writer that wins the lock on an inode that has just been rotated
+away notices (fstat vs stat) and reopens by path, so no line is ever
+written into a closed segment.
+
+CLI (shell fallback when flock(1) is missing):
+  printf '%s\n' "$line" | python3 scripts/lib_append.py logs/ask_history.log
+"""
+from __future__ import annotations
+
+import os
+import sys
+from pathlib import Path
+from typing import Iterable, Union
+
+try:
+    import fcntl  # POSIX only
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+# POSIX guarantees >= 512; Linux is 4096
+PIPE_BUF = getattr(os, "PIPE_BUF", None) or 4096
+_REOPEN_TRIES = 5
+
+
+def _same_file(fd: int, path: Path) -> bool:
+    try:
+        a, b = os.fstat(fd), os.stat(path)
+    except FileNotFoundError:
+        return False
+    return (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino)
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        n = os.write(fd, view)
+        view = view[n:]
+
+
+def append_bytes(path: Union[str, Path], data: bytes, fsync: bool = False) -> None:
+    """Append data as one uninterleaved record."""
+    if not data:
+        return
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    small = len(data) <= PIPE_BUF
+    for attempt in range(_REOPEN_TRIES):
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_SH if small else fcntl.LOCK_EX)
+                # rotated between open() and flock(): retry on the new live file
+                if not _same_file(fd, path) and attempt < _REOPEN_TRIES - 1:
+                    continue
+            if small:
+                n = os.write(fd, data)
+                if n < len(data):  # not expected for regular files; finish the record
+                    _write_all(fd, data[n:])
+            else:
+                _write_all(fd, data)
+            if fsync:
+                os.fsync(fd)
+            return
+        finally:
+            os.close(fd)  # also drops the flock
+
+
+def append_line(path: Union[str, Path], line: str, fsync: bool = False) -> None:
+    if not line.endswith("\n"):
+        line += "\n"
+    append_bytes(path, line.encode("utf-8"), fsync=fsync)
+
+
+def append_lines(path: Union[str, Path], lines: Iterable[str], fsync: bool = False) -> None:
+    """Append a batch of complete lines as a single record."""
+    append_bytes(path, "".join(l if l.endswith("\n") else l + "\n" for l in lines).encode("utf-8"),
+                 fsync=fsync)
+
+
+def main() -> int:
+    if len(sys.argv) != 2:
+        sys.stderr.write("usage: lib_append.py LOG_FILE < lines\n")
+        return 2
+    data = sys.stdin.buffer.read()
+    if data and not data.endswith(b"\n"):
+        data += b"\n"
+    append_bytes(Path(sys.argv[1]), data)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
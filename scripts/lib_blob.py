@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+Content-addressed blob store for run artifacts (artifacts/blobs/).
+
+Every plan attempt used to write its full request / response JSON, and
+scaffold wrote every generated file again; the same system prompt and
+near-identical file contents were stored over and over. Now each distinct
+content is stored once, compressed, under its sha256:
+
+  artifacts/blobs/ab/cdef...   (zstd when the zstandard module is installed, else gzip;
+                                the first bytes tell which, so both can coexist)
+
+JSON documents are stored as trees: every string of STRING_MIN chars or
+more becomes its own blob ({"$blob": sha}) and only the small skeleton
+differs between attempts, so a repeated system prompt or an unchanged file
+costs nothing the second time.
+
+Run dirs hold a manifest, <run>/blobs.json, naming what they reference:
+
+  {"entries": {"request_attempt_1.json": {"blob": sha, "size": 1234, "tree": true},
+               "generated/src/app/cli.py": {"blob": sha, "size": 88}}}
+
+Retention is reference counted: gc() counts references from every run
+manifest (following tree blobs into their strings) and deletes blobs
+nobody references any more, once they are older than the grace period (so
+a blob written by a run that has not recorded it yet is never collected).
+
+  sha = lib_blob.put_text(s);  lib_blob.get_text(sha)
+  lib_blob.write_entry(run_dir, "response_attempt_1.json", raw, tree=True)
+  lib_blob.read_entry(run_dir, "response_attempt_1.json")   # -> original text
+
+CLI:
+  lib_blob.py cat RUN_DIR NAME      print a stored entry
+  lib_blob.py ls RUN_DIR            entries of a run
+  lib_blob.py stats                 blobs, stored vs referenced bytes
+  lib_blob.py gc [--dry-run] [--grace-s 3600]
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import secrets
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, Union
+
+import lib_run
+
+try:
+    import zstandard  # optional: smaller and faster than gzip
+except ImportError:  # pragma: no cover
+    zstandard = None  # type: ignore[assignment]
+
+try:
+    import fcntl  # POSIX only
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+STORE = lib_run.ROOT / "artifacts" / "blobs"
+MANIFEST = "blobs.json"
+STRING_MIN = 512  # strings at least this long get their own blob inside trees
+GC_GRACE_S = 3600
+
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_GZIP_MAGIC = b"\x1f\x8b"
+
+PathLike = Union[str, Path]
+
+
+def _compress(data: bytes) -> bytes:
+    if zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _decompress(data: bytes) -> bytes:
+    if data[:4] == _ZSTD_MAGIC:
+        if zstandard is None:
+            raise RuntimeError("blob is zstd-compressed but the zstandard module is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if data[:2] == _GZIP_MAGIC:
+        return gzip.decompress(data)
+    raise ValueError("unknown blob encoding")
+
+
+def blob_path(sha: str, store: Path = STORE) -> Path:
+    return store / sha[:2] / sha[2:]
+
+
+def put_bytes(data: bytes, store: Path = STORE) -> str:
+    """Store data once; returns its sha256. An existing blob is never rewritten."""
+    sha = hashlib.sha256(data).hexdigest()
+    p = blob_path(sha, store)
+    if p.exists():
+        try:
+            os.utime(p)  # fresh again: gc's grace period covers the manifest write that follows
+        except OSError:
+            pass
+        return sha
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(f".{p.name}.{os.getpid()}.{secrets.token_hex(4)}.tmp")
+    try:
+        tmp.write_bytes(_compress(data))
+        os.replace(tmp, p)  # concurrent writers of the same content race harmlessly
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+    return sha
+
+
+def get_bytes(sha: str, store: Path = STORE) -> bytes:
+    return _decompress(blob_path(sha, store).read_bytes())
+
+
+def put_text(s: str, store: Path = STORE) -> str:
+    return put_bytes(s.encode("utf-8"), store)
+
+
+def get_text(sha: str, store: Path = STORE) -> str:
+    return get_bytes(sha, store).decode("utf-8")
+
+
+def _split(obj: Any, store: Path) -> Any:
+    if isinstance(obj, str) and len(obj) >= STRING_MIN:
+        return {"$blob": put_text(obj, store)}
+    if isinstance(obj, dict):
+        return {k: _split(v, store) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_split(v, store) for v in obj]
+    return obj
+
+
+def _join(obj: Any, store: Path) -> Any:
+    if isinstance(obj, dict):
+        if len(obj) == 1 and "$blob" in obj:
+            return get_text(obj["$blob"], store)
+        return {k: _join(v, store) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_join(v, store) for v in obj]
+    return obj
+
+
+def put_tree(obj: Any, store: Path = STORE) -> str:
+    """Store a JSON document with its long strings as separate (shared) blobs; returns the skeleton's sha."""
+    skel = json.dumps(_split(obj, store), ensure_ascii=False, separators=(",", ":"))
+    return put_text(skel, store)
+
+
+def get_tree(sha: str, store: Path = STORE) -> Any:
+    return _join(json.loads(get_text(sha, store)), store)
+
+
+def _tree_refs(obj: Any) -> Iterable[str]:
+    if isinstance(obj, dict):
+        if len(obj) == 1 and "$blob" in obj:
+            yield obj["$blob"]
+            return
+        for v in obj.values():
+            yield from _tree_refs(v)
+    elif isinstance(obj, list):
+        for v in obj:
+            yield from _tree_refs(v)
+
+
+# ---- run manifests ----------------------------------------------------------------
+
+def read_manifest(run_dir: PathLike) -> Dict[str, Any]:
+    try:
+        m = json.loads((Path(run_dir) / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        m = {}
+    m.setdefault("version", 1)
+    m.setdefault("entries", {})
+    return m
+
+
+def record(run_dir: PathLike, entries: Dict[str, Dict[str, Any]]) -> None:
+    """Add entries to the run's manifest (read-modify-write under an exclusive lock)."""
+    run_dir = Path(run_dir)
+    with open(run_dir / f".{MANIFEST}.lock", "a") as lk:
+        if fcntl is not None:
+            fcntl.flock(lk.fileno(), fcntl.LOCK_EX)
+        m = read_manifest(run_dir)
+        m["entries"].update(entries)
+        lib_run.write_atomic(run_dir / MANIFEST, json.dumps(m, ensure_ascii=False, indent=2, sort_keys=True) + "\n")
+
+
+def write_entry(run_dir: PathLike, name: str, text: str, tree: bool = False, store: Path = STORE) -> str:
+    """Store text (as a tree if it is JSON and tree=True) and reference it from the run's manifest."""
+    obj: Any = None
+    if tree:
+        try:
+            obj = json.loads(text)
+        except ValueError:
+            tree = False
+    sha = put_tree(obj, store) if tree else put_text(text, store)
+    record(run_dir, {name: {"blob": sha, "size": len(text.encode("utf-8")), "tree": tree}})
+    return sha
+
+
+def read_entry(run_dir: PathLike, name: str, store: Path = STORE) -> str:
+    e = read_manifest(run_dir)["entries"].get(name)
+    if e is None:
+        raise KeyError(f"{name} not in {Path(run_dir) / MANIFEST}")
+    if e.get("tree"):
+        return json.dumps(get_tree(e["blob"], store), ensure_ascii=False, indent=2)
+    return get_text(e["blob"], store)
+
+
+# ---- retention --------------------------------------------------------------------
+
+def _manifests(runs_dir: Path) -> Iterable[Path]:
+    return runs_dir.glob(f"*/{MANIFEST}")
+
+
+def refcounts(runs_dir: Path = lib_run.RUNS_DIR, store: Path = STORE) -> Counter:
+    """References per blob from every run manifest; tree skeletons count for the strings they hold."""
+    counts: Counter = Counter()
+    trees: Counter = Counter()
+    for mp in _manifests(runs_dir):
+        try:
+            entries = json.loads(mp.read_text(encoding="utf-8")).get("entries", {})
+        except (OSError, ValueError):
+            continue
+        for e in entries.values():
+            counts[e["blob"]] += 1
+            if e.get("tree"):
+                trees[e["blob"]] += 1
+    for sha, n in trees.items():
+        try:
+            for ref in _tree_refs(json.loads(get_text(sha, store))):
+                counts[ref] += n
+        except (OSError, ValueError):
+            continue
+    return counts
+
+
+def _blobs(store: Path) -> Iterable[Path]:
+    return (p for p in store.glob("??/*") if not p.name.startswith("."))
+
+
+def gc(runs_dir: Path = lib_run.RUNS_DIR, store: Path = STORE, grace_s: int = GC_GRACE_S,
+       dry_run: bool = False) -> Dict[str, int]:
+    counts = refcounts(runs_dir, store)
+    cutoff = time.time() - grace_s
+    out = {"blobs": 0, "referenced": 0, "deleted": 0, "freed_bytes": 0}
+    for p in _blobs(store):
+        out["blobs"] += 1
+        if counts.get(p.parent.name + p.name):
+            out["referenced"] += 1
+            continue
+        st = p.stat()
+        if st.st_mtime > cutoff:
+            continue
+        out["deleted"] += 1
+        out["freed_bytes"] += st.st_size
+        if not dry_run:
+            p.unlink()
+    return out
+
+
+def stats(runs_dir: Path = lib_run.RUNS_DIR, store: Path = STORE) -> Dict[str, Any]:
+    stored = sum(p.stat().st_size for p in _blobs(store))
+    logical = 0
+    refs = 0
+    for mp in _manifests(runs_dir):
+        try:
+            entries = json.loads(mp.read_text(encoding="utf-8")).get("entries", {})
+        except (OSError, ValueError):
+            continue
+        refs += len(entries)
+        logical += sum(int(e.get("size") or 0) for e in entries.values())
+    return {"blobs": sum(1 for _ in _blobs(store)), "stored_bytes": stored, "entries": refs,
+            "logical_bytes": logical, "ratio": round(logical / stored, 2) if stored else None,
+            "codec": "zstd" if zstandard is not None else "gzip"}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Content-addressed blob store for run artifacts.")
+    ap.add_argument("--runs-dir", default=str(lib_run.RUNS_DIR))
+    ap.add_argument("--store", default=str(STORE))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("cat", help="print a stored entry of a run")
+    c.add_argument("run_dir")
+    c.add_argument("name")
+    ls = sub.add_parser("ls", help="entries of a run")
+    ls.add_argument("run_dir")
+    sub.add_parser("stats", help="blob count, stored vs referenced bytes")
+    g = sub.add_parser("gc", help="delete blobs no run manifest references")
+    g.add_argument("--dry-run", action="store_true")
+    g.add_argument("--grace-s", type=int, default=GC_GRACE_S)
+    args = ap.parse_args()
+
+    store, runs_dir = Path(args.store), Path(args.runs_dir)
+    if args.cmd == "cat":
+        try:
+            sys.stdout.write(read_entry(args.run_dir, args.name, store))
+        except KeyError as e:
+            sys.stderr.write(f"[blob] {e.args[0]}\n")
+            return 1
+        return 0
+    if args.cmd == "ls":
+        for name, e in sorted(read_manifest(args.run_dir)["entries"].items()):
+            print(f"{e['blob'][:12]}  {e.get('size', 0):>9}  {'tree' if e.get('tree') else 'text'}  {name}")
+        return 0
+    if args.cmd == "stats":
+        print(json.dumps(stats(runs_dir, store), indent=2))
+        return 0
+    res = gc(runs_dir, store, grace_s=args.grace_s, dry_run=args.dry_run)
+    print(f"[blob] gc{' (dry run)' if args.dry_run else ''}: blobs={res['blobs']} referenced={res['referenced']} "
+          f"deleted={res['deleted']} freed={res['freed_bytes']}B")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Shared node_modules cache for generated Next.js sites (verify_generated_web.sh).
+
+Every site scaffold_web.py writes pins the same dependency versions, yet
+each verify paid a full npm install. Installed trees are now kept once per
+dependency key under artifacts/cache/node_modules/<key>/ and hardlinked
+into the site:
+
+  key = sha256 of the package.json dependency sections (not name / scripts),
+        the lockfile (its own name / version fields removed, so two sites with
+        the same deps share it), node major version, platform, arch, tool
+
+A site without a lockfile gets the one the first install wrote (with its own
+name), and that lockfile's key is recorded as an alias of the same entry, so
+the next verify of the site (now with a lockfile) is still a hit.
+
+  hit   node_modules is hardlinked from the store (a copy where hardlinks are
+        impossible, e.g. another filesystem): no network, no resolution.
+        A site whose node_modules already came from this key is left alone.
+  miss  one real install (npm ci / npm install, or pnpm with --tool pnpm),
+        --prefer-offline against the shared npm cache / pnpm store under
+        artifacts/cache/, then the result is published to the store.
+
+Hardlinked files are shared with the store, so nothing may edit them in
+place; npm and next build only add files (node_modules/.cache is never
+stored). `--offline` (DEPCACHE_OFFLINE=1) makes a miss install from the
+local npm cache only, never the network.
+
+  lib_depcache.py install GEN_DIR [--tool npm|pnpm] [--offline] [--report depcache.json]
+  lib_depcache.py key GEN_DIR
+  lib_depcache.py ls
+  lib_depcache.py prune [--keep 3]
+"""
+from __future__ import annotations
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import platform
+import secrets
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import lib_run
+
+CACHE_DIR = Path(os.environ.get("DEPCACHE_DIR", str(lib_run.ROOT / "artifacts" / "cache")))
+STORE = CACHE_DIR / "node_modules"
+NPM_CACHE = CACHE_DIR / "npm"
+PNPM_STORE = CACHE_DIR / "pnpm-store"
+TOOLS = ("npm", "pnpm")
+KEY_FILE = ".depcache_key"  # inside a site's node_modules: which key it was linked from
+COMPLETE = "complete.json"  # written last: a store entry without it is ignored
+DEP_SECTIONS = ("dependencies", "devDependencies", "optionalDependencies", "peerDependencies",
+                "overrides", "resolutions", "pnpm")
+LOCKFILES = {"npm": "package-lock.json", "pnpm": "pnpm-lock.yaml"}
+SKIP = {".cache", KEY_FILE}  # top-level node_modules entries never stored
+
+
+@functools.lru_cache(maxsize=None)
+def node_major() -> str:
+    try:
+        out = subprocess.run(["node", "-v"], capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        raise SystemExit("[depcache] node not found (source scripts/load_node.sh)")
+    return out.strip().lstrip("v").split(".", 1)[0]
+
+
+def _lock_digest(gen_dir: Path, tool: str) -> Optional[str]:
+    p = gen_dir / LOCKFILES[tool]
+    if not p.exists():
+        return None
+    if tool == "npm":
+        try:
+            lock = json.loads(p.read_text(encoding="utf-8"))
+        except ValueError:
+            return hashlib.sha256(p.read_bytes()).hexdigest()
+        # the site's own name / version are in the lock too; they do not change what gets installed
+        lock.pop("name", None)
+        lock.pop("version", None)
+        root = (lock.get("packages") or {}).get("")
+        if isinstance(root, dict):
+            root.pop("name", None)
+            root.pop("version", None)
+        return hashlib.sha256(json.dumps(lock, sort_keys=True).encode("utf-8")).hexdigest()
+    return hashlib.sha256(p.read_bytes()).hexdigest()
+
+
+def cache_key(gen_dir: Path, tool: str = "npm") -> str:
+    pkg = json.loads((gen_dir / "package.json").read_text(encoding="utf-8"))
+    doc = {
+        "deps": {k: pkg.get(k) for k in DEP_SECTIONS if pkg.get(k)},
+        "lock": _lock_digest(gen_dir, tool),
+        "node": node_major(),
+        "platform": sys.platform,
+        "arch": platform.machine(),
+        "tool": tool,
+    }
+    return hashlib.sha256(json.dumps(doc, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def link_tree(src: Path, dst: Path, skip: frozenset = frozenset()) -> Dict[str, int]:
+    """Recreate src at dst: files hardlinked (copied if the filesystem refuses), symlinks kept as-is."""
+    stats = {"files": 0, "copied": 0}
+    can_link = True
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel = os.path.relpath(dirpath, src)
+        out = dst if rel == "." else dst / rel
+        out.mkdir(parents=True, exist_ok=True)
+        if rel == ".":
+            dirnames[:] = [d for d in dirnames if d not in skip]
+            filenames = [f for f in filenames if f not in skip]
+        for d in list(dirnames):
+            s = os.path.join(dirpath, d)
+            if os.path.islink(s):  # pnpm / .bin links: keep them links, do not descend
+                os.symlink(os.readlink(s), out / d)
+                dirnames.remove(d)
+        for f in filenames:
+            s = os.path.join(dirpath, f)
+            if os.path.islink(s):
+                os.symlink(os.readlink(s), out / f)
+                continue
+            stats["files"] += 1
+            if can_link:
+                try:
+                    os.link(s, out / f)
+                    continue
+                except OSError:
+                    can_link = False  # EXDEV / EPERM: do not retry per file
+            shutil.copy2(s, out / f)
+            stats["copied"] += 1
+    return stats
+
+
+def _entry(key: str) -> Path:
+    return STORE / key
+
+
+def lookup(key: str) -> Optional[Path]:
+    e = _entry(key)
+    if not (e / COMPLETE).exists():
+        return None
+    try:
+        os.utime(e)  # recency for prune
+    except OSError:
+        pass
+    return e
+
+
+def alias(key: str, target: str) -> None:
+    """Make key resolve to target's entry (relative symlink; an existing key is left alone)."""
+    try:
+        os.symlink(target, _entry(key))
+    except FileExistsError:
+        pass
+
+
+def publish(key: str, gen_dir: Path, tool: str, install_ms: float) -> Optional[Path]:
+    """Snapshot gen_dir/node_modules into the store (tmp dir + rename; a concurrent publisher may win)."""
+    STORE.mkdir(parents=True, exist_ok=True)
+    tmp = STORE / f".{key}.{os.getpid()}.{secrets.token_hex(4)}.tmp"
+    try:
+        st = link_tree(gen_dir / "node_modules", tmp / "node_modules", frozenset(SKIP))
+        lock = gen_dir / LOCKFILES[tool]
+        if lock.exists():
+            shutil.copy2(lock, tmp / lock.name)
+        info = {"key": key, "tool": tool, "created": time.time(), "files": st["files"],
+                "install_ms": round(install_ms), "source": str(gen_dir)}
+        (tmp / COMPLETE).write_text(json.dumps(info, indent=2) + "\n", encoding="utf-8")
+        try:
+            os.rename(tmp, _entry(key))
+        except OSError:
+            pass  # already published by someone else; theirs is as good
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return lookup(key)
+
+
+def _restore_lock(entry: Path, gen_dir: Path, tool: str) -> None:
+    src, dst = entry / LOCKFILES[tool], gen_dir / LOCKFILES[tool]
+    if not src.exists() or dst.exists():
+        return
+    if tool != "npm":
+        shutil.copy2(src, dst)
+        return
+    lock = json.loads(src.read_text(encoding="utf-8"))
+    pkg = json.loads((gen_dir / "package.json").read_text(encoding="utf-8"))
+    for obj in (lock, (lock.get("packages") or {}).get("")):
+        if isinstance(obj, dict):
+            obj["name"], obj["version"] = pkg.get("name", obj.get("name")), pkg.get("version", obj.get("version"))
+    lib_run.write_atomic(dst, json.dumps(lock, indent=2) + "\n")
+
+
+def run_install(gen_dir: Path, tool: str, offline: bool) -> None:
+    env = dict(os.environ, npm_config_cache=str(NPM_CACHE))
+    net = ["--offline"] if offline else ["--prefer-offline"]
+    if tool == "pnpm":
+        cmd = ["pnpm", "install", "--store-dir", str(PNPM_STORE), *net]
+        if (gen_dir / LOCKFILES["pnpm"]).exists():
+            cmd.append("--frozen-lockfile")
+    elif (gen_dir / LOCKFILES["npm"]).exists():
+        cmd = ["npm", "ci", "--no-audit", "--no-fund", *net]
+    else:
+        cmd = ["npm", "install", "--no-audit", "--no-fund", *net]
+    print(f"[depcache] run: {' '.join(cmd)}", flush=True)
+    subprocess.run(cmd, cwd=str(gen_dir), env=env, check=True)
+
+
+def install(gen_dir: Path, tool: str = "npm", offline: bool = False) -> Dict[str, Any]:
+    """node_modules for gen_dir from the store (hit) or one real install that is then stored (miss)."""
+    t0 = time.perf_counter()
+    gen_dir = gen_dir.resolve()
+    key = cache_key(gen_dir, tool)
+    nm = gen_dir / "node_modules"
+    out: Dict[str, Any] = {"key": key, "tool": tool, "gen_dir": str(gen_dir)}
+
+    try:
+        current = (nm / KEY_FILE).read_text(encoding="utf-8").strip()
+    except OSError:
+        current = ""
+    entry = lookup(key)
+    if entry is not None and current == key:
+        out.update(hit=True, action="already linked")
+    elif entry is not None:
+        if nm.exists():
+            shutil.rmtree(nm)
+        st = link_tree(entry / "node_modules", nm)
+        _restore_lock(entry, gen_dir, tool)
+        out.update(hit=True, action="linked", files=st["files"], copied=st["copied"])
+    else:
+        t1 = time.perf_counter()
+        run_install(gen_dir, tool, offline)
+        install_ms = (time.perf_counter() - t1) * 1000
+        # a lockfile npm install just wrote changes the key; store under the key later runs will compute
+        published = publish(key, gen_dir, tool, install_ms)
+        out.update(hit=False, action="installed", install_ms=round(install_ms), stored=published is not None)
+    # npm install / _restore_lock may have added a lockfile: its key is the same entry from now on
+    final = cache_key(gen_dir, tool)
+    if final != key and lookup(key) is not None:
+        alias(final, key)
+    if nm.is_dir():
+        (nm / KEY_FILE).write_text(final + "\n", encoding="utf-8")
+    out["ms"] = round((time.perf_counter() - t0) * 1000)
+    return out
+
+
+def entries() -> List[Dict[str, Any]]:
+    out = []
+    for e in STORE.glob("*/" + COMPLETE) if STORE.exists() else []:
+        if e.parent.is_symlink():  # alias of another entry
+            continue
+        try:
+            info = json.loads(e.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        info["used"] = e.parent.stat().st_mtime
+        out.append(info)
+    return sorted(out, key=lambda i: i["used"], reverse=True)
+
+
+def prune(keep: int) -> int:
+    """Drop all but the keep most recently used store entries (and unfinished tmp dirs)."""
+    n = 0
+    for info in entries()[keep:]:
+        shutil.rmtree(_entry(info["key"]), ignore_errors=True)
+        n += 1
+    for a in STORE.iterdir() if STORE.exists() else []:
+        if a.is_symlink() and not a.exists():  # alias of a pruned entry
+            a.unlink()
+    for tmp in STORE.glob(".*.tmp") if STORE.exists() else []:
+        if time.time() - tmp.stat().st_mtime > 3600:
+            shutil.rmtree(tmp, ignore_errors=True)
+    return n
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Shared node_modules cache keyed by dependencies + lockfile.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    i = sub.add_parser("install", help="link node_modules from the cache, or install once and cache it")
+    i.add_argument("gen_dir")
+    i.add_argument("--tool", choices=TOOLS, default=os.environ.get("DEPCACHE_TOOL") or "npm")
+    i.add_argument("--offline", action="store_true", default=os.environ.get("DEPCACHE_OFFLINE") == "1",
+                   help="on a miss, install from the local npm cache / pnpm store only")
+    i.add_argument("--report", default="", help="write the result as JSON here (e.g. <run>/depcache.json)")
+    k = sub.add_parser("key", help="print the cache key of a site")
+    k.add_argument("gen_dir")
+    k.add_argument("--tool", choices=TOOLS, default=os.environ.get("DEPCACHE_TOOL") or "npm")
+    sub.add_parser("ls", help="store entries, most recently used first")
+    p = sub.add_parser("prune", help="keep only the most recently used entries")
+    p.add_argument("--keep", type=int, default=3)
+    args = ap.parse_args()
+
+    if args.cmd == "key":
+        print(cache_key(Path(args.gen_dir).resolve(), args.tool))
+        return 0
+    if args.cmd == "ls":
+        for info in entries():
+            print(f"{info['key']}  {info.get('tool', '-'):<4} files={info.get('files', 0):<7} "
+                  f"install_ms={info.get('install_ms', 0):<7} {time.strftime('%Y-%m-%d %H:%M', time.localtime(info['used']))}")
+        return 0
+    if args.cmd == "prune":
+        print(f"[depcache] pruned={prune(args.keep)}")
+        return 0
+
+    try:
+        res = install(Path(args.gen_dir), args.tool, args.offline)
+    except subprocess.CalledProcessError as e:
+        sys.stderr.write(f"[depcache][err] install failed (exit {e.returncode})\n")
+        return e.returncode or 1
+    if args.report:
+        lib_run.write_atomic(args.report, json.dumps(res, indent=2) + "\n")
+    print(f"[depcache] {'hit' if res['hit'] else 'miss'} key={res['key']} {res['action']} in {res['ms']}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
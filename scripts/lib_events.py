@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+In-process event emitter for events.jsonl.
+
+Every event goes to two append-only JSONL files:
+
+  <run_dir>/events.jsonl     per-run (skipped when run_dir is empty)
+  logs/events.jsonl          global (rotated via lib_logseg)
+
+EventBus buffers events per target file and writes each file's batch with
+a single append, instead of one python subprocess + two open/close per
+event. Buffers are flushed when they reach `max_buffer` events, when the
+oldest buffered event is older than `flush_interval_s`, on flush()/close()
+and at interpreter exit.
+
+fsync policy (EVENTS_FSYNC):
+  none    leave it to the OS (default)
+  flush   fsync each file once per flush
+  always  flush + fsync after every event
+
+Usage:
+  bus = lib_events.get_bus()
+  bus.emit("plan", "start", run_dir=rd, kind="plan")
+  bus.flush()   # before something else reads events.jsonl
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import lib_append
+import lib_logseg
+
+ROOT = Path(__file__).resolve().parents[1]
+GLOBAL_EVENTS = ROOT / "logs" / "events.jsonl"
+
+FSYNC_POLICIES = ("none", "flush", "always")
+DEFAULT_FSYNC = os.environ.get("EVENTS_FSYNC", "none")
+DEFAULT_MAX_BUFFER = int(os.environ.get("EVENTS_BUFFER", "64"))
+DEFAULT_FLUSH_INTERVAL_S = float(os.environ.get("EVENTS_FLUSH_INTERVAL_S", "1.0"))
+
+
+def _iso_utc(ts_ms: int) -> str:
+    dt = datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc)
+    return dt.isoformat().replace("+00:00", "Z")
+
+
+def make_event(step: str, phase: str, *, run_dir: str = "", kind: str = "", status: str = "ok",
+               rc: int = 0, duration_ms: Optional[int] = None, message: str = "",
+               error_class: str = "", ts_ms: Optional[int] = None, **extra: Any) -> Dict[str, Any]:
+    """One event record; same keys/order event_append.py has always written."""
+    ts_ms = ts_ms if ts_ms and ts_ms > 0 else int(time.time() * 1000)
+    ev: Dict[str, Any] = {
+        "ts_ms": ts_ms,
+        "ts_utc": _iso_utc(ts_ms),
+        "run_dir": run_dir,
+        "kind": kind,
+        "step": step,
+        "phase": phase,
+        "status": status,
+        "rc": rc,
+    }
+    if duration_ms is not None and duration_ms >= 0:
+        ev["duration_ms"] = duration_ms
+    if message:
+        ev["message"] = message
+    if error_class:
+        ev["error_class"] = error_class
+    for k, v in extra.items():
+        if v is not None:
+            ev[k] = v
+    return ev
+
+
+class EventBus:
+    def __init__(self, global_path: Optional[Path] = GLOBAL_EVENTS, fsync: str = DEFAULT_FSYNC,
+                 max_buffer: int = DEFAULT_MAX_BUFFER,
+                 flush_interval_s: float = DEFAULT_FLUSH_INTERVAL_S) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.global_path = global_path
+        self.fsync = fsync
+        self.max_buffer = max(1, max_buffer)
+        self.flush_interval_s = flush_interval_s
+        self._buf: Dict[Path, List[str]] = {}
+        self._pending = 0
+        self._oldest = 0.0
+        self._lock = threading.Lock()
+        self._closed = False
+        atexit.register(self.close)
+
+    def __enter__(self) -> "EventBus":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def emit(self, step: str, phase: str, **kw: Any) -> Dict[str, Any]:
+        ev = make_event(step, phase, **kw)
+        self.emit_event(ev)
+        return ev
+
+    def emit_event(self, ev: Dict[str, Any]) -> None:
+        line = json.dumps(ev, ensure_ascii=False) + "\n"
+        targets: List[Path] = []
+        if ev.get("run_dir"):
+            targets.append(Path(ev["run_dir"]) / "events.jsonl")
+        if self.global_path is not None:
+            targets.append(self.global_path)
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            for p in targets:
+                self._buf.setdefault(p, []).append(line)
+            self._pending += 1
+            due = (self.fsync == "always" or self._pending >= self.max_buffer
+                   or time.monotonic() - self._oldest >= self.flush_interval_s)
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            buf, self._buf, self._pending = self._buf, {}, 0
+        for path, lines in buf.items():
+            try:
+                self._write(path, "".join(lines))
+            except OSError:
+                # events are best-effort telemetry; never fail the caller
+                pass
+
+    def _write(self, path: Path, data: str) -> None:
+        if path == self.global_path:
+            try:
+                lib_logseg.maybe_rotate(path)
+            except Exception:
+                pass
+        # one uninterleaved record per batch, safe against concurrent writers
+        lib_append.append_bytes(path, data.encode("utf-8"), fsync=self.fsync != "none")
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        try:
+            atexit.unregister(self.close)
+        except Exception:
+            pass
+
+
+_BUS: Optional[EventBus] = None
+
+
+def get_bus() -> EventBus:
+    """Process-wide bus (flushed at exit)."""
+    global _BUS
+    if _BUS is None or _BUS._closed:
+        _BUS = EventBus()
+    return _BUS
+
+
+def emit(step: str, phase: str, **kw: Any) -> Dict[str, Any]:
+    return get_bus().emit(step, phase, **kw)
+
+
+def flush() -> None:
+    if _BUS is not None:
+        _BUS.flush()
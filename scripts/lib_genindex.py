@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Generated-project index: plan hash / run dir / name -> apps/generated/<dir>.
+
+The scaffolders record every project they write (or find already written),
+so "which dir did this plan / this run produce" is one indexed SQLite query
+instead of globbing apps/generated and parsing every .generated_from_run
+(scaffold.py) or grep -R'ing all of them (verify_generated*.sh).
+
+  gen_dirs  one row per generated dir: name, plan hash (full, plus its
+            12-char key: scaffold.py uses full sha256, scaffold_web.py 12 chars),
+            project type, last update
+  gen_runs  run dir -> gen dir (a run that reused an existing dir maps to it too)
+
+Rows whose dir no longer exists are dropped when a lookup hits them, so a
+deleted project (retain_keep3.sh, rm -rf) never comes back as an answer;
+`lib_genindex.py reindex` rebuilds everything from the markers on disk.
+
+  lib_genindex.record(gen_dir, name=name, plan_hash=sha, run_dir=run_dir, project_type="python-cli")
+  lib_genindex.by_plan(sha)  /  by_run(run_dir)  /  by_name(name)   # Path or None (also on index errors)
+
+Shell:
+  gen_dir="$(python3 scripts/lib_genindex.py lookup --run-dir "$RUN_DIR")"   # exit 1 if unknown
+
+On a miss `lookup` first adds any marker the index lacks (a record() that
+failed is silent) and asks again, so a scaffolded run is never unverifiable.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import lib_gensync
+import lib_run
+
+GENERATED = lib_run.ROOT / "apps" / "generated"
+DB_PATH = Path(os.environ.get("GEN_INDEX_DB", str(lib_run.ROOT / "artifacts" / "generated_index.sqlite3")))
+KEY_LEN = 12
+
+PathLike = Union[str, Path]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS gen_dirs (
+  gen_dir       TEXT PRIMARY KEY,
+  name          TEXT NOT NULL DEFAULT '',
+  plan_hash     TEXT NOT NULL DEFAULT '',
+  plan_key      TEXT NOT NULL DEFAULT '',
+  project_type  TEXT NOT NULL DEFAULT '',
+  updated_at    REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS gen_dirs_plan_key ON gen_dirs(plan_key);
+CREATE INDEX IF NOT EXISTS gen_dirs_name ON gen_dirs(name, updated_at DESC);
+CREATE TABLE IF NOT EXISTS gen_runs (
+  run_dir  TEXT PRIMARY KEY,
+  gen_dir  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS gen_runs_gen_dir ON gen_runs(gen_dir);
+"""
+
+
+def _norm(p: PathLike) -> str:
+    return str(Path(p).resolve())
+
+
+def _name_of(gen_dir: Path) -> str:
+    # name__sha12 / name__sha12__rand -> name
+    return gen_dir.name.split("__", 1)[0]
+
+
+def scan_marker(gen_dir: Path) -> Optional[Dict[str, Any]]:
+    """Index row for a generated dir from its .generated_from_run (None if it has none)."""
+    meta = lib_gensync.read_meta(gen_dir)
+    if not meta:
+        return None
+    return {
+        "gen_dir": _norm(gen_dir),
+        "name": meta.get("name") or _name_of(gen_dir),
+        "plan_hash": meta.get("plan_sha256") or meta.get("plan_hash") or "",
+        "project_type": meta.get("type") or meta.get("project_type") or "",
+        "run_dir": meta.get("source_run") or meta.get("run_dir") or "",
+        "updated_at": (gen_dir / lib_gensync.META_FILE).stat().st_mtime,
+    }
+
+
+class GenIndex:
+    def __init__(self, db_path: Path = DB_PATH, generated: Path = GENERATED) -> None:
+        self.db_path = db_path
+        self.generated = generated
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(db_path), timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "GenIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- writes ----
+    def record(self, gen_dir: PathLike, name: str = "", plan_hash: str = "", run_dir: PathLike = "",
+               project_type: str = "", updated_at: Optional[float] = None) -> None:
+        gd = _norm(gen_dir)
+        plan_hash = (plan_hash or "").strip()
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO gen_dirs (gen_dir, name, plan_hash, plan_key, project_type, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (gd, name or _name_of(Path(gd)), plan_hash, plan_hash[:KEY_LEN], project_type,
+                 time.time() if updated_at is None else updated_at))
+            if run_dir:
+                self.db.execute("INSERT OR REPLACE INTO gen_runs (run_dir, gen_dir) VALUES (?, ?)",
+                                (_norm(run_dir), gd))
+
+    def forget(self, gen_dir: PathLike) -> None:
+        gd = str(gen_dir)
+        with self.db:
+            self.db.execute("DELETE FROM gen_dirs WHERE gen_dir = ?", (gd,))
+            self.db.execute("DELETE FROM gen_runs WHERE gen_dir = ?", (gd,))
+
+    def prune_missing(self) -> int:
+        gone = [r[0] for r in self.db.execute("SELECT gen_dir FROM gen_dirs") if not Path(r[0]).is_dir()]
+        for gd in gone:
+            self.forget(gd)
+        return len(gone)
+
+    def _markers(self) -> List[Dict[str, Any]]:
+        rows = []
+        if self.generated.exists():
+            for d in self.generated.iterdir():
+                if d.is_dir() and not d.name.startswith("."):
+                    row = scan_marker(d)
+                    if row is not None:
+                        rows.append(row)
+        return rows
+
+    def scan(self) -> int:
+        """
+        Add what the markers on disk know and the index does not (a record() that
+        failed). Unlike reindex, existing rows stay, so do runs that reused a dir.
+        """
+        known = {r[0] for r in self.db.execute("SELECT gen_dir FROM gen_dirs")}
+        added = 0
+        for r in self._markers():
+            if r["gen_dir"] not in known:
+                self.record(r["gen_dir"], r["name"], r["plan_hash"], r["run_dir"], r["project_type"], r["updated_at"])
+                added += 1
+            elif r["run_dir"]:
+                with self.db:
+                    self.db.execute("INSERT OR IGNORE INTO gen_runs (run_dir, gen_dir) VALUES (?, ?)",
+                                    (_norm(r["run_dir"]), r["gen_dir"]))
+        return added
+
+    def reindex(self) -> int:
+        rows = self._markers()
+        with self.db:
+            self.db.execute("DELETE FROM gen_dirs")
+            self.db.execute("DELETE FROM gen_runs")
+        for r in rows:
+            self.record(r["gen_dir"], r["name"], r["plan_hash"], r["run_dir"], r["project_type"], r["updated_at"])
+        return len(rows)
+
+    # ---- reads ----
+    def _alive(self, rows: Iterable[sqlite3.Row]) -> Optional[Path]:
+        for r in rows:
+            p = Path(r["gen_dir"])
+            if p.is_dir():
+                return p
+            self.forget(r["gen_dir"])
+        return None
+
+    def by_plan(self, plan_hash: str) -> Optional[Path]:
+        """Dir generated for this plan hash (full sha256 or its 12-char prefix), newest first."""
+        h = (plan_hash or "").strip()
+        if not h:
+            return None
+        rows = [r for r in self.db.execute(
+            "SELECT gen_dir, plan_hash FROM gen_dirs WHERE plan_key = ? ORDER BY updated_at DESC", (h[:KEY_LEN],))
+            if r["plan_hash"].startswith(h) or h.startswith(r["plan_hash"])]
+        return self._alive(rows)
+
+    def by_run(self, run_dir: PathLike) -> Optional[Path]:
+        if not run_dir:
+            return None
+        return self._alive(self.db.execute("SELECT gen_dir FROM gen_runs WHERE run_dir = ?", (_norm(run_dir),)))
+
+    def by_name(self, name: str) -> Optional[Path]:
+        """Most recently (re)generated dir of this project name."""
+        return self._alive(self.db.execute(
+            "SELECT gen_dir FROM gen_dirs WHERE name = ? ORDER BY updated_at DESC", (name,)))
+
+    def count(self) -> int:
+        return int(self.db.execute("SELECT COUNT(*) FROM gen_dirs").fetchone()[0])
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [dict(r) for r in self.db.execute("SELECT * FROM gen_dirs ORDER BY updated_at DESC")]
+
+
+def open_index() -> GenIndex:
+    """Open (and on first use build from the markers on disk) the index."""
+    idx = GenIndex()
+    if idx.count() == 0:
+        idx.reindex()
+    return idx
+
+
+def record(gen_dir: PathLike, **kw: Any) -> None:
+    """Best-effort hook for the scaffolders: never fail a scaffold because of the index."""
+    try:
+        with open_index() as idx:
+            idx.record(gen_dir, **kw)
+    except Exception:
+        pass
+
+
+# lookups are best-effort like record(): an unreadable / read-only index is a miss, not a crash
+def by_plan(plan_hash: str) -> Optional[Path]:
+    try:
+        with open_index() as idx:
+            return idx.by_plan(plan_hash)
+    except (sqlite3.Error, OSError):
+        return None
+
+
+def by_run(run_dir: PathLike) -> Optional[Path]:
+    try:
+        with open_index() as idx:
+            return idx.by_run(run_dir)
+    except (sqlite3.Error, OSError):
+        return None
+
+
+def by_name(name: str) -> Optional[Path]:
+    try:
+        with open_index() as idx:
+            return idx.by_name(name)
+    except (sqlite3.Error, OSError):
+        return None
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Index of generated projects (plan hash / run dir / name -> gen dir).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    lk = sub.add_parser("lookup", help="print the gen dir (exit 1 if unknown); first given key that hits wins")
+    lk.add_argument("--run-dir", default="")
+    lk.add_argument("--plan-hash", default="")
+    lk.add_argument("--name", default="")
+    sub.add_parser("reindex", help="rebuild from apps/generated/*/.generated_from_run")
+    sub.add_parser("prune", help="drop rows whose gen dir no longer exists")
+    sub.add_parser("list", help="all indexed dirs, newest first")
+    args = ap.parse_args()
+
+    if args.cmd == "reindex":
+        with GenIndex() as idx:
+            print(f"[genindex] reindexed dirs={idx.reindex()}")
+        return 0
+    with open_index() as idx:
+        if args.cmd == "prune":
+            print(f"[genindex] pruned={idx.prune_missing()}")
+            return 0
+        if args.cmd == "list":
+            for r in idx.list():
+                print(f"{r['plan_key'] or '-':<12}  {r['project_type'] or '-':<12} {r['gen_dir']}")
+            return 0
+        hit = idx.by_run(args.run_dir) or idx.by_plan(args.plan_hash) or (idx.by_name(args.name) if args.name else None)
+        if hit is None:
+            idx.scan()  # a miss may be a record() that failed: the markers on disk have the last word
+            hit = idx.by_run(args.run_dir) or idx.by_plan(args.plan_hash) or (idx.by_name(args.name) if args.name else None)
+    if hit is None:
+        return 1
+    sys.stdout.write(f"{hit}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Incremental materialization of generated projects.
+
+Scaffolders render the whole project as {relative path: content} and hand
+it to sync_tree(), which diffs it against what is on disk and only touches
+what changed:
+
+  - unchanged files are not written at all (mtimes stay put, so pip -e,
+    next build, tsc --incremental keep their caches)
+  - new / changed files are written atomically (temp file + rename)
+  - files the previous generation wrote but the new plan no longer has are
+    deleted (empty parent dirs too), unless they were edited since: a file
+    whose bytes no longer match its recorded hash is kept and reported
+    (kept_modified); files nobody generated (.venv, node_modules, .next,
+    local notes) are never touched
+
+The per-file sha256 of the last generation lives in the project's
+.generated_from_run marker, next to the existing key=value lines:
+
+  run_dir=/.../artifacts/runs/run_...
+  plan_hash=1a2b3c4d5e6f
+  sha256:app/page.tsx=9f86d08...
+
+  res = sync_tree(out_dir, files, {"run_dir": str(run_dir), "plan_hash": h})
+  print(res.summary())      # [diff] +2 ~1 -1 =14
+
+Large plans (hundreds or thousands of files) are materialized in three steps
+instead of a resolve() + mkdir + write per file:
+
+  1. plan_paths(): every path is checked lexically against the resolved
+     target in one pass; only each distinct directory is resolve()d (once),
+     so a symlinked dir cannot lead outside the target
+  2. each directory is created once, parents first
+  3. files are compared / written one after the other; workers=N > 1 opts
+     into a thread pool (scaffold.py --workers / $SCAFFOLD_WORKERS). Measured
+     with scaffold_bench.py the pool never beat the sequential loop, so it
+     is off by default
+
+direct=True writes each new file with a single open/write/close instead of
+temp file + rename: fastest for a fresh target, but a reader may see a
+half-written file, so it is opt-in (scaffold.py --direct). Changed files
+are always replaced atomically.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import posixpath
+import secrets
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import lib_run
+
+META_FILE = ".generated_from_run"
+HASH_PREFIX = "sha256:"
+DEFAULT_WORKERS = 1  # sequential; see scaffold_bench.py before raising it
+PARALLEL_MIN = 64  # with workers > 1, fewer files than this are still written sequentially
+
+_O_NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_meta(dirpath: Path) -> Dict[str, str]:
+    """key=value lines of the marker ({} if missing); hash lines keep their full 'sha256:<path>' key."""
+    mp = Path(dirpath) / META_FILE
+    try:
+        text = mp.read_text(encoding="utf-8", errors="replace")
+    except OSError:
+        return {}
+    meta: Dict[str, str] = {}
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        # paths may contain "=", hashes never do
+        k, v = line.rsplit("=", 1) if line.startswith(HASH_PREFIX) else line.split("=", 1)
+        meta[k.strip()] = v.strip()
+    return meta
+
+
+def file_hashes(meta: Dict[str, str]) -> Dict[str, str]:
+    return {k[len(HASH_PREFIX):]: v for k, v in meta.items() if k.startswith(HASH_PREFIX)}
+
+
+def _inside(base: Path, rel: str) -> Path:
+    p = (base / rel).resolve()
+    if p == base or not str(p).startswith(str(base) + os.sep):
+        raise ValueError(f"path escapes target: {rel}")
+    return p
+
+
+def plan_paths(base: Path, rels: Iterable[str]) -> Tuple[Dict[str, Path], List[Path]]:
+    """
+    ({normalized rel: absolute path}, directories to create parents-first) for a
+    resolved base. ValueError on the first path that is absolute, empty or leaves base.
+    """
+    prefix = str(base) + os.sep
+    paths: Dict[str, Path] = {}
+    dirs = set()
+    for rel in rels:
+        norm = posixpath.normpath(rel) if rel else ""
+        if norm in ("", ".", "..") or norm.startswith(("/", "../")):
+            raise ValueError(f"path escapes target: {rel}")
+        paths[norm] = base / norm
+        d = posixpath.dirname(norm)
+        while d and d not in dirs:
+            dirs.add(d)
+            d = posixpath.dirname(d)
+    for d in dirs:
+        # existing dirs may be symlinks; one resolve() per directory, not per file
+        real = str((base / d).resolve())
+        if not (real + os.sep).startswith(prefix):
+            raise ValueError(f"path escapes target: {d}/")
+    return paths, [base / d for d in sorted(dirs, key=lambda d: d.count("/"))]
+
+
+def _write_replace(p: Path, data: bytes) -> None:
+    tmp = p.with_name(f".{p.name}.{os.getpid()}.{secrets.token_hex(4)}.tmp")
+    try:
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, p)
+    finally:
+        if os.path.lexists(tmp):
+            tmp.unlink()
+
+
+def _write_direct(p: Path, data: bytes) -> None:
+    try:
+        fd = os.open(p, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | _O_NOFOLLOW, 0o644)
+    except OSError:
+        _write_replace(p, data)  # a symlink in the way (ELOOP): replace it, never write through it
+        return
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+
+
+def _materialize(p: Path, data: bytes, direct: bool) -> Tuple[str, str]:
+    """('added' | 'changed' | 'unchanged', sha256) for one file; writes only if the bytes differ."""
+    h = sha256_bytes(data)
+    try:
+        st = os.lstat(p)
+    except FileNotFoundError:
+        st = None
+    if st is not None and stat.S_ISREG(st.st_mode) and st.st_size == len(data):
+        try:
+            with open(p, "rb") as fh:
+                if fh.read() == data:
+                    return "unchanged", h
+        except OSError:
+            pass
+    (_write_direct if direct and st is None else _write_replace)(p, data)
+    return ("added" if st is None else "changed"), h
+
+
+class SyncResult:
+    __slots__ = ("target", "added", "changed", "removed", "kept_modified", "unchanged", "workers", "elapsed_ms")
+
+    def __init__(self, target: Path) -> None:
+        self.target = target
+        self.added: List[str] = []
+        self.changed: List[str] = []
+        self.removed: List[str] = []
+        self.kept_modified: List[str] = []
+        self.unchanged: List[str] = []
+        self.workers = 1
+        self.elapsed_ms = 0.0
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def summary(self) -> str:
+        kept = f" !{len(self.kept_modified)}" if self.kept_modified else ""
+        return (f"[diff] +{len(self.added)} ~{len(self.changed)} -{len(self.removed)}{kept} "
+                f"={len(self.unchanged)} ({self.target})")
+
+    def lines(self) -> List[str]:
+        return ([f"  + {p}" for p in self.added] + [f"  ~ {p}" for p in self.changed]
+                + [f"  - {p}" for p in self.removed]
+                + [f"  ! {p} (dropped from the plan, edited locally: kept)" for p in self.kept_modified])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"target": str(self.target), "added": self.added, "changed": self.changed,
+                "removed": self.removed, "kept_modified": self.kept_modified, "unchanged": len(self.unchanged),
+                "workers": self.workers, "elapsed_ms": round(self.elapsed_ms, 1)}
+
+
+def sync_tree(target: Path, files: Dict[str, str], meta: Dict[str, str],
+              workers: Optional[int] = None, direct: bool = False) -> SyncResult:
+    """
+    Make target hold exactly files (of those it generated), then rewrite the marker
+    with meta + hashes. workers: thread pool size (default DEFAULT_WORKERS: sequential);
+    direct: write new files in place without temp file + rename.
+    """
+    t0 = time.perf_counter()
+    target = Path(target)
+    target.mkdir(parents=True, exist_ok=True)
+    base = target.resolve()
+    res = SyncResult(target)
+    old = file_hashes(read_meta(target))
+
+    paths, dirs = plan_paths(base, files)
+    contents = {posixpath.normpath(rel): content.encode("utf-8") for rel, content in files.items()}
+    for d in dirs:
+        d.mkdir(exist_ok=True)
+
+    rels = sorted(paths)
+    n = workers if workers is not None else DEFAULT_WORKERS
+    if n > 1 and len(rels) >= PARALLEL_MIN:
+        res.workers = n
+        with ThreadPoolExecutor(max_workers=n) as ex:
+            done = list(ex.map(lambda r: _materialize(paths[r], contents[r], direct), rels))
+    else:
+        done = [_materialize(paths[r], contents[r], direct) for r in rels]
+
+    new_hashes: Dict[str, str] = {}
+    for rel, (state, h) in zip(rels, done):
+        new_hashes[rel] = h
+        getattr(res, state).append(rel)
+
+    for rel in sorted(set(old) - set(new_hashes)):
+        try:
+            p = _inside(base, rel)
+        except ValueError:
+            continue
+        if p.is_file():
+            try:
+                edited = sha256_bytes(p.read_bytes()) != old[rel]
+            except OSError:
+                continue
+            if edited:
+                # not ours any more: leave it, and out of the marker so later syncs ignore it too
+                res.kept_modified.append(rel)
+                continue
+            p.unlink()
+            res.removed.append(rel)
+            d = p.parent
+            while d != base and not any(d.iterdir()):
+                d.rmdir()
+                d = d.parent
+
+    lines = [f"{k}={v}" for k, v in meta.items()]
+    lines += [f"{HASH_PREFIX}{rel}={h}" for rel, h in sorted(new_hashes.items())]
+    lib_run.write_atomic(target / META_FILE, "\n".join(lines) + "\n")
+    res.elapsed_ms = (time.perf_counter() - t0) * 1000
+    return res
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+JSON mode for chat completions: turn a json_only policy decision into a
+response_format on the request, and fall back gracefully where the
+provider does not support it.
+
+Modes, strongest first:
+  json_schema  response_format={"type": "json_schema", "json_schema": {name, schema}}
+               (our schema file, minus the x-* / $ keys providers reject)
+  json_object  response_format={"type": "json_object"}
+  off          prompt-only ("Return ONLY JSON"), what every provider understands
+
+The prompt instructions stay in every mode, so "off" is exactly the old
+behaviour. When a provider answers 400/422 complaining about
+response_format / json_schema, JsonMode.call() re-sends the same request
+one mode weaker right away and remembers that for the model in
+artifacts/tmp/json_mode.cache.json, so later runs start at a mode that
+works instead of paying the rejected call again (delete the file to probe
+again after a provider upgrade).
+
+  jm = JsonMode("json_schema", model, SCHEMA_PATH, name="plan")
+  resp = jm.call(payload, lambda p: http_post(url, headers, p))
+  run.write_json("json_mode.json", jm.to_dict())
+
+json_mode.json (requested / used mode, fallbacks, llm_calls) is what
+plan_policy.py / plan_web_policy.py copy into policy.trace.json.
+"""
+from __future__ import annotations
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.error import HTTPError
+
+import lib_run
+import lib_schema
+
+MODES = ("json_schema", "json_object", "off")
+CACHE_PATH = lib_run.ROOT / "artifacts" / "tmp" / "json_mode.cache.json"
+
+# provider error text that means "this request shape is not supported"
+_UNSUPPORTED_HINTS = ("response_format", "json_schema", "json_object", "json mode", "structured output")
+
+
+def weaker(mode: str) -> str:
+    i = MODES.index(mode) if mode in MODES else len(MODES) - 1
+    return MODES[min(i + 1, len(MODES) - 1)]
+
+
+def schema_for_request(schema: Any) -> Any:
+    """Schema as sent to the provider: our own x-* annotations and $schema/$id removed."""
+    if isinstance(schema, dict):
+        return {k: schema_for_request(v) for k, v in schema.items() if not k.startswith(("x-", "$"))}
+    if isinstance(schema, list):
+        return [schema_for_request(v) for v in schema]
+    return schema
+
+
+def response_format(mode: str, schema_path: Optional[Path] = None, name: str = "output") -> Optional[Dict[str, Any]]:
+    if mode == "json_schema" and schema_path is not None:
+        schema = lib_schema.load_validator(Path(schema_path)).schema  # type: ignore[attr-defined]
+        return {"type": "json_schema",
+                "json_schema": {"name": name, "strict": False, "schema": schema_for_request(schema)}}
+    if mode in ("json_schema", "json_object"):
+        return {"type": "json_object"}
+    return None
+
+
+def error_body(e: HTTPError) -> str:
+    """Response body of an HTTPError; read once and kept on the exception for later handlers."""
+    body = getattr(e, "body_text", None)
+    if body is None:
+        try:
+            body = e.read().decode("utf-8", errors="replace")
+        except Exception:
+            body = ""
+        e.body_text = body  # type: ignore[attr-defined]
+    return body
+
+
+def unsupported(status: int, body: str) -> bool:
+    low = (body or "").lower()
+    return status in (400, 422) and any(h in low for h in _UNSUPPORTED_HINTS)
+
+
+def _load_cache() -> Dict[str, Any]:
+    try:
+        return json.loads(CACHE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def known_mode(model: str) -> Optional[str]:
+    """Strongest mode known to work for model (None = never rejected)."""
+    hit = _load_cache().get(model)
+    return hit.get("mode") if isinstance(hit, dict) else None
+
+
+def remember(model: str, mode: str) -> None:
+    try:
+        cache = _load_cache()
+        cache[model] = {"mode": mode, "ts": int(time.time())}
+        lib_run.write_atomic(CACHE_PATH, json.dumps(cache, ensure_ascii=False, indent=2, sort_keys=True) + "\n")
+    except OSError:
+        pass
+
+
+class JsonMode:
+    __slots__ = ("requested", "mode", "model", "schema_path", "name", "fallbacks", "llm_calls")
+
+    def __init__(self, requested: str, model: str, schema_path: Optional[Path] = None, name: str = "output") -> None:
+        self.requested = requested if requested in MODES else "off"
+        self.model = model
+        self.schema_path = schema_path
+        self.name = name
+        mode = self.requested
+        known = known_mode(model) if mode != "off" else None
+        if known in MODES and MODES.index(known) > MODES.index(mode):
+            mode = known
+        self.mode = mode
+        self.fallbacks: List[Dict[str, Any]] = []
+        self.llm_calls = 0
+
+    def apply(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        rf = response_format(self.mode, self.schema_path, self.name)
+        return {**payload, "response_format": rf} if rf else dict(payload)
+
+    def call(self, payload: Dict[str, Any], send: Callable[[Dict[str, Any]], Any]) -> Any:
+        """send(payload with response_format); re-sent one mode weaker while the provider rejects the mode."""
+        while True:
+            self.llm_calls += 1
+            try:
+                return send(self.apply(payload))
+            except HTTPError as e:
+                if self.mode == "off" or not unsupported(e.code, error_body(e)):
+                    raise
+                self.fallbacks.append({"mode": self.mode, "http_status": e.code,
+                                       "error": error_body(e)[:300]})
+                self.mode = weaker(self.mode)
+                remember(self.model, self.mode)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"requested": self.requested, "used": self.mode, "model": self.model,
+                "fallbacks": self.fallbacks, "llm_calls": self.llm_calls}
+
+
+def read_run(run_dir: str) -> Optional[Dict[str, Any]]:
+    """json_mode.json of a plan run, if the planner wrote one."""
+    try:
+        return json.loads((Path(run_dir) / "json_mode.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def summarize(requested: str, attempts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    policy.trace.json "json_mode": what was asked for, what providers accepted,
+    and how many LLM calls the policy attempts took. validation_retries (calls
+    that only re-asked after invalid output) is the number JSON mode should cut.
+    """
+    modes = [a["json_mode"] for a in attempts if a.get("json_mode")]
+    calls = sum(int(m.get("llm_calls") or 0) for m in modes)
+    fallbacks = sum(len(m.get("fallbacks") or []) for m in modes)
+    return {
+        "requested": requested,
+        "used": [m.get("used") for m in modes],
+        "llm_calls": calls,
+        "fallback_calls": fallbacks,
+        "validation_retries": max(0, calls - fallbacks - len(modes)),
+    }
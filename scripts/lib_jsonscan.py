@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Find the first complete top-level JSON object in model output, in one pass.
+
+Model replies wrap the plan in prose, ``` fences or trailing commentary.
+ObjectScanner walks the text once, tracking brace depth and whether it is
+inside a "string" (with \\ escapes), so braces in string values and in
+trailing prose never confuse it. The moment the outermost } of an object
+arrives it is parsed and returned; nothing after it has to be read.
+
+It works the same over a whole string or over streamed chunks (SSE deltas
+of any size, split anywhere, even inside an escape):
+
+  sc = ObjectScanner()
+  for delta in stream:
+      obj = sc.feed(delta)
+      if obj is not None:
+          break            # validate now, stop reading the stream
+  else:
+      obj = sc.finish()    # end of input: None if there is no object
+
+A balanced {...} that is not valid JSON (e.g. "{name}" in prose) is
+skipped and scanning resumes right after its opening brace.
+
+  extract_object(text)       -> dict, ValueError if none
+  extract_object_text(text)  -> raw text of the object, or None
+
+StreamParser goes one step further for validation while the reply is still
+streaming: it parses the first object incrementally and reports every key
+and every completed value (scalars, and containers when they close) with
+its path, as soon as the closing character has arrived:
+
+  p = StreamParser(on_key=lambda path, key: ..., on_value=lambda path, v: ...)
+  p.feed(delta)            # path: ("files", 0, "path")
+  p.done / p.value         # top-level object closed
+  p.broken                 # not parseable JSON (message); no more events
+
+Like ObjectScanner it skips prose before the first {, but it does not
+backtrack: a "{" in leading prose makes it broken, and callers fall back to
+checking the whole reply at the end.
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# next char that matters outside / inside a string
+_OUTSIDE = re.compile(r'[{}"]')
+_IN_STRING = re.compile(r'["\\]')
+_WS = re.compile(r"[ \t\r\n]*")
+_NUMBER_CHARS = re.compile(r"[-+0-9.eE]+")
+_NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?")
+_LITERALS = (("true", True), ("false", False), ("null", None))
+
+Path_ = Tuple[Any, ...]  # ("files", 0, "path")
+
+
+class ObjectScanner:
+    __slots__ = ("_depth", "_in_str", "_esc", "_parts", "result", "text", "first_candidate")
+
+    def __init__(self) -> None:
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._parts: List[str] = []  # current candidate, from its opening brace
+        self.result: Optional[Dict[str, Any]] = None
+        self.text: Optional[str] = None  # raw text of result
+        self.first_candidate: Optional[str] = None  # first balanced {...}, even if it did not parse
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def _reset(self) -> None:
+        self._depth = 0
+        self._in_str = False
+        self._esc = False
+        self._parts = []
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Scan one more chunk; returns the object as soon as it is complete (then ignores further input)."""
+        pending = chunk
+        while pending and self.result is None:
+            pending = self._scan(pending)
+        return self.result
+
+    def _scan(self, chunk: str) -> str:
+        """Scan chunk; returns text that must be rescanned (after a candidate failed to parse)."""
+        pos = 0
+        start = 0 if self._depth else -1  # where the candidate starts in this chunk
+        n = len(chunk)
+        if self._esc:
+            self._esc = False
+            pos = 1
+        while pos < n:
+            if self._in_str:
+                m = _IN_STRING.search(chunk, pos)
+                if m is None:
+                    pos = n
+                    break
+                if m.group() == "\\":
+                    if m.end() >= n:
+                        self._esc = True  # the escaped char is in the next chunk
+                        pos = n
+                        break
+                    pos = m.end() + 1
+                    continue
+                self._in_str = False
+                pos = m.end()
+                continue
+
+            if self._depth == 0:
+                i = chunk.find("{", pos)
+                if i < 0:
+                    pos = n
+                    break
+                self._depth, start, pos = 1, i, i + 1
+                continue
+
+            m = _OUTSIDE.search(chunk, pos)
+            if m is None:
+                pos = n
+                break
+            c, pos = m.group(), m.end()
+            if c == '"':
+                self._in_str = True
+            elif c == "{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    cand = "".join(self._parts) + chunk[start:pos]
+                    self._parts = []
+                    if self.first_candidate is None:
+                        self.first_candidate = cand
+                    try:
+                        obj = json.loads(cand)
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict):
+                        self.result, self.text = obj, cand
+                        return ""
+                    # not an object: resume right after its opening brace
+                    self._reset()
+                    return cand[1:] + chunk[pos:]
+        if self._depth:
+            self._parts.append(chunk[max(start, 0):])
+        return ""
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """End of input. An unclosed candidate may hide a real object after its brace: rescan from there."""
+        while self.result is None and self._depth:
+            rest = "".join(self._parts)[1:]
+            self._reset()
+            self.feed(rest)
+        return self.result
+
+
+class StreamParser:
+    __slots__ = ("on_key", "on_value", "_buf", "_pos", "_scan", "_stack", "_expect", "_key", "value", "broken")
+
+    def __init__(self, on_key: Optional[Callable[[Path_, str], None]] = None,
+                 on_value: Optional[Callable[[Path_, Any], None]] = None) -> None:
+        self.on_key = on_key
+        self.on_value = on_value
+        self._buf = ""
+        self._pos = 0
+        self._scan = 0  # how far the pending string token has been scanned (relative to its quote)
+        self._stack: List[Tuple[Any, Path_]] = []  # open containers with their paths
+        # what may come next: start, first_key, key, colon, first_value, value, next
+        self._expect = "start"
+        self._key = ""  # key awaiting its value in the innermost object
+        self.value: Optional[Dict[str, Any]] = None
+        self.broken: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        return self.value is not None
+
+    def feed(self, chunk: str) -> bool:
+        """Parse one more chunk; True once the top-level object is complete (further input is ignored)."""
+        if self.value is not None or self.broken is not None:
+            return self.value is not None
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        try:
+            self._run()
+        except ValueError as e:
+            self.broken = str(e)
+        return self.value is not None
+
+    def _child_path(self) -> Path_:
+        parent, path = self._stack[-1]
+        if isinstance(parent, dict):
+            return path + (self._key,)
+        return path + (len(parent),)
+
+    def _close(self, v: Any, path: Path_) -> None:
+        if self.on_value is not None:
+            self.on_value(path, v)
+        if not self._stack:
+            self.value = v
+            return
+        parent = self._stack[-1][0]
+        if isinstance(parent, dict):
+            parent[path[-1]] = v
+        else:
+            parent.append(v)
+        self._expect = "next"
+
+    def _string_end(self, buf: str, start: int) -> int:
+        """Index after the closing quote of the string at start, or -1 if it has not fully arrived."""
+        i = start + max(1, self._scan)
+        while True:
+            m = _IN_STRING.search(buf, i)
+            if m is None:
+                self._scan = len(buf) - start
+                return -1
+            if m.group() == "\\":
+                if m.end() >= len(buf):
+                    self._scan = m.start() - start  # the escaped char is in the next chunk
+                    return -1
+                i = m.end() + 1
+                continue
+            self._scan = 0
+            return m.end()
+
+    def _run(self) -> None:
+        buf, n = self._buf, len(self._buf)
+        pos = self._pos
+        while self.value is None:
+            if self._expect == "start":
+                i = buf.find("{", pos)
+                if i < 0:
+                    pos = n
+                    break
+                pos = i
+                self._expect = "value"
+            pos = _WS.match(buf, pos).end()
+            if pos >= n:
+                break
+            c, exp = buf[pos], self._expect
+
+            if exp in ("first_key", "key"):
+                if c == "}" and exp == "first_key":
+                    obj, path = self._stack.pop()
+                    pos += 1
+                    self._close(obj, path)
+                    continue
+                if c != '"':
+                    raise ValueError(f"expected a key at offset {pos}")
+                end = self._string_end(buf, pos)
+                if end < 0:
+                    break
+                key = json.loads(buf[pos:end])
+                pos = end
+                self._key = key
+                if self.on_key is not None:
+                    self.on_key(self._stack[-1][1], key)
+                self._expect = "colon"
+                continue
+
+            if exp == "colon":
+                if c != ":":
+                    raise ValueError(f"expected ':' at offset {pos}")
+                pos += 1
+                self._expect = "value"
+                continue
+
+            if exp == "next":
+                container = self._stack[-1][0]
+                closer = "}" if isinstance(container, dict) else "]"
+                if c == ",":
+                    pos += 1
+                    self._expect = "key" if closer == "}" else "value"
+                elif c == closer:
+                    obj, path = self._stack.pop()
+                    pos += 1
+                    self._close(obj, path)
+                else:
+                    raise ValueError(f"expected ',' or {closer!r} at offset {pos}")
+                continue
+
+            # a value (exp: value / first_value)
+            if c == "]" and exp == "first_value":
+                obj, path = self._stack.pop()
+                pos += 1
+                self._close(obj, path)
+                continue
+            path = self._child_path() if self._stack else ()
+            if c == "{" or c == "[":
+                self._stack.append(({} if c == "{" else [], path))
+                self._expect = "first_key" if c == "{" else "first_value"
+                pos += 1
+            elif c == '"':
+                end = self._string_end(buf, pos)
+                if end < 0:
+                    break
+                v = json.loads(buf[pos:end])
+                pos = end
+                self._close(v, path)
+            elif c == "-" or c.isdigit():
+                m = _NUMBER_CHARS.match(buf, pos)
+                if m.end() >= n:
+                    break  # more digits may follow (a number is never the last char of an object)
+                if not _NUMBER.fullmatch(m.group()):
+                    raise ValueError(f"bad number at offset {pos}")
+                v = json.loads(m.group())
+                pos = m.end()
+                self._close(v, path)
+            else:
+                word = next((w for w in _LITERALS if buf.startswith(w[0], pos)), None)
+                if word is None:
+                    if any(w.startswith(buf[pos:n]) for w, _ in _LITERALS):
+                        break  # "tr" so far
+                    raise ValueError(f"unexpected {c!r} at offset {pos}")
+                pos += len(word[0])
+                self._close(word[1], path)
+        self._pos = pos
+
+
+def extract_object_text(text: str) -> Optional[str]:
+    sc = ObjectScanner()
+    sc.feed(text or "")
+    sc.finish()
+    return sc.text
+
+
+def extract_object(text: str) -> Dict[str, Any]:
+    sc = ObjectScanner()
+    sc.feed(text or "")
+    obj = sc.finish()
+    if obj is None:
+        raise ValueError("no JSON object found")
+    return obj
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Segmented append logs: rotation + compressed archive + window-aware readers.
+
+Layout for a live log (e.g. logs/ask_history.log):
+
+  logs/ask_history.log                              live segment (appended by ask.sh)
+  logs/archive/ask_history.log/manifest.json        closed segments + ts range
+  logs/archive/ask_history.log/seg_<ts>_<id>.gz     closed segment (gzip or zstd)
+
+Readers call iter_lines(path, since=...) and only open segments whose
+[ts_min, ts_max] overlaps the requested window. Compressed segments are
+streamed, never fully decompressed into memory.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import gzip
+import io
+import json
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl  # POSIX only
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+try:
+    import zstandard  # optional: pip install zstandard
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+MANIFEST = "manifest.json"
+CODEC_EXT = {"gzip": ".gz", "zstd": ".zst", "none": ".log"}
+
+DEFAULT_MAX_BYTES = int(os.environ.get("LOG_ROTATE_MAX_BYTES", str(8 * 1024 * 1024)))
+DEFAULT_MAX_AGE_S = float(os.environ.get("LOG_ROTATE_MAX_AGE_H", "168")) * 3600.0
+DEFAULT_CODEC = os.environ.get("LOG_ROTATE_CODEC", "gzip")
+
+
+# ---------------- timestamps ----------------
+
+def line_ts(line: str) -> Optional[float]:
+    """
+    Epoch seconds of a log line, or None.
+    - ask_history.log: "2026-02-10T12:34:56Z mode=... model=..."
+    - events.jsonl:    {"ts_ms": 1739..., "ts_utc": "..."}
+    """
+    s = line.strip()
+    if not s:
+        return None
+    if s.startswith("{"):
+        try:
+            obj = json.loads(s)
+        except Exception:
+            return None
+        if not isinstance(obj, dict):
+            return None
+        ts_ms = obj.get("ts_ms")
+        if isinstance(ts_ms, (int, float)):
+            return float(ts_ms) / 1000.0
+        ts = obj.get("ts_utc")
+        if isinstance(ts, str) and ts:
+            try:
+                return dt.datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
+            except Exception:
+                return None
+        return None
+    head = s.split(None, 1)[0]
+    try:
+        return dt.datetime.strptime(head, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=dt.timezone.utc).timestamp()
+    except Exception:
+        return None
+
+
+def _first_ts(path: Path, max_lines: int = 50) -> Optional[float]:
+    try:
+        with path.open("r", encoding="utf-8", errors="replace") as f:
+            for _ in range(max_lines):
+                line = f.readline()
+                if not line:
+                    break
+                ts = line_ts(line)
+                if ts is not None:
+                    return ts
+    except OSError:
+        return None
+    return None
+
+
+# ---------------- archive + manifest ----------------
+
+def archive_dir(log_path: Path) -> Path:
+    return log_path.parent / "archive" / log_path.name
+
+
+def _lock(dirpath: Path):
+    dirpath.mkdir(parents=True, exist_ok=True)
+    f = (dirpath / ".lock").open("a+")
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    return f
+
+
+def load_manifest(log_path: Path) -> Dict[str, Any]:
+    mp = archive_dir(log_path) / MANIFEST
+    try:
+        obj = json.loads(mp.read_text(encoding="utf-8"))
+        if isinstance(obj, dict) and isinstance(obj.get("segments"), list):
+            return obj
+    except Exception:
+        pass
+    return {"version": 1, "log": log_path.name, "segments": []}
+
+
+def _write_manifest(log_path: Path, manifest: Dict[str, Any]) -> None:
+    mp = archive_dir(log_path) / MANIFEST
+    tmp = mp.with_name(f".{MANIFEST}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, mp)
+
+
+def _resolve_codec(codec: str) -> str:
+    codec = (codec or "gzip").strip().lower()
+    if codec not in CODEC_EXT:
+        raise ValueError(f"unknown codec: {codec} (gzip|zstd|none)")
+    if codec == "zstd" and zstandard is None:
+        print("[logseg][warn] zstandard not installed, falling back to gzip", file=sys.stderr)
+        return "gzip"
+    return codec
+
+
+def _open_write(path: Path, codec: str):
+    if codec == "gzip":
+        return gzip.open(path, "wb", compresslevel=6)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=6).stream_writer(path.open("wb"), closefd=True)
+    return path.open("wb")
+
+
+def _open_read_text(path: Path, codec: str) -> io.TextIOBase:
+    if codec == "gzip":
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError(f"zstandard not installed, cannot read {path}")
+        raw = zstandard.ZstdDecompressor().stream_reader(path.open("rb"), closefd=True)
+        return io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+    return path.open("r", encoding="utf-8", errors="replace")
+
+
+def needs_rotation(log_path: Path, max_bytes: int = DEFAULT_MAX_BYTES,
+                   max_age_s: float = DEFAULT_MAX_AGE_S, now: Optional[float] = None) -> bool:
+    try:
+        st = log_path.stat()
+    except OSError:
+        return False
+    if st.st_size == 0:
+        return False
+    if max_bytes > 0 and st.st_size >= max_bytes:
+        return True
+    if max_age_s > 0:
+        first = _first_ts(log_path)
+        if first is not None and (now or time.time()) - first >= max_age_s:
+            return True
+    return False
+
+
+def _seg_id(name: str) -> str:
+    # seg_<ts>_<id>.<ext> -> <ts>_<id>
+    return name[len("seg_"):].split(".", 1)[0]
+
+
+def _close_segment(log_path: Path, staging: Path, codec: str) -> Dict[str, Any]:
+    """
+    Stream-compress a staged seg_<id>.open into the archive and register it in
+    the manifest; the .open file is removed only after the manifest names its
+    replacement, so a crash anywhere in between loses nothing (see _recover).
+    Caller holds the archive lock.
+    """
+    adir = archive_dir(log_path)
+    seg_id = _seg_id(staging.name)
+    out = adir / f"seg_{seg_id}{CODEC_EXT[codec]}"
+    tmp = out.with_name(out.name + ".tmp")
+    ts_min: Optional[float] = None
+    ts_max: Optional[float] = None
+    lines = 0
+    raw_bytes = 0
+    with staging.open("rb") as src:
+        # writers flock the live file (lib_append, ask.sh): once we hold it, none is mid-write on this inode
+        if fcntl is not None:
+            fcntl.flock(src.fileno(), fcntl.LOCK_EX)
+        with _open_write(tmp, codec) as dst:
+            for bline in src:
+                dst.write(bline)
+                lines += 1
+                raw_bytes += len(bline)
+                ts = line_ts(bline.decode("utf-8", errors="replace"))
+                if ts is None:
+                    continue
+                ts_min = ts if ts_min is None or ts < ts_min else ts_min
+                ts_max = ts if ts_max is None or ts > ts_max else ts_max
+    os.replace(tmp, out)
+
+    entry = {
+        "file": out.name,
+        "codec": codec,
+        "ts_min": ts_min,
+        "ts_max": ts_max,
+        "lines": lines,
+        "raw_bytes": raw_bytes,
+        "bytes": out.stat().st_size,
+        "rotated_at": time.time(),
+    }
+    manifest = load_manifest(log_path)
+    manifest["segments"] = [e for e in manifest["segments"] if _seg_id(e.get("file", "")) != seg_id]
+    manifest["segments"].append(entry)
+    manifest["segments"].sort(key=lambda e: (e.get("ts_min") or 0.0, e.get("file", "")))
+    _write_manifest(log_path, manifest)
+    staging.unlink()
+    return entry
+
+
+def _orphans(log_path: Path) -> List[Path]:
+    return sorted(archive_dir(log_path).glob("seg_*.open"))
+
+
+def _recover(log_path: Path, codec: str) -> List[Dict[str, Any]]:
+    """
+    Finish rotations that crashed after the live log was staged: an orphan
+    seg_*.open the manifest already names is a leftover (its archive is
+    complete), any other is compressed and registered now. Caller holds the
+    archive lock.
+    """
+    known = {_seg_id(e.get("file", "")) for e in load_manifest(log_path)["segments"]}
+    done: List[Dict[str, Any]] = []
+    for staging in _orphans(log_path):
+        if _seg_id(staging.name) in known:
+            staging.unlink()
+        else:
+            done.append(_close_segment(log_path, staging, codec))
+    return done
+
+
+def rotate(log_path: Path, codec: str = DEFAULT_CODEC) -> Optional[Dict[str, Any]]:
+    """
+    Close the live segment: atomic rename (writers reopen by path on every
+    append, so new lines land in a fresh file), then stream-compress it into
+    the archive and register its ts range in the manifest. Segments a crashed
+    rotation left staged are finished first.
+    Returns the manifest entry, or None if there was nothing to rotate.
+    """
+    codec = _resolve_codec(codec)
+    adir = archive_dir(log_path)
+    lk = _lock(adir)
+    try:
+        _recover(log_path, codec)
+        try:
+            if log_path.stat().st_size == 0:
+                return None
+        except OSError:
+            return None
+
+        seg_id = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}_{uuid.uuid4().hex[:6]}"
+        staging = adir / f"seg_{seg_id}.open"
+        # rename under the writers' exclusive lock (see lib_append): lock-aware writers
+        # either finish before the rename or see the inode change and reopen by path
+        with log_path.open("ab") as live:
+            if fcntl is not None:
+                fcntl.flock(live.fileno(), fcntl.LOCK_EX)
+            os.replace(log_path, staging)
+        return _close_segment(log_path, staging, codec)
+    finally:
+        lk.close()
+
+
+def maybe_rotate(log_path: Path, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_s: float = DEFAULT_MAX_AGE_S, codec: str = DEFAULT_CODEC) -> Optional[Dict[str, Any]]:
+    if not needs_rotation(log_path, max_bytes=max_bytes, max_age_s=max_age_s):
+        return None
+    return rotate(log_path, codec=codec)
+
+
+def prune(log_path: Path, keep_days: float) -> int:
+    """Drop closed segments whose newest line is older than keep_days."""
+    if keep_days <= 0:
+        return 0
+    cutoff = time.time() - keep_days * 86400.0
+    adir = archive_dir(log_path)
+    lk = _lock(adir)
+    try:
+        manifest = load_manifest(log_path)
+        kept: List[Dict[str, Any]] = []
+        dropped = 0
+        for e in manifest["segments"]:
+            ts_max = e.get("ts_max")
+            if ts_max is not None and ts_max < cutoff:
+                try:
+                    (adir / e["file"]).unlink()
+                except OSError:
+                    pass
+                dropped += 1
+            else:
+                kept.append(e)
+        manifest["segments"] = kept
+        _write_manifest(log_path, manifest)
+        return dropped
+    finally:
+        lk.close()
+
+
+# ---------------- readers ----------------
+
+def _overlaps(e: Dict[str, Any], since: Optional[float], until: Optional[float]) -> bool:
+    ts_min, ts_max = e.get("ts_min"), e.get("ts_max")
+    if ts_min is None or ts_max is None:
+        return True  # unknown range: must look inside
+    if since is not None and ts_max < since:
+        return False
+    if until is not None and ts_min > until:
+        return False
+    return True
+
+
+def segments(log_path: Path, since: Optional[float] = None,
+             until: Optional[float] = None) -> List[Tuple[Path, str]]:
+    """
+    (path, codec) for every segment overlapping [since, until], oldest first, live
+    last. Staged seg_*.open files the manifest does not name yet (a rotation in
+    progress, or one that crashed) are read as they are, just before the live log.
+    """
+    adir = archive_dir(log_path)
+    staged = _orphans(log_path)  # listed before the manifest is read: a finished rotation is in it
+    manifest = load_manifest(log_path)
+    known = {_seg_id(e.get("file", "")) for e in manifest["segments"]}
+    out: List[Tuple[Path, str]] = []
+    for e in manifest["segments"]:
+        if _overlaps(e, since, until):
+            out.append((adir / e["file"], e.get("codec", "gzip")))
+    out += [(p, "none") for p in staged if _seg_id(p.name) not in known]
+    if log_path.exists():
+        out.append((log_path, "none"))
+    return out
+
+
+def exists(log_path: Path) -> bool:
+    return log_path.exists() or bool(load_manifest(log_path)["segments"]) or bool(_orphans(log_path))
+
+
+def iter_segment(path: Path, codec: str) -> Iterator[str]:
+    try:
+        with _open_read_text(path, codec) as f:
+            for line in f:
+                yield line
+    except FileNotFoundError:
+        # segment raced with prune/rotate; skip it
+        return
+
+
+def iter_lines(log_path: Path | str, since: Optional[float] = None,
+               until: Optional[float] = None) -> Iterator[str]:
+    """
+    Stream lines from archive + live segment. Window filtering here is
+    segment-granular; callers still check per-line timestamps.
+    """
+    p = Path(log_path)
+    for seg, codec in segments(p, since=since, until=until):
+        yield from iter_segment(seg, codec)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Token -> USD pricing.
+
+infra/prices.json prices provider models (per 1M tokens). Router aliases
+are resolved through infra/litellm/config.yaml model_list, so
+best-effort-chat -> deepseek/deepseek-chat -> its price row.
+"overrides" in prices.json can price an alias directly.
+
+ask.sh (its usage parser) and lib_analytics import PriceTable directly:
+  PriceTable().cost("best-effort-chat", 120, 380)
+
+CLI, for checking a price by hand:
+  lib_pricing.py --model best-effort-chat --prompt 120 --completion 380
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+PRICES_PATH = ROOT / "infra" / "prices.json"
+LITELLM_CONFIG = ROOT / "infra" / "litellm" / "config.yaml"
+
+
+def load_aliases(config_path: Path = LITELLM_CONFIG) -> Dict[str, str]:
+    """model_name -> litellm_params.model from the LiteLLM config."""
+    if not config_path.exists():
+        return {}
+    txt = config_path.read_text(encoding="utf-8", errors="replace")
+    try:
+        import yaml  # optional
+        cfg = yaml.safe_load(txt) or {}
+        out = {}
+        for e in cfg.get("model_list", []) or []:
+            name = e.get("model_name")
+            model = (e.get("litellm_params") or {}).get("model")
+            if name and model:
+                out[str(name)] = str(model)
+        return out
+    except ImportError:
+        pass
+
+    # minimal fallback: only the two keys we need, in model_list order
+    out = {}
+    name = None
+    for line in txt.splitlines():
+        m = re.match(r"^\s*-\s*model_name:\s*(\S+)\s*$", line)
+        if m:
+            name = m.group(1).strip("'\"")
+            continue
+        m = re.match(r"^\s+model:\s*(\S+)\s*$", line)
+        if m and name:
+            out[name] = m.group(1).strip("'\"")
+            name = None
+        if re.match(r"^\S", line) and not line.startswith("model_list"):
+            name = None
+    return out
+
+
+class PriceTable:
+    def __init__(self, prices_path: Path = PRICES_PATH, config_path: Path = LITELLM_CONFIG) -> None:
+        try:
+            data = json.loads(prices_path.read_text(encoding="utf-8"))
+        except Exception:
+            data = {}
+        self.models: Dict[str, Dict[str, float]] = data.get("models", {}) or {}
+        self.overrides: Dict[str, Dict[str, float]] = data.get("overrides", {}) or {}
+        self.aliases = load_aliases(config_path)
+
+    def resolve(self, model: str) -> str:
+        return self.aliases.get(model, model)
+
+    def rates(self, model: str) -> Optional[Tuple[float, float]]:
+        """(prompt, completion) USD per 1M tokens, or None if unpriced."""
+        row = self.overrides.get(model) or self.models.get(self.resolve(model))
+        if not row:
+            return None
+        return float(row.get("prompt", 0.0)), float(row.get("completion", 0.0))
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+        r = self.rates(model)
+        if r is None:
+            return None
+        return (prompt_tokens * r[0] + completion_tokens * r[1]) / 1_000_000.0
+
+    def cost_total_only(self, model: str, total_tokens: int) -> Optional[float]:
+        """Old log lines carry only total tokens: price them at the blended (mean) rate."""
+        r = self.rates(model)
+        if r is None:
+            return None
+        return total_tokens * (r[0] + r[1]) / 2.0 / 1_000_000.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {m: {"resolved": self.resolve(m), "rates": self.rates(m)} for m in sorted(self.aliases)}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Price a request (USD) or dump the resolved price table.")
+    ap.add_argument("--model", default="")
+    ap.add_argument("--prompt", type=int, default=0)
+    ap.add_argument("--completion", type=int, default=0)
+    ap.add_argument("--table", action="store_true", help="print alias -> provider model -> rates")
+    args = ap.parse_args()
+
+    pt = PriceTable()
+    if args.table:
+        print(json.dumps(pt.to_dict(), indent=2))
+        return 0
+    c = pt.cost(args.model, args.prompt, args.completion)
+    print("" if c is None else f"{c:.6f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
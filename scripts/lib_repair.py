@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Repair near-valid plans in place instead of regenerating them.
+
+A plan that parses but fails its schema usually has one or two bad
+values in an otherwise good document (often many files long). repair()
+fixes it in two steps and revalidates after each:
+
+  1. local, no LLM call, driven by the schema:
+     - keys that additionalProperties:false forbids are dropped
+     - invalid strings are fixed according to their node's x-repair:
+         slug      "My Cool App" -> "my-cool-app"
+         route     "/About Us/"  -> "/about-us"
+         relpath   "/src\\a.py", "./x/../b.py" -> "src/a.py", "b.py"
+         truncate  cut to maxLength (descriptions, titles; never file content)
+  2. if errors remain and an ask() callable is given: the model gets only
+     the errors and the current values at the failing paths, and answers
+     with an RFC 6902 JSON Patch ({"patch": [...]}) limited to those paths;
+     the patch is applied to the local copy and the result revalidated.
+
+  rep = repair(plan, SCHEMA_PATH, ask=lambda prompt: call_llm(PATCH_SYSTEM, prompt))
+  if rep.ok:
+      plan = rep.doc
+  rep.to_dict()   # -> repair_attempt_N.json
+"""
+from __future__ import annotations
+
+import copy
+import json
+import posixpath
+import re
+import unicodedata
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import lib_jsonscan
+import lib_schema
+
+PATCH_SYSTEM = (
+    "You repair JSON documents. You get validation errors and the current values at the failing paths. "
+    'Return ONLY a JSON object {"patch": [...]} where patch is an RFC 6902 JSON Patch '
+    '(ops: "add", "replace", "remove"; paths are JSON Pointers like "/files/1/path"). '
+    "Touch only the failing paths (or add a missing key to its parent object). No markdown, no commentary."
+)
+
+_ERR_RE = re.compile(r"^(\$[^:]*): (.*)$")
+_PATH_TOKEN = re.compile(r'\.([A-Za-z_][A-Za-z0-9_]*)|\[(\d+)\]|\[("(?:[^"\\]|\\.)*")\]')
+_CONTROL = re.compile(r"[\x00-\x1f]")
+_PREVIEW_CHARS = 300
+
+
+# ---- paths -------------------------------------------------------------------
+
+def parse_json_path(path: str) -> List[Any]:
+    """'$.files[1].path' -> ['files', 1, 'path'] (the paths lib_schema reports)."""
+    if not path.startswith("$"):
+        raise ValueError(f"not a JSON path: {path}")
+    out: List[Any] = []
+    pos = 1
+    while pos < len(path):
+        m = _PATH_TOKEN.match(path, pos)
+        if m is None:
+            raise ValueError(f"bad JSON path: {path}")
+        ident, idx, quoted = m.groups()
+        out.append(ident if ident is not None else int(idx) if idx is not None else json.loads(quoted))
+        pos = m.end()
+    return out
+
+
+def to_pointer(parts: List[Any]) -> str:
+    return "".join("/" + str(p).replace("~", "~0").replace("/", "~1") for p in parts)
+
+
+def _from_pointer(ptr: str) -> List[str]:
+    if ptr == "":
+        return []
+    if not ptr.startswith("/"):
+        raise ValueError(f"bad JSON pointer: {ptr!r}")
+    return [t.replace("~1", "/").replace("~0", "~") for t in ptr[1:].split("/")]
+
+
+def _get(doc: Any, parts: List[Any]) -> Tuple[bool, Any]:
+    cur = doc
+    for p in parts:
+        if isinstance(cur, dict) and p in cur:
+            cur = cur[p]
+        elif isinstance(cur, list) and isinstance(p, int) and 0 <= p < len(cur):
+            cur = cur[p]
+        else:
+            return False, None
+    return True, cur
+
+
+# ---- step 1: local fixes -------------------------------------------------------
+
+def slugify(s: str, max_len: int = 40) -> str:
+    s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii").lower()
+    s = re.sub(r"[^a-z0-9]+", "-", s)
+    s = re.sub(r"^[^a-z]+", "", s)  # must start with a letter
+    return s[:max_len].strip("-")
+
+
+def fix_route(s: str) -> str:
+    inner = slugify(s.strip().strip("/").replace("/", "-"))
+    return "/" + inner
+
+
+def fix_relpath(s: str) -> str:
+    p = _CONTROL.sub("", s).strip().replace("\\", "/")
+    p = re.sub(r"^[A-Za-z]:", "", p).lstrip("/~")
+    p = posixpath.normpath(p) if p else p
+    while p == ".." or p.startswith("../"):
+        p = p[3:]
+    return "" if p == "." else p
+
+
+def truncate(s: str, max_len: int) -> str:
+    s = s.strip()
+    if len(s) <= max_len:
+        return s
+    cut = s[:max_len]
+    return (cut.rsplit(" ", 1)[0] if " " in cut[max_len // 2:] else cut).rstrip()
+
+
+def _fix_string(node: Dict[str, Any], v: str) -> str:
+    kind = node.get("x-repair")
+    max_len = int(node.get("maxLength") or 0)
+    if kind == "slug":
+        return slugify(v, max_len or 40)
+    if kind == "route":
+        return fix_route(v)
+    if kind == "relpath":
+        return fix_relpath(v)
+    if kind == "truncate" and max_len:
+        return truncate(v, max_len)
+    return v
+
+
+def _fix(node: Any, v: Any, path: List[Any], fixes: List[str]) -> Any:
+    if not isinstance(node, dict):
+        return v
+    if isinstance(v, dict):
+        props = node.get("properties") or {}
+        if node.get("additionalProperties", True) is False:
+            extra = [k for k in v if k not in props]
+            for k in extra:
+                del v[k]
+            if extra:
+                fixes.append(f"{lib_schema.json_path(tuple(path))}: removed unexpected properties {sorted(extra)}")
+        for k, sub in props.items():
+            if k in v:
+                v[k] = _fix(sub, v[k], path + [k], fixes)
+    elif isinstance(v, list) and isinstance(node.get("items"), dict):
+        for i, item in enumerate(v):
+            v[i] = _fix(node["items"], item, path + [i], fixes)
+    elif isinstance(v, str) and node.get("x-repair") and lib_schema.sub_validator(node)(v):
+        new = _fix_string(node, v)
+        if new and new != v and not lib_schema.sub_validator(node)(new):
+            fixes.append(f"{lib_schema.json_path(tuple(path))}: {node['x-repair']} {v[:60]!r} -> {new[:60]!r}")
+            return new
+    return v
+
+
+def repair_local(doc: Dict[str, Any], schema: Any) -> Tuple[Dict[str, Any], List[str]]:
+    """(fixed copy of doc, one line per fix). Only values that fail their own subschema are touched."""
+    fixes: List[str] = []
+    return _fix(schema, copy.deepcopy(doc), [], fixes), fixes
+
+
+def locally_fixable(schema: Any, error: str) -> bool:
+    """Whether step 1 can be expected to fix this error (forbidden key, or an x-repair value)."""
+    m = _ERR_RE.match(error)
+    if m is None:
+        return False
+    if m.group(2).startswith("unexpected properties"):
+        return True
+    try:
+        node = lib_schema.subschema_at(schema, tuple(parse_json_path(m.group(1))))
+    except ValueError:
+        return False
+    return node is not None and bool(node.get("x-repair")) and not m.group(2).startswith("is required")
+
+
+# ---- step 2: JSON patch from the model ---------------------------------------
+
+def _preview(v: Any) -> Any:
+    if isinstance(v, str):
+        return v if len(v) <= _PREVIEW_CHARS else v[:_PREVIEW_CHARS] + f"... ({len(v)} chars)"
+    if isinstance(v, dict):
+        return {k: _preview(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [_preview(x) for x in v]
+    return v
+
+
+def failing_paths(errors: List[str]) -> List[List[Any]]:
+    out: List[List[Any]] = []
+    for e in errors:
+        m = _ERR_RE.match(e)
+        if m is None:
+            continue
+        try:
+            parts = parse_json_path(m.group(1))
+        except ValueError:
+            continue
+        if parts not in out:
+            out.append(parts)
+    return out
+
+
+def patch_prompt(doc: Dict[str, Any], errors: List[str]) -> str:
+    lines = ["Validation errors:"] + [f"- {e}" for e in errors] + ["", "Current values (long strings shortened):"]
+    for parts in failing_paths(errors):
+        found, v = _get(doc, parts)
+        if found:
+            lines.append(f"{to_pointer(parts) or '/'} = {json.dumps(_preview(v), ensure_ascii=False)}")
+        else:
+            _, parent = _get(doc, parts[:-1])
+            lines.append(f"{to_pointer(parts)} is missing; parent {to_pointer(parts[:-1]) or '/'} = "
+                         f"{json.dumps(_preview(parent), ensure_ascii=False)}")
+    lines += ["", 'Return {"patch": [...]} only.']
+    return "\n".join(lines)
+
+
+def parse_patch(text: str) -> List[Dict[str, Any]]:
+    obj = lib_jsonscan.extract_object(text)
+    ops = obj.get("patch")
+    if not isinstance(ops, list) or not all(isinstance(o, dict) for o in ops):
+        raise ValueError('patch reply must be {"patch": [ops...]}')
+    return ops
+
+
+def _allowed(ptr: str, errors: List[str]) -> bool:
+    """Op paths must be at / below a failing path, or a missing key's parent."""
+    for parts in failing_paths(errors):
+        for base in (to_pointer(parts), to_pointer(parts[:-1]) if parts else ""):
+            if base and (ptr == base or ptr.startswith(base + "/")):
+                return True
+    return False
+
+
+def apply_patch(doc: Dict[str, Any], ops: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """RFC 6902 add / replace / remove on a copy of doc (ValueError on a bad op)."""
+    out = copy.deepcopy(doc)
+    for op in ops:
+        kind, tokens = op.get("op"), _from_pointer(str(op.get("path", "")))
+        if kind not in ("add", "replace", "remove") or not tokens:
+            raise ValueError(f"unsupported patch op: {op}")
+        parent: Any = out
+        for t in tokens[:-1]:
+            parent = parent[int(t)] if isinstance(parent, list) else parent[t]
+        last = tokens[-1]
+        if isinstance(parent, list):
+            if kind == "add":
+                parent.insert(len(parent) if last == "-" else int(last), op.get("value"))
+            elif kind == "replace":
+                parent[int(last)] = op.get("value")
+            else:
+                del parent[int(last)]
+        elif isinstance(parent, dict):
+            if kind == "remove":
+                del parent[last]
+            elif kind == "replace" and last not in parent:
+                raise ValueError(f"replace of missing {op.get('path')}")
+            else:
+                parent[last] = op.get("value")
+        else:
+            raise ValueError(f"patch path through a scalar: {op.get('path')}")
+    return out
+
+
+# ---- driver --------------------------------------------------------------------
+
+class RepairResult:
+    __slots__ = ("doc", "errors_before", "errors", "local_fixes", "patch", "patch_error", "skipped_ops")
+
+    def __init__(self, doc: Dict[str, Any], errors: List[str]) -> None:
+        self.doc = doc
+        self.errors_before = list(errors)
+        self.errors = list(errors)
+        self.local_fixes: List[str] = []
+        self.patch: Optional[List[Dict[str, Any]]] = None
+        self.patch_error = ""
+        self.skipped_ops: List[Dict[str, Any]] = []
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ok": self.ok, "errors_before": self.errors_before, "local_fixes": self.local_fixes,
+                "patch": self.patch, "skipped_ops": self.skipped_ops, "patch_error": self.patch_error,
+                "errors_after": self.errors}
+
+
+def repair(doc: Dict[str, Any], schema_path: Path,
+           ask: Optional[Callable[[str], str]] = None) -> RepairResult:
+    validate = lib_schema.load_validator(schema_path)
+    rep = RepairResult(doc, validate(doc))
+    if rep.ok:
+        return rep
+
+    fixed, rep.local_fixes = repair_local(doc, validate.schema)  # type: ignore[attr-defined]
+    rep.doc, rep.errors = fixed, validate(fixed)
+    if rep.ok or ask is None:
+        return rep
+
+    errors = rep.errors
+    try:
+        ops = parse_patch(ask(patch_prompt(fixed, errors)))
+        rep.patch = [o for o in ops if _allowed(str(o.get("path", "")), errors)]
+        rep.skipped_ops = [o for o in ops if o not in rep.patch]
+        patched = apply_patch(fixed, rep.patch)
+    except Exception as e:
+        rep.patch_error = f"{type(e).__name__}: {e}"
+        return rep
+    rep.doc, rep.errors = patched, validate(patched)
+    return rep
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Run handles: create a run, pass it on explicitly, write into it atomically.
+
+A run is one directory artifacts/runs/<prefix>_<YYYYmmdd_HHMMSS>_<hex8>.
+Steps of a pipeline get their run explicitly, first match wins:
+
+  1. --run-dir on the command line
+  2. $RUN_DIR in the environment (RunHandle.env() sets it for children)
+  3. artifacts/runs/LATEST
+
+LATEST is only a convenience pointer for interactive use ("the run I just
+made"). It is replaced with an atomic rename, so a reader never sees a
+half-written path, and nothing in a pipeline has to read it back to find
+its own run: two pipelines running side by side each keep their handle.
+
+Usage:
+  h = lib_run.create_run("run_plan_web")
+  h.write_json("plan.web.json", plan)
+  subprocess.run(cmd, env=h.env())
+  h.mark_latest()
+
+  run_dir = lib_run.resolve_run(args.run_dir)      # Path or None
+
+Shell:
+  RUN_DIR="$(python3 scripts/lib_run.py create --prefix run_web_smoke)"
+  RUN_DIR="$(python3 scripts/lib_run.py resolve)"   # --run-dir / $RUN_DIR / LATEST
+  python3 scripts/lib_run.py set-latest "$RUN_DIR"
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import secrets
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+ROOT = Path(__file__).resolve().parents[1]
+RUNS_DIR = ROOT / "artifacts" / "runs"
+LATEST_NAME = "LATEST"
+ENV_VAR = "RUN_DIR"
+
+PathLike = Union[str, Path]
+
+
+def write_atomic(path: PathLike, text: str) -> None:
+    """Write via a unique sibling tmp file + os.replace (readers see old or new, never partial)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{secrets.token_hex(4)}.tmp")
+    try:
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+class RunHandle:
+    __slots__ = ("run_dir",)
+
+    def __init__(self, run_dir: PathLike) -> None:
+        self.run_dir = Path(run_dir).resolve()
+
+    def __repr__(self) -> str:
+        return f"RunHandle({str(self.run_dir)!r})"
+
+    def __str__(self) -> str:
+        return str(self.run_dir)
+
+    @property
+    def run_id(self) -> str:
+        return self.run_dir.name
+
+    def path(self, name: str) -> Path:
+        return self.run_dir / name
+
+    def write_text(self, name: str, text: str) -> Path:
+        p = self.path(name)
+        write_atomic(p, text)
+        return p
+
+    def write_json(self, name: str, obj: Any) -> Path:
+        return self.write_text(name, json.dumps(obj, ensure_ascii=False, indent=2) + "\n")
+
+    def env(self, env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """Environment for a child process that should work on this run."""
+        out = dict(os.environ if env is None else env)
+        out[ENV_VAR] = str(self.run_dir)
+        return out
+
+    def mark_latest(self) -> None:
+        set_latest(self.run_dir, self.run_dir.parent)
+
+
+def create_run(prefix: str = "run", runs_dir: PathLike = RUNS_DIR) -> RunHandle:
+    """New, empty run dir; the random suffix keeps same-second runs apart."""
+    runs_dir = Path(runs_dir)
+    runs_dir.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    while True:
+        d = runs_dir / f"{prefix}_{stamp}_{secrets.token_hex(4)}"
+        try:
+            d.mkdir(exist_ok=False)
+            return RunHandle(d)
+        except FileExistsError:
+            continue
+
+
+def open_run(run_dir: PathLike, create: bool = False) -> RunHandle:
+    """Handle for an existing run dir (e.g. one passed in with --run-dir)."""
+    d = Path(run_dir)
+    if create:
+        d.mkdir(parents=True, exist_ok=True)
+    elif not d.is_dir():
+        raise FileNotFoundError(f"run dir not found: {d}")
+    return RunHandle(d)
+
+
+def set_latest(run_dir: PathLike, runs_dir: PathLike = RUNS_DIR) -> None:
+    write_atomic(Path(runs_dir) / LATEST_NAME, str(run_dir) + "\n")
+
+
+def read_latest(runs_dir: PathLike = RUNS_DIR) -> Optional[Path]:
+    try:
+        s = (Path(runs_dir) / LATEST_NAME).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    return Path(s) if s else None
+
+
+def resolve_run(explicit: Optional[PathLike] = None, runs_dir: PathLike = RUNS_DIR) -> Optional[Path]:
+    """--run-dir, else $RUN_DIR, else LATEST (None when there is no run at all)."""
+    if explicit:
+        return Path(explicit)
+    env = os.environ.get(ENV_VAR, "").strip()
+    if env:
+        return Path(env)
+    return read_latest(runs_dir)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Create / resolve runs (artifacts/runs) for shell steps.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("create", help="make a new run dir and print its path")
+    c.add_argument("--prefix", default="run")
+    c.add_argument("--latest", action="store_true", help="also point LATEST at it")
+    r = sub.add_parser("resolve", help="print --run-dir / $RUN_DIR / LATEST")
+    r.add_argument("--run-dir", default="")
+    s = sub.add_parser("set-latest", help="atomically point LATEST at a run dir")
+    s.add_argument("run_dir")
+    args = ap.parse_args()
+
+    if args.cmd == "create":
+        h = create_run(args.prefix)
+        if args.latest:
+            h.mark_latest()
+        print(h.run_dir)
+        return 0
+    if args.cmd == "resolve":
+        rd = resolve_run(args.run_dir)
+        if rd is None:
+            sys.stderr.write("[run] no run: pass --run-dir, set RUN_DIR or create one\n")
+            return 1
+        print(rd)
+        return 0
+    set_latest(Path(args.run_dir).resolve())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
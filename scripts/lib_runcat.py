@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Run catalog: one SQLite row per artifacts/runs/run_* directory.
+
+Writers (write_run_meta.py, meta_fix_status.py, the policy wrappers, verify
+scripts) upsert the run they just touched; readers (export_runs_data,
+runs_summary_v2/v3, meta_fix_status --all, retain_keep3.sh) list, filter and
+paginate with indexed queries instead of iterdir() + stat() + json per run.
+
+Not every writer upserts (event_append.py, scaffold, web_smoke.sh, ...), so
+open_catalog() syncs first: rows whose run dir or events / meta / verify file
+changed since they were indexed are rescanned (a few stat() per run, json only
+for those), unseen dirs are added and rows whose dir is gone are dropped.
+
+`run_catalog.py reindex` rebuilds everything from disk.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+RUNS_ROOT = ROOT / "artifacts" / "runs"
+DB_PATH = Path(os.environ.get("RUN_CATALOG_DB", str(RUNS_ROOT / "catalog.sqlite3")))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+  run_id       TEXT PRIMARY KEY,
+  run_dir      TEXT NOT NULL,
+  kind         TEXT NOT NULL DEFAULT 'unknown',
+  status       TEXT NOT NULL DEFAULT 'unknown',
+  start        TEXT,
+  start_ms     INTEGER NOT NULL DEFAULT 0,
+  end_ms       INTEGER,
+  duration_ms  INTEGER,
+  plan_name    TEXT,
+  plan_hash    TEXT,
+  gen_dir      TEXT,
+  last_step    TEXT,
+  fail_reason  TEXT,
+  meta_status  TEXT,
+  meta_ts      TEXT,
+  dir_mtime    REAL,
+  indexed_at   REAL
+);
+CREATE INDEX IF NOT EXISTS runs_start ON runs(start_ms DESC);
+CREATE INDEX IF NOT EXISTS runs_kind_start ON runs(kind, start_ms DESC);
+CREATE INDEX IF NOT EXISTS runs_status_start ON runs(status, start_ms DESC);
+CREATE INDEX IF NOT EXISTS runs_plan_hash ON runs(plan_hash);
+"""
+
+COLUMNS = ("run_id", "run_dir", "kind", "status", "start", "start_ms", "end_ms", "duration_ms",
+           "plan_name", "plan_hash", "gen_dir", "last_step", "fail_reason", "meta_status", "meta_ts",
+           "dir_mtime", "indexed_at")
+
+# columns added after the first release: (name, type); old catalogs are altered and rescanned once
+ADDED_COLUMNS = (("meta_status", "TEXT"), ("end_ms", "INTEGER"), ("meta_ts", "TEXT"))
+
+# list() orders; "start" is the catalog's own, the others are what the pre-catalog reports used
+ORDERS = {
+    "start": "start_ms DESC, run_id DESC",
+    "run_id": "run_id DESC",
+    "mtime": "dir_mtime DESC, run_id DESC",
+}
+
+
+def _iso(ts_ms: int) -> str:
+    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _read_json(p: Path) -> Optional[Dict[str, Any]]:
+    try:
+        obj = json.loads(p.read_text(encoding="utf-8"))
+        return obj if isinstance(obj, dict) else None
+    except Exception:
+        return None
+
+
+def _parse_start_ms(v: Any) -> Optional[int]:
+    if isinstance(v, (int, float)) and v > 0:
+        return int(v * 1000) if v < 1e11 else int(v)
+    if isinstance(v, str) and v.strip():
+        s = v.strip().replace("Z", "+00:00")
+        # "+0800" -> "+08:00"
+        if len(s) > 5 and s[-5] in "+-" and s[-4:].isdigit():
+            s = s[:-2] + ":" + s[-2:]
+        try:
+            d = datetime.fromisoformat(s)
+            if d.tzinfo is None:
+                d = d.replace(tzinfo=timezone.utc)
+            return int(d.timestamp() * 1000)
+        except Exception:
+            return None
+    return None
+
+
+# ---------------- scanning one run from disk ----------------
+
+_RUN_STAMP_RE = re.compile(r"\d{8}_\d{6}")
+
+def infer_kind(run_id: str, run_dir: Path, meta: Dict[str, Any]) -> str:
+    k = (meta.get("kind") or "").strip() if isinstance(meta.get("kind"), str) else ""
+    if k:
+        return k
+    for prefix, kind in (("run_plan_web_", "plan_web"), ("run_web_smoke_", "web_smoke"),
+                         ("run_generated_smoke_", "generated_smoke"), ("run_plan_", "plan"),
+                         ("run_demo_", "demo")):
+        if run_id.startswith(prefix):
+            return kind
+    if "web_smoke" in run_id:
+        return "web_smoke"
+    if (run_dir / "plan.web.json").exists():
+        return "plan_web"
+    if (run_dir / "plan.json").exists():
+        return "plan"
+    return "unknown"
+
+
+def infer_status(meta: Dict[str, Any], verify: Optional[Dict[str, Any]]) -> str:
+    if verify is not None:
+        ok = verify.get("ok", None)
+        if ok is True:
+            return "ok"
+        if ok is False:
+            return "fail"
+    ms = (meta.get("status") or "").strip().lower() if isinstance(meta.get("status"), str) else ""
+    if ms in ("ok", "pass", "passed", "success"):
+        return "ok"
+    if ms in ("fail", "failed", "error"):
+        return "fail"
+    return ms or "unknown"
+
+
+def load_verify(run_dir: Path) -> Optional[Dict[str, Any]]:
+    for name in ("verify_summary.json", "verify.web.json", "verify_web.json", "verify.json"):
+        v = _read_json(run_dir / name)
+        if v is not None:
+            return v
+    return None
+
+
+def load_events(run_dir: Path) -> List[Dict[str, Any]]:
+    p = run_dir / "events.jsonl"
+    if not p.exists():
+        return []
+    out = []
+    for line in p.read_text(encoding="utf-8", errors="ignore").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            e = json.loads(line)
+        except Exception:
+            continue
+        if isinstance(e, dict) and isinstance(e.get("ts_ms"), int):
+            out.append(e)
+    out.sort(key=lambda e: e["ts_ms"])
+    return out
+
+
+def session_start_ts(evs: List[Dict[str, Any]]) -> Optional[int]:
+    # prefer replay session; else plan session
+    keys = [("web_replay_start", "start"), ("plan_web", "start"), ("plan", "start")]
+    candidates = []
+    for e in evs:
+        for step, ph in keys:
+            if e.get("step") == step and e.get("phase") == ph:
+                candidates.append(e["ts_ms"])
+    if candidates:
+        return candidates[-1]
+    return evs[0]["ts_ms"] if evs else None
+
+
+# files whose mtime makes sync() rescan a run (appends do not touch the dir mtime)
+WATCHED = ("events.jsonl", "meta.run.json", "meta.json",
+           "verify_summary.json", "verify.web.json", "verify_web.json", "verify.json")
+
+
+def changed_since(run_dir: Path, indexed_at: float) -> bool:
+    for p in (run_dir, *(run_dir / n for n in WATCHED)):
+        try:
+            if os.stat(p).st_mtime > indexed_at:
+                return True
+        except OSError:
+            continue
+    return False
+
+
+def scan_run(run_dir: Path) -> Dict[str, Any]:
+    # taken before anything is read: a write during the scan is newer and rescanned next sync
+    indexed_at = time.time()
+    run_id = run_dir.name
+    meta = _read_json(run_dir / "meta.run.json") or _read_json(run_dir / "meta.json") or {}
+    verify = load_verify(run_dir)
+    try:
+        dir_mtime = run_dir.stat().st_mtime
+    except OSError:
+        dir_mtime = 0.0
+
+    status = infer_status(meta, verify)
+    last_step = ""
+    fail_reason = ""
+    duration_ms: Optional[int] = None
+
+    evs = load_events(run_dir)
+    start_ms: Optional[int] = None
+    end_ms: Optional[int] = None
+    if evs:
+        ss = session_start_ts(evs)
+        sess = [e for e in evs if e["ts_ms"] >= ss] if ss is not None else evs
+        ts_list = [e["ts_ms"] for e in sess]
+        if ts_list:
+            duration_ms = max(ts_list) - min(ts_list)
+            start_ms = min(ts_list)
+            end_ms = max(ts_list)
+        ends = [e for e in sess if e.get("phase") == "end"]
+        if ends:
+            last_step = str(ends[-1].get("step") or "")
+        fails = [e for e in sess if e.get("phase") == "end" and e.get("status") == "fail"]
+        if fails:
+            f = fails[-1]
+            status = "fail"
+            fail_reason = f'{f.get("step","")}/{f.get("error_class","")}/{f.get("message","")}'.strip("/")
+
+    for k in ("ts_start", "start", "ts"):
+        v = _parse_start_ms(meta.get(k))
+        if v:
+            start_ms = v
+            break
+    if not start_ms:
+        start_ms = _parse_start_ms(meta.get("ts_utc")) or _parse_start_ms((verify or {}).get("ts"))
+    if not start_ms:
+        # run ids carry a local `date +%Y%m%d_%H%M%S` stamp
+        m = _RUN_STAMP_RE.search(run_id)
+        if m:
+            try:
+                start_ms = int(datetime.strptime(m.group(0), "%Y%m%d_%H%M%S").timestamp() * 1000)
+            except ValueError:
+                start_ms = None
+    if not start_ms:
+        start_ms = int(dir_mtime * 1000)
+
+    if duration_ms is None and isinstance(meta.get("duration_s"), (int, float)):
+        duration_ms = int(meta["duration_s"] * 1000)
+
+    return {
+        "run_id": run_id,
+        "run_dir": str(run_dir),
+        "kind": infer_kind(run_id, run_dir, meta),
+        "status": status,
+        "start": _iso(start_ms),
+        "start_ms": start_ms,
+        # last event of the session, else dir mtime: the ts_utc runs_summary_v2 always reported
+        "end_ms": end_ms or int(dir_mtime * 1000),
+        "duration_ms": duration_ms,
+        "plan_name": meta.get("plan_name") or meta.get("name") or "",
+        "plan_hash": meta.get("plan_hash") or (verify or {}).get("plan_hash") or "",
+        "gen_dir": meta.get("gen_dir") or (verify or {}).get("gen_dir") or "",
+        "last_step": last_step or meta.get("last_step") or "",
+        "fail_reason": fail_reason,
+        # meta.run.json's own status, as written (status above is derived, verify_summary first)
+        "meta_status": (meta.get("status") or "").strip() if isinstance(meta.get("status"), str) else "",
+        "meta_ts": str(meta.get("ts") or meta.get("ts_utc") or meta.get("ts_iso") or ""),
+        "dir_mtime": dir_mtime,
+        "indexed_at": indexed_at,
+    }
+
+
+# ---------------- catalog ----------------
+
+class Catalog:
+    def __init__(self, db_path: Path = DB_PATH, runs_root: Path = RUNS_ROOT) -> None:
+        self.db_path = db_path
+        self.runs_root = runs_root
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(db_path), timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        cols = {r[1] for r in self.db.execute("PRAGMA table_info(runs)")}
+        missing = [(c, t) for c, t in ADDED_COLUMNS if c not in cols]
+        if missing:
+            with self.db:
+                for c, t in missing:
+                    self.db.execute(f"ALTER TABLE runs ADD COLUMN {c} {t}")
+            if self.count():
+                self.reindex()  # fill the new columns once
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---- writes ----
+    def upsert_row(self, row: Dict[str, Any]) -> None:
+        cols = ",".join(COLUMNS)
+        qs = ",".join("?" for _ in COLUMNS)
+        with self.db:
+            self.db.execute(f"INSERT OR REPLACE INTO runs ({cols}) VALUES ({qs})",
+                            [row.get(c) for c in COLUMNS])
+
+    def upsert(self, run_dir: Path | str) -> Dict[str, Any]:
+        row = scan_run(Path(run_dir))
+        self.upsert_row(row)
+        return row
+
+    def delete(self, run_id: str) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM runs WHERE run_id = ?", (run_id,))
+
+    def prune_missing(self) -> int:
+        gone = [r["run_id"] for r in self.db.execute("SELECT run_id, run_dir FROM runs")
+                if not Path(r["run_dir"]).is_dir()]
+        with self.db:
+            self.db.executemany("DELETE FROM runs WHERE run_id = ?", [(x,) for x in gone])
+        return len(gone)
+
+    def reindex(self) -> int:
+        rows = []
+        if self.runs_root.exists():
+            for d in self.runs_root.iterdir():
+                if d.is_dir() and d.name.startswith("run_"):
+                    rows.append(scan_run(d))
+        with self.db:
+            self.db.execute("DELETE FROM runs")
+            self.db.executemany(
+                f"INSERT INTO runs ({','.join(COLUMNS)}) VALUES ({','.join('?' for _ in COLUMNS)})",
+                [[r.get(c) for c in COLUMNS] for r in rows])
+        return len(rows)
+
+    def sync(self) -> int:
+        """
+        Bring the catalog up to date with disk: scan run dirs no writer has
+        upserted, rescan rows whose dir or WATCHED files changed after they were
+        indexed, drop rows whose dir is gone. Known, unchanged runs cost only
+        stat() calls. Returns the number of rows added, rescanned or dropped.
+        """
+        if not self.runs_root.exists():
+            return self.prune_missing()
+        known = {r["run_id"]: (r["run_dir"], r["indexed_at"] or 0.0)
+                 for r in self.db.execute("SELECT run_id, run_dir, indexed_at FROM runs")}
+        seen = set()
+        n = 0
+        with os.scandir(self.runs_root) as it:
+            for e in it:
+                if not (e.name.startswith("run_") and e.is_dir()):
+                    continue
+                seen.add(e.name)
+                run_dir = Path(e.path)
+                if e.name not in known or changed_since(run_dir, known[e.name][1]):
+                    self.upsert_row(scan_run(run_dir))
+                    n += 1
+        # rows upserted from outside runs_root are kept while their dir exists
+        gone = [rid for rid, (rd, _) in known.items() if rid not in seen and not Path(rd).is_dir()]
+        if gone:
+            with self.db:
+                self.db.executemany("DELETE FROM runs WHERE run_id = ?", [(x,) for x in gone])
+        return n + len(gone)
+
+    # ---- reads ----
+    @staticmethod
+    def _where(kind: Optional[str], status: Optional[str]) -> tuple:
+        conds, args = [], []
+        if kind:
+            conds.append("kind = ?")
+            args.append(kind)
+        if status:
+            conds.append("status = ?")
+            args.append(status)
+        return (" WHERE " + " AND ".join(conds)) if conds else "", args
+
+    def list(self, kind: Optional[str] = None, status: Optional[str] = None,
+             limit: int = 50, offset: int = 0, order: str = "start") -> List[Dict[str, Any]]:
+        where, args = self._where(kind, status)
+        q = f"SELECT * FROM runs{where} ORDER BY {ORDERS[order]} LIMIT ? OFFSET ?"
+        return [dict(r) for r in self.db.execute(q, [*args, int(limit), int(offset)])]
+
+    def count(self, kind: Optional[str] = None, status: Optional[str] = None) -> int:
+        where, args = self._where(kind, status)
+        return int(self.db.execute(f"SELECT COUNT(*) FROM runs{where}", args).fetchone()[0])
+
+    def meta_status_unset(self) -> List[str]:
+        """Run dirs whose meta.run.json status is missing / unknown (or not scanned for it yet)."""
+        q = ("SELECT run_dir FROM runs WHERE meta_status IS NULL OR lower(meta_status) IN ('', 'unknown') "
+             "ORDER BY start_ms DESC, run_id DESC")
+        return [r[0] for r in self.db.execute(q)]
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        r = self.db.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return dict(r) if r else None
+
+    def facets(self) -> Dict[str, Dict[str, int]]:
+        out: Dict[str, Dict[str, int]] = {}
+        for col in ("kind", "status"):
+            out[col] = {r[0]: r[1] for r in self.db.execute(
+                f"SELECT {col}, COUNT(*) FROM runs GROUP BY {col} ORDER BY COUNT(*) DESC")}
+        return out
+
+
+def open_catalog(sync: bool = True) -> Catalog:
+    """Open (and on first use build) the catalog; sync=True also brings it up to date with disk (sync())."""
+    cat = Catalog()
+    if cat.count() == 0:
+        cat.reindex()
+    elif sync:
+        cat.sync()
+    return cat
+
+
+def upsert_quiet(run_dirs: Iterable[str | Path]) -> None:
+    """Best-effort hook for writers: never fail the caller because of the catalog."""
+    try:
+        with Catalog() as cat:
+            for rd in run_dirs:
+                if rd and Path(rd).is_dir():
+                    cat.upsert(rd)
+    except Exception:
+        pass
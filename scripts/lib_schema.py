@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+JSON Schema -> compiled Python validator (no jsonschema dependency).
+
+compile_schema() turns a schema into the source of one straight-line
+Python function (nested loops for arrays, no per-keyword dispatch at
+validation time), exec()s it once and returns it. load_validator(path)
+caches the compiled function per schema file and recompiles only when the
+file changes, so plan.py / plan_web.py pay the compile cost once per
+process and nothing re-reads the schema per plan.
+
+A validator collects every error, one string per problem, addressed by
+JSON path:
+
+  validate(plan) -> ["$.name: must match ^[a-z][a-z0-9-]+$",
+                     "$.pages[2].route: is required", ...]    ([] = valid)
+
+Supported keywords (anything else is a SchemaError at compile time, so a
+schema can never silently ask for a check that is not performed):
+  type, const, enum, required, properties, additionalProperties (bool or
+  schema), items, minItems, maxItems, contains, minLength, maxLength,
+  pattern (re.search, like JSON Schema), minimum, maximum, allOf
+  annotations: $schema, $id, title, description, default, examples
+  x-message: human message for this node's pattern / const / enum / contains
+             checks (instead of echoing the regex or constant)
+  x-repair:  how lib_repair may fix an invalid value locally (slug, route,
+             relpath, truncate); ignored by validation
+
+IncrementalValidator checks a document while it is still streaming in
+(driven by lib_jsonscan.StreamParser): a key that additionalProperties:false
+forbids is reported as soon as the key arrives, and every value is run
+through its subschema's compiled validator the moment it is complete, so a
+bad "type" or files[].path is known long before the reply ends. Only
+definite violations are reported; "required" is checked when the object
+closes.
+
+  iv = incremental(path)
+  for delta in stream:
+      if iv.feed(delta):   # new errors: stop reading, retry now
+          break
+
+CLI:
+  lib_schema.py source apps/router-demo/schemas/plan.schema.json   generated code
+  lib_schema.py check  apps/router-demo/schemas/plan.schema.json artifacts/runs/run_x/plan.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import lib_jsonscan
+
+Validator = Callable[[Any], List[str]]
+
+ANNOTATIONS = {"$schema", "$id", "title", "description", "default", "examples", "x-message", "x-repair"}
+KEYWORDS = {"type", "const", "enum", "required", "properties", "additionalProperties", "items",
+            "minItems", "maxItems", "contains", "minLength", "maxLength", "pattern",
+            "minimum", "maximum", "allOf"} | ANNOTATIONS
+
+_TYPE_CHECKS = {
+    "object": "isinstance({x}, dict)",
+    "array": "isinstance({x}, list)",
+    "string": "isinstance({x}, str)",
+    "integer": "(isinstance({x}, int) and not isinstance({x}, bool))",
+    "number": "(isinstance({x}, (int, float)) and not isinstance({x}, bool))",
+    "boolean": "isinstance({x}, bool)",
+    "null": "({x} is None)",
+}
+_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# (path, mtime_ns, size) -> validator
+_CACHE: Dict[Path, Tuple[Tuple[int, int], Validator]] = {}
+# id(subschema) -> (subschema, validator); the subschema is kept so its id is never reused
+_SUBS: Dict[int, Tuple[Any, Validator]] = {}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def _fesc(s: str) -> str:
+    return s.replace("{", "{{").replace("}", "}}")
+
+
+class _Gen:
+    """Emits the validator source. A path is a list of literal strings and ('var', name) parts."""
+
+    def __init__(self) -> None:
+        self.consts: Dict[str, Any] = {}
+        self.funcs: List[List[str]] = []
+        self.n = 0
+
+    def var(self, prefix: str) -> str:
+        self.n += 1
+        return f"{prefix}{self.n}"
+
+    def const(self, value: Any) -> str:
+        name = f"_c{len(self.consts)}"
+        self.consts[name] = value
+        return name
+
+    @staticmethod
+    def fmt(path: List[Any], msg: str, dyn: str = "") -> str:
+        """f-string source for '<path>: <msg><dyn>'."""
+        s = "".join("{%s}" % p[1] if isinstance(p, tuple) else _fesc(p) for p in path)
+        s += ": " + _fesc(msg) + ("{%s}" % dyn if dyn else "")
+        return "f" + repr(s)
+
+    def node(self, out: List[str], schema: Any, x: str, path: List[Any], ind: int) -> None:
+        if schema is True or schema == {}:
+            return
+        if schema is False:
+            out.append("    " * ind + f"_e({self.fmt(path, 'is not allowed')})")
+            return
+        if not isinstance(schema, dict):
+            raise SchemaError(f"{self._p(path)}: schema must be an object or boolean")
+        unknown = set(schema) - KEYWORDS
+        if unknown:
+            raise SchemaError(f"{self._p(path)}: unsupported keyword(s) {sorted(unknown)}")
+
+        override = schema.get("x-message")
+
+        def err(ind_: int, msg: str, dyn: str = "", custom: bool = False) -> None:
+            if custom and override:
+                msg, dyn = override, ""
+            out.append("    " * ind_ + f"_e({self.fmt(path, msg, dyn)})")
+
+        def emit(ind_: int, line: str) -> None:
+            out.append("    " * ind_ + line)
+
+        types = schema.get("type")
+        if types is not None:
+            tl = [types] if isinstance(types, str) else list(types)
+            bad = [t for t in tl if t not in _TYPE_CHECKS]
+            if bad:
+                raise SchemaError(f"{self._p(path)}: unknown type(s) {bad}")
+            cond = " or ".join(_TYPE_CHECKS[t].format(x=x) for t in tl)
+            emit(ind, f"if not ({cond}):")
+            err(ind + 1, "must be " + " or ".join(
+                {"object": "an object", "array": "an array", "integer": "an integer"}.get(t, f"a {t}") for t in tl))
+            emit(ind, "else:")
+            ind += 1
+        mark = len(out)
+        single = tl[0] if types is not None and len(tl) == 1 else None
+
+        def guarded(kind: str) -> int:
+            """Indent for checks that only apply to one JSON type."""
+            if single == kind:
+                return ind
+            emit(ind, f"if {_TYPE_CHECKS[kind].format(x=x)}:")
+            return ind + 1
+
+        if "const" in schema:
+            c = self.const(schema["const"])
+            emit(ind, f"if {x} != {c}:")
+            err(ind + 1, "must be " + json.dumps(schema["const"], ensure_ascii=False), custom=True)
+        if "enum" in schema:
+            c = self.const(list(schema["enum"]))
+            emit(ind, f"if {x} not in {c}:")
+            err(ind + 1, "must be one of " + json.dumps(schema["enum"], ensure_ascii=False), custom=True)
+
+        if any(k in schema for k in ("minLength", "maxLength", "pattern")):
+            i = guarded("string")
+            lo, hi = schema.get("minLength"), schema.get("maxLength")
+            if lo is not None:
+                emit(i, f"if len({x}) < {int(lo)}:")
+                err(i + 1, "must not be empty" if lo == 1 else f"must be at least {lo} chars")
+            if hi is not None:
+                emit(i, f"if len({x}) > {int(hi)}:")
+                err(i + 1, f"must be at most {hi} chars")
+            if "pattern" in schema:
+                try:
+                    rx = re.compile(schema["pattern"])
+                except re.error as e:
+                    raise SchemaError(f"{self._p(path)}: bad pattern: {e}") from None
+                c = self.const(rx)
+                emit(i, f"if not {c}.search({x}):")
+                err(i + 1, f"must match {schema['pattern']}", custom=True)
+
+        if "minimum" in schema or "maximum" in schema:
+            emit(ind, f"if {_TYPE_CHECKS['number'].format(x=x)}:")
+            if "minimum" in schema:
+                emit(ind + 1, f"if {x} < {schema['minimum']!r}:")
+                err(ind + 2, f"must be >= {schema['minimum']}")
+            if "maximum" in schema:
+                emit(ind + 1, f"if {x} > {schema['maximum']!r}:")
+                err(ind + 2, f"must be <= {schema['maximum']}")
+
+        if any(k in schema for k in ("minItems", "maxItems", "items", "contains")):
+            i = guarded("array")
+            if "minItems" in schema:
+                n = int(schema["minItems"])
+                emit(i, f"if len({x}) < {n}:")
+                err(i + 1, "must not be empty" if n == 1 else f"must have at least {n} items")
+            if "maxItems" in schema:
+                emit(i, f"if len({x}) > {int(schema['maxItems'])}:")
+                err(i + 1, f"must have at most {schema['maxItems']} items")
+            if "items" in schema and schema["items"] not in (True, {}):
+                iv, yv = self.var("_i"), self.var("_x")
+                emit(i, f"for {iv}, {yv} in enumerate({x}):")
+                self.node(out, schema["items"], yv, path + ["[", ("var", iv), "]"], i + 1)
+            if "contains" in schema:
+                fn = self.subfunction(schema["contains"])
+                yv = self.var("_x")
+                emit(i, f"if not any(not {fn}({yv}) for {yv} in {x}):")
+                err(i + 1, "must contain a matching item", custom=True)
+
+        if any(k in schema for k in ("required", "properties", "additionalProperties")):
+            i = guarded("object")
+            for k in schema.get("required") or []:
+                emit(i, f"if {k!r} not in {x}:")
+                out.append("    " * (i + 1) + f"_e({self.fmt(path + [self._key(k)], 'is required')})")
+            props = schema.get("properties") or {}
+            for k, sub in props.items():
+                if sub is True or sub == {}:
+                    continue
+                kv = self.var("_x")
+                emit(i, f"if {k!r} in {x}:")
+                emit(i + 1, f"{kv} = {x}[{k!r}]")
+                self.node(out, sub, kv, path + [self._key(k)], i + 1)
+            ap = schema.get("additionalProperties", True)
+            if ap is not True and ap != {}:
+                allowed = self.const(frozenset(props))
+                ev = self.var("_extra")
+                emit(i, f"{ev} = [_k for _k in {x} if _k not in {allowed}]")
+                if ap is False:
+                    emit(i, f"if {ev}:")
+                    err(i + 1, "unexpected properties ", f"sorted({ev})")
+                else:
+                    kv, vv = self.var("_k"), self.var("_x")
+                    emit(i, f"for {kv} in {ev}:")
+                    emit(i + 1, f"{vv} = {x}[{kv}]")
+                    self.node(out, ap, vv, path + [".", ("var", kv)], i + 1)
+
+        for sub in schema.get("allOf") or []:
+            self.node(out, sub, x, path, ind)
+        if len(out) == mark and types is not None:
+            emit(ind, "pass")  # type check only
+
+    def subfunction(self, schema: Any) -> str:
+        """Separate validator for a subschema whose result is needed as a bool (contains)."""
+        name = self.var("_sub")
+        out = [f"def {name}(v):", "    errs = []", "    _e = errs.append"]
+        self.node(out, schema, "v", ["$"], 1)
+        out.append("    return errs")
+        self.funcs.append(out)
+        return name
+
+    @staticmethod
+    def _key(k: str) -> str:
+        return f".{k}" if _IDENT_RE.match(k) else f"[{json.dumps(k)}]"
+
+    @staticmethod
+    def _p(path: List[Any]) -> str:
+        return "".join(p if isinstance(p, str) else "[*]" for p in path)
+
+
+def schema_source(schema: Any, name: str = "validate") -> Tuple[str, Dict[str, Any]]:
+    """(python source, constants namespace) of the validator for schema."""
+    g = _Gen()
+    body = [f"def {name}(v):", "    errs = []", "    _e = errs.append"]
+    g.node(body, schema, "v", ["$"], 1)
+    body.append("    return errs")
+    src = "\n\n".join("\n".join(f) for f in g.funcs + [body]) + "\n"
+    return src, g.consts
+
+
+def compile_schema(schema: Any, name: str = "validate", filename: str = "<schema>") -> Validator:
+    src, consts = schema_source(schema, name)
+    ns: Dict[str, Any] = dict(consts)
+    exec(compile(src, f"<compiled {filename}>", "exec"), ns)
+    fn = ns[name]
+    fn.source = src  # type: ignore[attr-defined]
+    fn.schema = schema  # type: ignore[attr-defined]
+    return fn
+
+
+def load_validator(path: Path) -> Validator:
+    """Compiled validator for a schema file; compiled once per process (again only if the file changes)."""
+    path = Path(path)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        raise SchemaError(f"missing schema file: {path}") from None
+    key = (st.st_mtime_ns, st.st_size)
+    hit = _CACHE.get(path)
+    if hit is not None and hit[0] == key:
+        return hit[1]
+    try:
+        schema = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError as e:
+        raise SchemaError(f"{path}: invalid JSON: {e}") from None
+    fn = compile_schema(schema, filename=path.name)
+    _CACHE[path] = (key, fn)
+    return fn
+
+
+def json_path(path: Tuple[Any, ...]) -> str:
+    """('files', 1, 'path') -> '$.files[1].path', the form errors are reported in."""
+    return "$" + "".join(f"[{p}]" if isinstance(p, int) else _Gen._key(p) for p in path)
+
+
+def subschema_at(schema: Any, path: Tuple[Any, ...]) -> Any:
+    """Subschema for path (properties / additionalProperties / items); None when unconstrained."""
+    node = schema
+    for p in path:
+        if not isinstance(node, dict):
+            return None
+        if isinstance(p, int):
+            node = node.get("items")
+        else:
+            props = node.get("properties") or {}
+            node = props[p] if p in props else node.get("additionalProperties", True)
+    return node if isinstance(node, dict) else None
+
+
+def sub_validator(schema: Any) -> Validator:
+    """Compiled validator for a node inside a loaded schema (cached per node)."""
+    hit = _SUBS.get(id(schema))
+    if hit is None or hit[0] is not schema:
+        hit = _SUBS[id(schema)] = (schema, compile_schema(schema, filename="<subschema>"))
+    return hit[1]
+
+
+class IncrementalValidator:
+    __slots__ = ("schema", "errors", "parser", "_new")
+
+    def __init__(self, schema: Any) -> None:
+        self.schema = schema
+        self.errors: List[str] = []
+        self._new: List[str] = []
+        self.parser = lib_jsonscan.StreamParser(on_key=self._on_key, on_value=self._on_value)
+
+    @property
+    def done(self) -> bool:
+        return self.parser.done
+
+    @property
+    def value(self) -> Optional[Dict[str, Any]]:
+        return self.parser.value
+
+    @property
+    def broken(self) -> Optional[str]:
+        return self.parser.broken
+
+    def feed(self, chunk: str) -> List[str]:
+        """Parse one more chunk; returns the violations it revealed ([] = nothing definite yet)."""
+        self._new = []
+        self.parser.feed(chunk)
+        self.errors.extend(self._new)
+        return self._new
+
+
+    def _on_key(self, path: Tuple[Any, ...], key: str) -> None:
+        node = subschema_at(self.schema, path)
+        if node is not None and node.get("additionalProperties", True) is False \
+                and key not in (node.get("properties") or {}):
+            self._new.append(f"{json_path(path)}: unexpected properties {[key]}")
+
+    def _on_value(self, path: Tuple[Any, ...], value: Any) -> None:
+        node = self.schema if not path else subschema_at(self.schema, path)
+        if node is None:
+            return
+        errs = sub_validator(node)(value)
+        if path:
+            prefix = json_path(path)
+            errs = [prefix + e[1:] for e in errs]
+        # forbidden keys were already reported when they arrived
+        self._new.extend(e for e in errs if e not in self.errors and e not in self._new)
+
+
+def incremental(path: Path) -> IncrementalValidator:
+    """IncrementalValidator for a schema file (schema loaded and compiled via load_validator's cache)."""
+    return IncrementalValidator(load_validator(path).schema)  # type: ignore[attr-defined]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Compile JSON schemas into Python validators.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("source", help="print the generated validator")
+    s.add_argument("schema")
+    c = sub.add_parser("check", help="validate JSON documents against a schema")
+    c.add_argument("schema")
+    c.add_argument("docs", nargs="+")
+    args = ap.parse_args()
+
+    try:
+        fn = load_validator(Path(args.schema))
+    except SchemaError as e:
+        sys.stderr.write(f"[schema] {e}\n")
+        return 2
+    if args.cmd == "source":
+        print(fn.source, end="")  # type: ignore[attr-defined]
+        return 0
+    rc = 0
+    for d in args.docs:
+        errs = fn(json.loads(Path(d).read_text(encoding="utf-8")))
+        print(f"[schema] {d}: {'ok' if not errs else f'{len(errs)} error(s)'}")
+        for e in errs:
+            print(f"  {e}")
+        rc = rc or (1 if errs else 0)
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
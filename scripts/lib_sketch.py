@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Mergeable quantile sketch for latency-like values (ms).
+
+Log-bucketed histogram (DDSketch style): value v lands in bucket
+ceil(log(v) / log(gamma)) with gamma = (1 + a) / (1 - a), so every quantile
+is answered within relative error `a`. Buckets are plain counters, which
+makes the sketch:
+  - mergeable   (add two sketches bucket-wise)
+  - subtractable (evict an old time bucket from a sliding window)
+  - JSON-serializable (to_dict / from_dict)
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Iterable, Optional
+
+DEFAULT_REL_ACC = 0.01
+
+
+class LogHistogram:
+    __slots__ = ("rel_acc", "_log_gamma", "bins", "zeros", "count", "total", "min", "max")
+
+    def __init__(self, rel_acc: float = DEFAULT_REL_ACC) -> None:
+        self.rel_acc = rel_acc
+        self._log_gamma = math.log((1 + rel_acc) / (1 - rel_acc))
+        self.bins: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        # min/max are exact for add/merge only; after subtract they are bounds
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def _key(self, v: float) -> int:
+        return int(math.ceil(math.log(v) / self._log_gamma))
+
+    def _value(self, k: int) -> float:
+        # midpoint of bucket (gamma^(k-1), gamma^k] in relative terms
+        return 2.0 * math.exp(k * self._log_gamma) / (1.0 + math.exp(self._log_gamma))
+
+    def add(self, v: float, n: int = 1) -> None:
+        if v <= 0:
+            self.zeros += n
+        else:
+            k = self._key(v)
+            self.bins[k] = self.bins.get(k, 0) + n
+        self.count += n
+        self.total += v * n
+        self.min = v if self.min is None or v < self.min else self.min
+        self.max = v if self.max is None or v > self.max else self.max
+
+    def extend(self, values: Iterable[float]) -> None:
+        for v in values:
+            self.add(v)
+
+    def merge(self, other: "LogHistogram") -> None:
+        self._check_compatible(other)
+        for k, n in other.bins.items():
+            self.bins[k] = self.bins.get(k, 0) + n
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None or other.min < self.min else self.min
+        if other.max is not None:
+            self.max = other.max if self.max is None or other.max > self.max else self.max
+
+    def subtract(self, other: "LogHistogram") -> None:
+        self._check_compatible(other)
+        for k, n in other.bins.items():
+            left = self.bins.get(k, 0) - n
+            if left > 0:
+                self.bins[k] = left
+            else:
+                self.bins.pop(k, None)
+        self.zeros = max(0, self.zeros - other.zeros)
+        self.count = max(0, self.count - other.count)
+        self.total = self.total - other.total if self.count else 0.0
+        if not self.count:
+            self.min = self.max = None
+
+    def _check_compatible(self, other: "LogHistogram") -> None:
+        if abs(other.rel_acc - self.rel_acc) > 1e-12:
+            raise ValueError(f"sketch rel_acc mismatch: {self.rel_acc} vs {other.rel_acc}")
+
+    def mean(self) -> Optional[float]:
+        return (self.total / self.count) if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Nearest-rank quantile (same convention as the exact quantile() helpers)."""
+        if not self.count:
+            return None
+        rank = max(1, min(self.count, int(math.ceil(q * self.count))))
+        seen = self.zeros
+        if rank <= seen:
+            return 0.0
+        for k in sorted(self.bins):
+            seen += self.bins[k]
+            if seen >= rank:
+                v = self._value(k)
+                if self.min is not None and self.max is not None:
+                    v = min(max(v, self.min), self.max)
+                return v
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rel_acc": self.rel_acc,
+            "bins": {str(k): n for k, n in self.bins.items()},
+            "zeros": self.zeros,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "LogHistogram":
+        h = cls(float(d.get("rel_acc", DEFAULT_REL_ACC)))
+        h.bins = {int(k): int(n) for k, n in (d.get("bins") or {}).items()}
+        h.zeros = int(d.get("zeros", 0))
+        h.count = int(d.get("count", 0))
+        h.total = float(d.get("total", 0.0))
+        h.min = d.get("min")
+        h.max = d.get("max")
+        return h
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Spans for the plan -> scaffold -> verify pipeline.
+
+A span is one timed operation with an id, a parent and attributes:
+
+  {"trace_id": 32 hex, "span_id": 16 hex, "parent_id": 16 hex | "",
+   "name": "plan.attempt", "start_ns": ..., "end_ns": ..., "ts_ms": start ms,
+   "status": "ok" | "error", "attrs": {"model": ..., "attempt": 2, ...},
+   "run_dir": "..."}
+
+Finished spans are appended (lib_append) to logs/spans.jsonl, and also to
+<run_dir>/spans.jsonl once the span knows its run (attribute run_dir).
+
+Context propagation:
+  - in-process: the current span is a contextvar; nested `with span(...)`
+    blocks become children
+  - across processes: child_env() puts a W3C TRACEPARENT in the
+    environment; a process that starts without a current span continues
+    from $TRACEPARENT
+  - across make steps of one run: bind_run_trace(run_dir, span) stores the run's
+    trace id + root span in <run_dir>/trace.json; later steps for that run
+    (scaffold, verify) attach to it when no TRACEPARENT is set
+
+trace_export.py turns a run's spans into an OTLP-JSON file.
+
+Shell:
+  python3 scripts/lib_trace.py run --name verify.npm_install --run-dir "$run_dir" -- npm ci
+"""
+from __future__ import annotations
+
+import argparse
+import contextvars
+import json
+import os
+import secrets
+import subprocess
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import lib_append
+import lib_logseg
+
+ROOT = Path(__file__).resolve().parents[1]
+GLOBAL_SPANS = ROOT / "logs" / "spans.jsonl"
+RUN_TRACE_FILE = "trace.json"
+RUN_SPANS_FILE = "spans.jsonl"
+
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("lib_trace_span", default=None)
+
+
+def _new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def _new_span_id() -> str:
+    return secrets.token_hex(8)
+
+
+def parse_traceparent(v: str) -> Optional[Tuple[str, str]]:
+    """'00-<trace_id>-<span_id>-<flags>' -> (trace_id, span_id)."""
+    parts = (v or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    if set(parts[1]) == {"0"} or set(parts[2]) == {"0"}:
+        return None
+    return parts[1], parts[2]
+
+
+def _read_json(p: Path) -> Optional[Dict[str, Any]]:
+    try:
+        obj = json.loads(p.read_text(encoding="utf-8"))
+        return obj if isinstance(obj, dict) else None
+    except Exception:
+        return None
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start_ns", "end_ns", "attrs", "status", "run_dir")
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = "", attrs: Optional[Dict[str, Any]] = None,
+                 run_dir: str = "") -> None:
+        self.trace_id = trace_id
+        self.span_id = _new_span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attrs: Dict[str, Any] = {k: v for k, v in (attrs or {}).items() if v is not None}
+        self.status = "ok"
+        self.run_dir = run_dir
+
+    def set(self, **attrs: Any) -> "Span":
+        for k, v in attrs.items():
+            if v is not None:
+                self.attrs[k] = v
+        return self
+
+    def fail(self, error_class: str = "", message: str = "") -> "Span":
+        self.status = "error"
+        return self.set(error_class=error_class or None, message=message or None)
+
+    def bind_run(self, run_dir: str) -> "Span":
+        """Attach this span (and, on end, its record) to a run dir."""
+        if run_dir:
+            self.run_dir = str(run_dir)
+        return self
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "ts_ms": self.start_ns // 1_000_000,
+            "duration_ms": None if self.end_ns is None else (self.end_ns - self.start_ns) / 1e6,
+            "status": self.status,
+            "attrs": self.attrs,
+            "run_dir": self.run_dir,
+        }
+
+    def end(self) -> None:
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        _record(self)
+
+
+def _record(sp: Span) -> None:
+    line = json.dumps(sp.to_dict(), ensure_ascii=False)
+    try:
+        lib_logseg.maybe_rotate(GLOBAL_SPANS)
+    except Exception:
+        pass
+    # tracing is best-effort; never fail the traced operation
+    for p in ([GLOBAL_SPANS] + ([Path(sp.run_dir) / RUN_SPANS_FILE] if sp.run_dir else [])):
+        try:
+            lib_append.append_line(p, line)
+        except OSError:
+            pass
+
+
+def run_context(run_dir: str) -> Optional[Tuple[str, str]]:
+    """(trace_id, root span_id) recorded for a run by bind_run_trace(), if any."""
+    if not run_dir:
+        return None
+    obj = _read_json(Path(run_dir) / RUN_TRACE_FILE) or {}
+    tid, sid = str(obj.get("trace_id") or ""), str(obj.get("root_span_id") or "")
+    return (tid, sid) if len(tid) == 32 and len(sid) == 16 else None
+
+
+def bind_run_trace(run_dir: str, sp: Span) -> None:
+    """Make sp the root that later steps of this run (scaffold, verify) attach to."""
+    if not run_dir:
+        return
+    p = Path(run_dir) / RUN_TRACE_FILE
+    if run_context(run_dir):
+        return
+    try:
+        p.write_text(json.dumps({"trace_id": sp.trace_id, "root_span_id": sp.span_id,
+                                 "root_name": sp.name}, ensure_ascii=False) + "\n", encoding="utf-8")
+    except OSError:
+        pass
+
+
+def start_span(name: str, run_dir: str = "", **attrs: Any) -> Span:
+    """Parent: current span, else $TRACEPARENT, else the run's trace.json, else a new trace."""
+    parent = _current.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, attrs, run_dir or parent.run_dir)
+    ctx = parse_traceparent(os.environ.get("TRACEPARENT", "")) or run_context(run_dir)
+    if ctx:
+        return Span(name, ctx[0], ctx[1], attrs, run_dir)
+    return Span(name, _new_trace_id(), "", attrs, run_dir)
+
+
+@contextmanager
+def span(name: str, run_dir: str = "", **attrs: Any) -> Iterator[Span]:
+    """with span("plan.http", model=m) as sp: ...  (exceptions mark the span as error)"""
+    sp = start_span(name, run_dir, **attrs)
+    token = _current.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        if sp.status == "ok" and not (isinstance(e, SystemExit) and e.code in (0, None)):
+            sp.fail(type(e).__name__, str(e)[:300])
+        raise
+    finally:
+        _current.reset(token)
+        sp.end()
+
+
+def current() -> Optional[Span]:
+    return _current.get()
+
+
+def child_env(env: Optional[Dict[str, str]] = None, sp: Optional[Span] = None) -> Dict[str, str]:
+    """Environment for a subprocess whose spans should nest under sp (default: the current span)."""
+    out = dict(os.environ if env is None else env)
+    sp = sp or _current.get()
+    if sp is not None:
+        out["TRACEPARENT"] = sp.traceparent
+    return out
+
+
+def load_spans(run_dir: Path) -> List[Dict[str, Any]]:
+    """All spans of a run's trace(s): the run's spans.jsonl plus matching global spans."""
+    run_dir = Path(run_dir)
+    spans: Dict[str, Dict[str, Any]] = {}
+    trace_ids = set()
+    rp = run_dir / RUN_SPANS_FILE
+    if rp.exists():
+        for line in rp.read_text(encoding="utf-8", errors="replace").splitlines():
+            try:
+                s = json.loads(line)
+            except Exception:
+                continue
+            spans[s["span_id"]] = s
+            trace_ids.add(s["trace_id"])
+    ctx = run_context(str(run_dir))
+    if ctx:
+        trace_ids.add(ctx[0])
+    if not trace_ids:
+        return []
+    # spans that ended before they learned the run dir only live in the global log
+    since = min((s["ts_ms"] for s in spans.values()), default=None)
+    since_s = since / 1000.0 - 3600 if since else None
+    for line in lib_logseg.iter_lines(GLOBAL_SPANS, since=since_s):
+        if not any(t in line for t in trace_ids):
+            continue
+        try:
+            s = json.loads(line)
+        except Exception:
+            continue
+        if s.get("trace_id") in trace_ids:
+            spans.setdefault(s["span_id"], s)
+    return sorted(spans.values(), key=lambda s: (s.get("start_ns") or 0))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Run a command inside a span (for shell scripts).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run")
+    r.add_argument("--name", required=True)
+    r.add_argument("--run-dir", default="")
+    r.add_argument("--attr", action="append", default=[], help="key=value (repeatable)")
+    r.add_argument("argv", nargs=argparse.REMAINDER)
+    args = ap.parse_args()
+
+    argv = args.argv[1:] if args.argv[:1] == ["--"] else args.argv
+    if not argv:
+        ap.error("run: missing command after --")
+    attrs: Dict[str, Any] = dict(a.split("=", 1) for a in args.attr if "=" in a)
+    with span(args.name, run_dir=args.run_dir, **attrs) as sp:
+        rc = subprocess.call(argv, env=child_env())
+        sp.set(rc=rc)
+        if rc != 0:
+            sp.fail("nonzero_exit", f"rc={rc}")
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+import argparse
+import json
+from pathlib import Path
+
+import lib_logseg
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_LOGS = [ROOT / "logs" / "ask_history.log", ROOT / "logs" / "events.jsonl"]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Rotate + compress append logs (ask_history.log, events.jsonl).")
+    ap.add_argument("logs", nargs="*", help="default: logs/ask_history.log logs/events.jsonl")
+    ap.add_argument("--max-bytes", type=int, default=lib_logseg.DEFAULT_MAX_BYTES)
+    ap.add_argument("--max-age-hours", type=float, default=lib_logseg.DEFAULT_MAX_AGE_S / 3600.0)
+    ap.add_argument("--codec", default=lib_logseg.DEFAULT_CODEC, choices=["gzip", "zstd", "none"])
+    ap.add_argument("--force", action="store_true", help="rotate even if below thresholds")
+    ap.add_argument("--keep-days", type=float, default=0.0, help="drop closed segments older than N days (0=keep all)")
+    ap.add_argument("--list", action="store_true", help="print manifest and exit")
+    args = ap.parse_args()
+
+    paths = [Path(x) for x in args.logs] if args.logs else DEFAULT_LOGS
+
+    for p in paths:
+        if args.list:
+            print(json.dumps(lib_logseg.load_manifest(p), ensure_ascii=False, indent=2))
+            continue
+
+        if args.force:
+            entry = lib_logseg.rotate(p, codec=args.codec)
+        else:
+            entry = lib_logseg.maybe_rotate(p, max_bytes=args.max_bytes,
+                                            max_age_s=args.max_age_hours * 3600.0, codec=args.codec)
+        if entry:
+            print(f"[rotate] {p.name} -> {entry['file']} lines={entry['lines']} "
+                  f"raw={entry['raw_bytes']} stored={entry['bytes']}")
+        else:
+            print(f"[rotate] {p.name}: below thresholds (skip)")
+
+        if args.keep_days > 0:
+            n = lib_logseg.prune(p, args.keep_days)
+            print(f"[rotate] {p.name}: pruned segments={n}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
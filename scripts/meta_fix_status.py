@@ -6,9 +6,11 @@ import json
 from pathlib import Path
 from typing import Any, Optional
 
+from lib_run import resolve_run
+from lib_runcat import open_catalog, upsert_quiet
+
 ROOT = Path(__file__).resolve().parents[1]
 RUNS_ROOT = ROOT / "artifacts" / "runs"
-LATEST = RUNS_ROOT / "LATEST"
 
 def truthy_ok(v: Any) -> Optional[bool]:
     if isinstance(v, bool):
@@ -51,21 +53,13 @@ def infer_status_from_run(run_dir: Path) -> str:
     return "unknown"
 
 def resolve_target_run_dir(arg: str) -> Optional[Path]:
-    if arg:
-        p = Path(arg)
-        if not p.is_absolute():
-            p = ROOT / p
-        return p if p.exists() else None
-
-    if LATEST.exists():
-        s = LATEST.read_text(encoding="utf-8", errors="ignore").strip()
-        if s:
-            p = Path(s)
-            if not p.is_absolute():
-                p = ROOT / p
-            if p.exists():
-                return p
-    return None
+    # --run-dir, else $RUN_DIR, else LATEST
+    p = resolve_run(arg, RUNS_ROOT)
+    if p is None:
+        return None
+    if not p.is_absolute():
+        p = ROOT / p
+    return p if p.exists() else None
 
 def fix_one(run_dir: Path, force: bool) -> bool:
     meta_path = run_dir / "meta.run.json"
@@ -78,24 +72,32 @@ def fix_one(run_dir: Path, force: bool) -> bool:
     meta["status"] = new_status
     meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
     print(f"[meta_fix_status] {run_dir.name}: {cur or '-'} -> {new_status}")
+    upsert_quiet([run_dir])
     return True
 
 def main() -> int:
     ap = argparse.ArgumentParser()
-    ap.add_argument("--run-dir", default="", help="default: artifacts/runs/LATEST")
+    ap.add_argument("--run-dir", default="", help="default: $RUN_DIR, else artifacts/runs/LATEST")
     ap.add_argument("--all", action="store_true", help="fix all run_* under artifacts/runs/")
     ap.add_argument("--force", action="store_true", help="overwrite even if status is already ok/fail")
     args = ap.parse_args()
 
     updated = 0
     if args.all:
-        for d in sorted(RUNS_ROOT.glob("run_*"), key=lambda p: p.stat().st_mtime, reverse=True):
+        with open_catalog() as cat:
+            # unless --force, only runs whose meta status is missing / unknown need a look; selected on
+            # meta_status, not the derived status (that one already reads verify_summary.json)
+            if args.force:
+                run_dirs = [Path(r["run_dir"]) for r in cat.list(limit=cat.count() or 1)]
+            else:
+                run_dirs = [Path(d) for d in cat.meta_status_unset()]
+        for d in run_dirs:
             if d.is_dir() and fix_one(d, force=args.force):
                 updated += 1
     else:
         rd = resolve_target_run_dir(args.run_dir)
         if not rd or not rd.is_dir():
-            print("[meta_fix_status] cannot resolve run_dir (set --run-dir or ensure artifacts/runs/LATEST exists)")
+            print("[meta_fix_status] cannot resolve run_dir (pass --run-dir, set RUN_DIR or ensure artifacts/runs/LATEST exists)")
             return 2
         if fix_one(rd, force=args.force):
             updated += 1
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Batch generator: many plan requests through plan -> scaffold -> verify at once.
+
+Stages and their executors:
+  plan      asyncio subprocesses (plan_policy.py / plan_web_policy.py), at most
+            --plan-concurrency LLM plans in flight
+  scaffold  thread pool (--scaffold-workers): scaffold.py, or scaffold_web.py +
+            apply_plan_web.py; short, I/O bound
+  verify    process pool sized to cores (--verify-workers): verify_generated.sh /
+            verify_generated_web.sh (pip / npm install + build), then write_run_meta.py
+
+Stages are connected by bounded queues (--queue-size). A finished plan keeps
+its plan slot until the scaffold queue has room, and scaffold workers block
+on a full verify queue, so a slow verify stage throttles new LLM calls
+instead of piling up generated projects.
+
+Every job gets its own run (lib_run handle): the policy prints the run dir it
+made, later steps get it as RUN_DIR, so nothing reads LATEST and parallel
+jobs never see each other's runs. Steps go through run_step_log.sh, so each
+run still has its step logs, events and spans.
+
+Requests file: one request per line, either plain text or JSON
+  {"text": "...", "kind": "plan" | "plan_web", "model": "...", "id": "..."}
+Blank lines and lines starting with # are skipped.
+
+Usage:
+  pipeline.py --requests artifacts/tmp/batch.jsonl
+  pipeline.py --text "python CLI named wc2" --text "python CLI named tally" --no-verify
+  -> table on stdout + artifacts/pipeline/pipeline_<stamp>.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from lib_run import write_atomic
+
+ROOT = Path(__file__).resolve().parents[1]
+APP_DIR = ROOT / "apps" / "router-demo"
+OUT_DIR = ROOT / "artifacts" / "pipeline"
+KINDS = ("plan", "plan_web")
+STAGES = ("plan", "scaffold", "verify")
+TAIL_CHARS = 1500
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def run_cmds(cmds: List[List[str]], env: Dict[str, str]) -> Tuple[int, str]:
+    """Run commands in order, stop at the first failure. Module level so a process pool can run it."""
+    tail = ""
+    for cmd in cmds:
+        p = subprocess.run(cmd, cwd=str(ROOT), env=env, capture_output=True, text=True)
+        tail = ((p.stdout or "") + (p.stderr or ""))[-TAIL_CHARS:]
+        if p.returncode != 0:
+            return p.returncode, tail
+    return 0, tail
+
+
+class Job:
+    __slots__ = ("id", "kind", "text", "model", "run_dir", "status", "failed_stage",
+                 "stage_ms", "wait_ms", "enqueued_ms", "tail")
+
+    def __init__(self, id: str, kind: str, text: str, model: str) -> None:
+        self.id = id
+        self.kind = kind
+        self.text = text
+        self.model = model
+        self.run_dir = ""
+        self.status = "pending"
+        self.failed_stage = ""
+        self.stage_ms: Dict[str, int] = {}
+        self.wait_ms: Dict[str, int] = {}
+        self.enqueued_ms = 0
+        self.tail = ""
+
+    def fail(self, stage: str, tail: str) -> None:
+        self.status = "fail"
+        self.failed_stage = stage
+        self.tail = tail[-TAIL_CHARS:]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "model": self.model,
+            "run_dir": self.run_dir,
+            "status": self.status,
+            "failed_stage": self.failed_stage,
+            "stage_ms": self.stage_ms,
+            "queue_wait_ms": self.wait_ms,
+            "tail": self.tail if self.status == "fail" else "",
+        }
+
+
+def load_requests(path: Optional[str], texts: List[str], kind: str, model: str) -> List[Job]:
+    lines: List[str] = list(texts)
+    if path:
+        lines += Path(path).read_text(encoding="utf-8").splitlines()
+    jobs: List[Job] = []
+    for line in lines:
+        s = line.strip()
+        if not s or s.startswith("#"):
+            continue
+        obj: Dict[str, Any] = {"text": s}
+        if s.startswith("{"):
+            try:
+                obj = json.loads(s)
+            except ValueError:
+                pass
+        k = str(obj.get("kind") or kind)
+        if k not in KINDS:
+            raise SystemExit(f"[pipeline] unknown kind {k!r} (expected one of {KINDS})")
+        jid = str(obj.get("id") or f"req_{len(jobs) + 1:03d}")
+        jobs.append(Job(jid, k, str(obj.get("text") or ""), str(obj.get("model") or model)))
+    return jobs
+
+
+class Pipeline:
+    def __init__(self, api_base: str, plan_concurrency: int, scaffold_workers: int,
+                 verify_workers: int, queue_size: int, verify: bool, work_dir: Path) -> None:
+        self.api_base = api_base
+        self.plan_concurrency = max(1, plan_concurrency)
+        self.scaffold_workers = max(1, scaffold_workers)
+        self.verify_workers = max(1, verify_workers)
+        self.queue_size = max(1, queue_size)
+        self.verify = verify
+        self.work_dir = work_dir
+        self.max_depth = {"scaffold": 0, "verify": 0}
+
+    # ---------------- per-stage commands ----------------
+
+    def plan_cmd(self, job: Job, text_file: Path) -> List[str]:
+        policy = APP_DIR / ("plan_web_policy.py" if job.kind == "plan_web" else "plan_policy.py")
+        return [sys.executable, str(policy), "--text-file", str(text_file),
+                "--api-base", self.api_base, "--model", job.model]
+
+    def scaffold_cmds(self, job: Job) -> List[List[str]]:
+        step = [str(ROOT / "scripts" / "run_step_log.sh")]
+        if job.kind == "plan_web":
+            return [step + ["scaffold_web", "--", sys.executable, str(APP_DIR / "scaffold_web.py"),
+                            "--run-dir", job.run_dir],
+                    step + ["apply_plan_web", "--", sys.executable, str(APP_DIR / "apply_plan_web.py"),
+                            "--run-dir", job.run_dir]]
+        return [step + ["scaffold", "--", sys.executable, str(APP_DIR / "scaffold.py"), "--run-dir", job.run_dir]]
+
+    def verify_cmds(self, job: Job) -> List[List[str]]:
+        step = [str(ROOT / "scripts" / "run_step_log.sh")]
+        name = "verify_generated_web" if job.kind == "plan_web" else "verify_generated"
+        return [step + [name, "--", str(ROOT / "scripts" / f"{name}.sh")],
+                [sys.executable, str(ROOT / "scripts" / "write_run_meta.py"), "--run-dir", job.run_dir]]
+
+    def job_env(self, job: Job) -> Dict[str, str]:
+        env = dict(os.environ)
+        env["RUN_DIR"] = job.run_dir
+        env["KIND"] = job.kind
+        # the policy's own root span starts each run's trace
+        env.pop("TRACEPARENT", None)
+        return env
+
+    # ---------------- stages ----------------
+
+    async def _put(self, q: "asyncio.Queue[Optional[Job]]", stage: str, job: Job) -> None:
+        job.enqueued_ms = _now_ms()
+        await q.put(job)
+        self.max_depth[stage] = max(self.max_depth[stage], q.qsize())
+
+    async def _get(self, q: "asyncio.Queue[Optional[Job]]", stage: str) -> Optional[Job]:
+        job = await q.get()
+        if job is not None:
+            job.wait_ms[stage] = _now_ms() - job.enqueued_ms
+        return job
+
+    async def _plan(self, job: Job, sem: asyncio.Semaphore, scaffold_q: "asyncio.Queue[Optional[Job]]") -> None:
+        async with sem:
+            text_file = self.work_dir / f"{job.id}.txt"
+            text_file.write_text(job.text, encoding="utf-8")
+            env = dict(os.environ)
+            env.pop("RUN_DIR", None)
+            env.pop("TRACEPARENT", None)
+            t0 = _now_ms()
+            proc = await asyncio.create_subprocess_exec(
+                *self.plan_cmd(job, text_file), cwd=str(ROOT), env=env,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            out, err = await proc.communicate()
+            job.stage_ms["plan"] = _now_ms() - t0
+            stdout = out.decode("utf-8", "replace")
+            lines = [l.strip() for l in stdout.splitlines() if l.strip()]
+            # the policy prints the final run dir as its last line
+            if proc.returncode != 0 or not lines or not Path(lines[-1]).is_dir():
+                job.fail("plan", stdout + err.decode("utf-8", "replace"))
+                print(f"[pipeline] {job.id} plan FAIL rc={proc.returncode}", flush=True)
+                return
+            job.run_dir = lines[-1]
+            print(f"[pipeline] {job.id} plan ok run_dir={job.run_dir}", flush=True)
+            # still holding the plan slot: a full scaffold queue stops new LLM calls
+            await self._put(scaffold_q, "scaffold", job)
+
+    async def _stage_worker(self, stage: str, pool: Executor, in_q: "asyncio.Queue[Optional[Job]]",
+                            out_q: "Optional[asyncio.Queue[Optional[Job]]]") -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self._get(in_q, stage)
+            if job is None:
+                return
+            cmds = self.scaffold_cmds(job) if stage == "scaffold" else self.verify_cmds(job)
+            t0 = _now_ms()
+            try:
+                rc, tail = await loop.run_in_executor(pool, run_cmds, cmds, self.job_env(job))
+            except Exception as e:  # broken pool etc.: fail this job, keep the stage alive
+                rc, tail = -1, f"{type(e).__name__}: {e}"
+            job.stage_ms[stage] = _now_ms() - t0
+            if rc != 0:
+                job.fail(stage, tail)
+                print(f"[pipeline] {job.id} {stage} FAIL rc={rc}", flush=True)
+                continue
+            print(f"[pipeline] {job.id} {stage} ok", flush=True)
+            if out_q is None:
+                job.status = "ok"
+            else:
+                await self._put(out_q, "verify", job)
+
+    async def run(self, jobs: List[Job]) -> None:
+        scaffold_q: asyncio.Queue[Optional[Job]] = asyncio.Queue(maxsize=self.queue_size)
+        verify_q: Optional[asyncio.Queue[Optional[Job]]] = (
+            asyncio.Queue(maxsize=self.queue_size) if self.verify else None)
+        sem = asyncio.Semaphore(self.plan_concurrency)
+
+        with ThreadPoolExecutor(self.scaffold_workers, thread_name_prefix="scaffold") as tpool, \
+                ProcessPoolExecutor(self.verify_workers) as ppool:
+            scaffolders = [asyncio.create_task(self._stage_worker("scaffold", tpool, scaffold_q, verify_q))
+                           for _ in range(self.scaffold_workers)]
+            verifiers = ([asyncio.create_task(self._stage_worker("verify", ppool, verify_q, None))
+                          for _ in range(self.verify_workers)] if verify_q is not None else [])
+
+            await asyncio.gather(*(self._plan(j, sem, scaffold_q) for j in jobs))
+            for _ in scaffolders:
+                await scaffold_q.put(None)
+            await asyncio.gather(*scaffolders)
+            if verify_q is not None:
+                for _ in verifiers:
+                    await verify_q.put(None)
+                await asyncio.gather(*verifiers)
+
+
+def summarize(jobs: List[Job], p: Pipeline, wall_ms: int) -> Dict[str, Any]:
+    busy = {s: sum(j.stage_ms.get(s, 0) for j in jobs) for s in STAGES}
+    serial_ms = sum(busy.values())
+    waits = {s: [j.wait_ms[s] for j in jobs if s in j.wait_ms] for s in ("scaffold", "verify")}
+    return {
+        "generated_at": int(time.time()),
+        "wall_ms": wall_ms,
+        "serial_ms": serial_ms,  # what one-at-a-time `make genv` would have spent
+        "speedup": round(serial_ms / wall_ms, 2) if wall_ms > 0 else None,
+        "jobs": len(jobs),
+        "ok": sum(1 for j in jobs if j.status == "ok"),
+        "failed": {s: sum(1 for j in jobs if j.failed_stage == s) for s in STAGES},
+        "config": {"plan_concurrency": p.plan_concurrency, "scaffold_workers": p.scaffold_workers,
+                   "verify_workers": p.verify_workers, "queue_size": p.queue_size, "verify": p.verify},
+        "stage_busy_ms": busy,
+        "queue": {s: {"max_depth": p.max_depth[s],
+                      "mean_wait_ms": round(sum(w) / len(w), 1) if w else 0,
+                      "max_wait_ms": max(w) if w else 0} for s, w in waits.items()},
+        "results": [j.to_dict() for j in jobs],
+    }
+
+
+def _fmt_s(ms: Optional[int]) -> str:
+    return "-" if ms is None else f"{ms / 1000:.1f}s"
+
+
+def render(summary: Dict[str, Any]) -> str:
+    lines = [f"{'id':<12} {'kind':<9} {'status':<10} {'plan':>7} {'scaffold':>9} {'verify':>7}  run_dir"]
+    for r in summary["results"]:
+        st = r["status"] if r["status"] != "fail" else f"x:{r['failed_stage']}"
+        lines.append(f"{r['id']:<12} {r['kind']:<9} {st:<10} {_fmt_s(r['stage_ms'].get('plan')):>7} "
+                     f"{_fmt_s(r['stage_ms'].get('scaffold')):>9} {_fmt_s(r['stage_ms'].get('verify')):>7}  "
+                     f"{r['run_dir'] or '-'}")
+    q = summary["queue"]
+    lines.append("")
+    lines.append(f"jobs={summary['jobs']} ok={summary['ok']} failed={summary['failed']}")
+    lines.append(f"wall={_fmt_s(summary['wall_ms'])} serial={_fmt_s(summary['serial_ms'])} "
+                 f"speedup={summary['speedup']}x")
+    for s in ("scaffold", "verify"):
+        lines.append(f"queue {s:<8} max_depth={q[s]['max_depth']} mean_wait={q[s]['mean_wait_ms']}ms "
+                     f"max_wait={q[s]['max_wait_ms']}ms")
+    return "\n".join(lines) + "\n"
+
+
+def main() -> int:
+    cores = os.cpu_count() or 1
+    ap = argparse.ArgumentParser(description="Run many plan requests through plan -> scaffold -> verify in parallel.")
+    ap.add_argument("--requests", default="", help="file: one request per line (text or JSON)")
+    ap.add_argument("--text", action="append", default=[], help="a request (repeatable)")
+    ap.add_argument("--kind", default="plan", choices=KINDS, help="default kind for plain-text requests")
+    ap.add_argument("--api-base", default=os.environ.get("API_BASE", "http://127.0.0.1:4000"))
+    ap.add_argument("--model", default="default-chat")
+    ap.add_argument("--plan-concurrency", type=int, default=int(os.environ.get("PIPELINE_PLAN_CONCURRENCY", "4")))
+    ap.add_argument("--scaffold-workers", type=int, default=int(os.environ.get("PIPELINE_SCAFFOLD_WORKERS", "4")))
+    ap.add_argument("--verify-workers", type=int, default=int(os.environ.get("PIPELINE_VERIFY_WORKERS", str(cores))))
+    ap.add_argument("--queue-size", type=int, default=int(os.environ.get("PIPELINE_QUEUE_SIZE", "4")),
+                    help="bound of the scaffold and verify queues (backpressure)")
+    ap.add_argument("--no-verify", action="store_true", help="stop after scaffold")
+    ap.add_argument("--out", default="", help="summary JSON (default: artifacts/pipeline/pipeline_<stamp>.json)")
+    args = ap.parse_args()
+
+    jobs = load_requests(args.requests, args.text, args.kind, args.model)
+    if not jobs:
+        ap.error("no requests: pass --requests FILE or --text")
+    if len({j.id for j in jobs}) != len(jobs):
+        raise SystemExit("[pipeline] duplicate request ids")
+
+    stamp = time.strftime("%Y%m%d_%H%M%S")
+    work_dir = ROOT / "artifacts" / "tmp" / f"pipeline_{stamp}_{os.getpid()}"
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    p = Pipeline(args.api_base, args.plan_concurrency, args.scaffold_workers, args.verify_workers,
+                 args.queue_size, not args.no_verify, work_dir)
+    print(f"[pipeline] jobs={len(jobs)} plan_concurrency={p.plan_concurrency} "
+          f"scaffold_workers={p.scaffold_workers} verify_workers={p.verify_workers} queue={p.queue_size}",
+          flush=True)
+    t0 = _now_ms()
+    asyncio.run(p.run(jobs))
+    summary = summarize(jobs, p, _now_ms() - t0)
+
+    out = Path(args.out) if args.out else OUT_DIR / f"pipeline_{stamp}.json"
+    write_atomic(out, json.dumps(summary, ensure_ascii=False, indent=2) + "\n")
+    print(render(summary), end="")
+    print(f"[pipeline] summary: {out}")
+    return 0 if summary["ok"] == len(jobs) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -59,6 +59,7 @@ def main() -> int:
     decision.setdefault("model", "default-chat")
     decision.setdefault("timeout_s", 120)
     decision.setdefault("json_only", False)
+    decision.setdefault("response_format", "json_object")
     decision.setdefault("fallback_models", [])
     decision.setdefault("max_total_attempts", 1)
     decision.setdefault("retry_on_http", [429, 500, 502, 503, 504])
@@ -78,6 +79,8 @@ def main() -> int:
         decision["fallback_models"] = []
     if not isinstance(decision.get("retry_on_http"), list):
         decision["retry_on_http"] = [429, 500, 502, 503, 504]
+    if decision.get("response_format") not in ("json_schema", "json_object", "off"):
+        decision["response_format"] = "json_object"
     try:
         decision["max_total_attempts"] = int(decision.get("max_total_attempts", 1))
     except Exception:
@@ -89,6 +92,8 @@ def main() -> int:
         "model": decision["model"],
         "timeout_s": decision["timeout_s"],
         "json_only": bool(decision["json_only"]),
+        # what json_only turns into on the request: json_schema / json_object, off = prompt only
+        "response_format": decision["response_format"] if decision["json_only"] else "off",
         "fallback_models": decision["fallback_models"],
         "max_total_attempts": decision["max_total_attempts"],
         "max_attempts": decision["max_total_attempts"],
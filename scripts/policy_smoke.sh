@@ -19,6 +19,7 @@ import json, sys
 d=json.loads(sys.argv[1])
 assert d["json_only"] is True
 assert d["max_attempts"] >= 3
+assert d["response_format"] == "json_schema"
 print("[ok] plan_web json_only")
 PY
 
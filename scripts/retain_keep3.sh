@@ -13,9 +13,11 @@ mapfile -t GENS < <(ls -1dt apps/generated/*__* 2>/dev/null || true)
 KEPT_GENS=("${GENS[@]:0:$KEEP}")
 for d in "${GENS[@]:$KEEP}"; do rm -rf "$d"; done
 echo "[retain] generated: total=${#GENS[@]} kept=${#KEPT_GENS[@]}"
+python3 scripts/lib_genindex.py prune >/dev/null 2>&1 || true
 
 # 2) strict keep runs to max KEEP
-mapfile -t RUNS < <(ls -1dt artifacts/runs/run_* 2>/dev/null || true)
+# newest first, from the run catalog (indexed; registers unseen run dirs by name only)
+mapfile -t RUNS < <(python3 scripts/run_catalog.py list --limit 1000000 --format paths 2>/dev/null || ls -1dt artifacts/runs/run_* 2>/dev/null || true)
 
 latest=""
 if [[ -f artifacts/runs/LATEST ]]; then
@@ -40,6 +42,7 @@ add_keep() {
 }
 
 add_keep "$latest"
+add_keep "${RUN_DIR:-}"
 
 # referenced by kept generated dirs
 for gd in "${KEPT_GENS[@]}"; do
@@ -81,6 +84,13 @@ for gd in "${KEPT_GENS[@]}"; do
 done
 
 echo "[retain] runs: total=${#RUNS[@]} deleted=$del kept=${#keep_list[@]}"
+python3 scripts/run_catalog.py prune >/dev/null 2>&1 || true
+
+# 2b) blobs no remaining run manifest references (refcount 0, older than the grace period)
+python3 scripts/lib_blob.py gc || true
+
+# 2c) shared node_modules cache: keep the most recently used dependency sets
+python3 scripts/lib_depcache.py prune --keep "$KEEP" || true
 
 # 3) prune artifacts/tmp
 rm -rf artifacts/tmp/* 2>/dev/null || true
@@ -93,6 +103,9 @@ mapfile -t SAFE_LOGS < <(ls -1dt logs/ask_safe_* 2>/dev/null || true)
 for f in "${SAFE_LOGS[@]:$KEEP}"; do rm -f "$f"; done
 echo "[retain] logs pruned (qa + ask_safe kept=$KEEP)"
 
+# 4b) rotate append logs (size/age) and drop archived segments past LOG_KEEP_DAYS
+python3 scripts/log_rotate.py --keep-days "${LOG_KEEP_DAYS:-30}" || true
+
 # 5) prune backups/script_bak
 mapfile -t BAKS < <(ls -1dt backups/script_bak/* 2>/dev/null || true)
 if (( ${#BAKS[@]} > KEEP )); then
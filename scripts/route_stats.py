@@ -1,61 +1,36 @@
 #!/usr/bin/env python3
-import argparse, datetime as dt, re
-from collections import Counter
-from pathlib import Path
+import argparse
 
-LINE_RE = re.compile(
-    r'^(?P<ts>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z)\s+'
-    r'mode=(?P<mode>\S+)\s+model=(?P<model>\S+)\s+status=(?P<status>\S+)\s+'
-    r'rc=(?P<rc>-?\d+)\s+tokens=(?P<tokens>\S+)\s+ms=(?P<ms>\S+)\s*$'
-)
-
-def parse_ts(s: str) -> dt.datetime:
-    return dt.datetime.strptime(s, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=dt.timezone.utc)
+import lib_logseg
+from lib_analytics import Engine, expand_inputs, window_start
 
 def main():
     ap = argparse.ArgumentParser(description="Stats for ask_history.log: mode/model distribution.")
-    ap.add_argument("--log", default="logs/ask_history.log")
+    ap.add_argument("--log", action="append", default=[], help="log file or glob (repeatable)")
     ap.add_argument("--since-hours", type=float, default=24.0)
+    ap.add_argument("--jobs", type=int, default=0, help="worker processes (0=cpu count, 1=serial)")
     args = ap.parse_args()
 
-    p = Path(args.log)
-    if not p.exists():
-        print(f"ERROR: log not found: {p}")
+    logs = args.log or ["logs/ask_history.log"]
+    if not any(lib_logseg.exists(p) for p in expand_inputs(logs)):
+        print(f"ERROR: log not found: {' '.join(logs)}")
         return 1
 
-    now = dt.datetime.now(dt.timezone.utc)
-    cutoff = now - dt.timedelta(hours=args.since_hours)
-
-    modes = Counter()
-    models = Counter()
-    ok = 0
-    total = 0
-
-    for line in p.read_text(encoding="utf-8", errors="ignore").splitlines():
-        m = LINE_RE.match(line.strip())
-        if not m:
-            continue
-        d = m.groupdict()
-        ts = parse_ts(d["ts"])
-        if ts < cutoff:
-            continue
-        total += 1
-        if d["status"] == "ok" and int(d["rc"]) == 0:
-            ok += 1
-        modes[d["mode"]] += 1
-        models[d["model"]] += 1
+    res = Engine(["totals", "by_mode", "by_model"]).run_many(logs, since=window_start(args.since_hours), jobs=args.jobs)
+    total = res["totals"].to_dict()["n"]
+    ok = res["totals"].to_dict()["ok"]
 
     window = f"last {args.since_hours:g}h (UTC)"
     print(f"== route stats ==  window: {window}")
     print(f"requests: {total}  ok: {ok}  ok%: {(100.0*ok/total):.0f}%" if total else "requests: 0")
 
     print("\nmode distribution:")
-    for k,v in modes.most_common():
-        print(f"  {k:<10} {v}")
+    for k, st in res["by_mode"].to_dict().items():
+        print(f"  {k:<10} {st['n']}")
 
     print("\nmodel distribution:")
-    for k,v in models.most_common():
-        print(f"  {k:<18} {v}")
+    for k, st in res["by_model"].to_dict().items():
+        print(f"  {k:<18} {st['n']}")
 
     return 0
 
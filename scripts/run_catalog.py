@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+
+from lib_runcat import Catalog, open_catalog
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Indexed catalog of artifacts/runs/run_* (SQLite).")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("reindex", help="rebuild the catalog from disk")
+    sub.add_parser("sync", help="add new run dirs, rescan changed ones, drop deleted ones")
+    sub.add_parser("prune", help="drop rows whose run_dir no longer exists")
+    sub.add_parser("facets", help="counts per kind / status")
+
+    up = sub.add_parser("upsert", help="(re)scan one or more run dirs")
+    up.add_argument("--run-dir", action="append", required=True)
+
+    de = sub.add_parser("delete")
+    de.add_argument("--run-id", action="append", required=True)
+
+    ls = sub.add_parser("list")
+    ls.add_argument("--kind", default="")
+    ls.add_argument("--status", default="")
+    ls.add_argument("--limit", type=int, default=50)
+    ls.add_argument("--offset", type=int, default=0)
+    ls.add_argument("--page", type=int, default=0, help="1-based page (uses --limit as page size)")
+    ls.add_argument("--format", default="table", choices=["table", "json", "paths"])
+
+    args = ap.parse_args()
+
+    if args.cmd == "reindex":
+        with Catalog() as cat:
+            n = cat.reindex()
+        print(f"[catalog] reindexed runs={n}")
+        return 0
+
+    with open_catalog(sync=args.cmd in ("list", "facets", "sync")) as cat:
+        if args.cmd == "sync":
+            print(f"[catalog] total={cat.count()}")
+        elif args.cmd == "prune":
+            print(f"[catalog] pruned={cat.prune_missing()}")
+        elif args.cmd == "facets":
+            sys.stdout.write(json.dumps({"total": cat.count(), **cat.facets()}, indent=2) + "\n")
+        elif args.cmd == "upsert":
+            for rd in args.run_dir:
+                row = cat.upsert(rd)
+                print(f"[catalog] upsert {row['run_id']} kind={row['kind']} status={row['status']}")
+        elif args.cmd == "delete":
+            for rid in args.run_id:
+                cat.delete(rid)
+            print(f"[catalog] deleted={len(args.run_id)}")
+        elif args.cmd == "list":
+            offset = (args.page - 1) * args.limit if args.page > 0 else args.offset
+            rows = cat.list(kind=args.kind or None, status=args.status or None,
+                            limit=args.limit, offset=offset)
+            if args.format == "json":
+                sys.stdout.write(json.dumps(rows, ensure_ascii=False, indent=2) + "\n")
+            elif args.format == "paths":
+                for r in rows:
+                    print(r["run_dir"])
+            else:
+                for r in rows:
+                    print(f"{r['start']}  {r['kind']:<16} {r['status']:<8} {r['run_id']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
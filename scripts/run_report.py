@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Where does a run's wall-clock time go?
+
+Builds one timeline per run and reports:
+  - critical path (the chain of steps that actually determined wall time)
+  - self time per step kind: http wait, validation, scaffold, npm install,
+    next build, pip install, policy decide, other
+  - retries overhead (failed attempts / failed http+validate rounds)
+  - folded stacks for flamegraph tools (flamegraph.pl, speedscope, inferno)
+
+Timeline source, best first:
+  1. spans (lib_trace: <run_dir>/spans.jsonl + matching logs/spans.jsonl)
+  2. events.jsonl start/end pairs of the current session, nested by time
+     containment, with attempt details (model, http_status, error_class)
+     merged from policy.trace.json
+
+Usage:
+  run_report.py --run-dir artifacts/runs/run_x      -> report.txt + report.folded in run_dir
+  run_report.py --run-dir ... --stdout             text report only, nothing written
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from lib_run import resolve_run
+from lib_runcat import load_events, session_start_ts
+from lib_trace import load_spans
+
+# first match wins; checked against the span/step name
+CATEGORIES: List[Tuple[str, re.Pattern]] = [
+    ("http", re.compile(r"\.http$|_http$")),
+    ("validation", re.compile(r"\.validate$|_validate$")),
+    ("npm_install", re.compile(r"npm_install|npm_ci")),
+    ("next_build", re.compile(r"next_build|npm_build")),
+    ("pip_install", re.compile(r"pip_install")),
+    ("scaffold", re.compile(r"^scaffold|apply_plan")),
+    ("policy_decide", re.compile(r"decide")),
+    # whatever an attempt / verify step spends outside its instrumented children
+    ("plan_attempt", re.compile(r"(?:^|[._])attempt(?:_\d+)?$")),
+    ("verify_other", re.compile(r"^verify")),
+]
+ATTEMPT_RE = re.compile(r"(?:^|[._])attempt(?:_(\d+))?$")
+
+
+def category(name: str) -> str:
+    for cat, rx in CATEGORIES:
+        if rx.search(name):
+            return cat
+    return "other"
+
+
+class Node:
+    __slots__ = ("name", "start", "end", "ok", "attrs", "children", "parent")
+
+    def __init__(self, name: str, start: float, end: float, ok: bool = True,
+                 attrs: Optional[Dict[str, Any]] = None) -> None:
+        self.name = name
+        self.start = start          # ms
+        self.end = max(end, start)  # ms
+        self.ok = ok
+        self.attrs = attrs or {}
+        self.children: List["Node"] = []
+        self.parent: Optional["Node"] = None
+
+    @property
+    def dur(self) -> float:
+        return self.end - self.start
+
+    def self_time(self) -> float:
+        """Duration not covered by any child (children may overlap)."""
+        covered = 0.0
+        cur_s = cur_e = None
+        for c in sorted(self.children, key=lambda c: c.start):
+            s, e = max(c.start, self.start), min(c.end, self.end)
+            if e <= s:
+                continue
+            if cur_e is None or s > cur_e:
+                if cur_e is not None:
+                    covered += cur_e - cur_s
+                cur_s, cur_e = s, e
+            else:
+                cur_e = max(cur_e, e)
+        if cur_e is not None:
+            covered += cur_e - cur_s
+        return max(0.0, self.dur - covered)
+
+
+# ---------------- timeline builders ----------------
+
+def from_spans(spans: List[Dict[str, Any]]) -> List[Node]:
+    nodes: Dict[str, Node] = {}
+    for s in spans:
+        start = s["start_ns"] / 1e6
+        end = (s.get("end_ns") or s["start_ns"]) / 1e6
+        nodes[s["span_id"]] = Node(s["name"], start, end, s.get("status") != "error", dict(s.get("attrs") or {}))
+    roots = []
+    for s in spans:
+        n = nodes[s["span_id"]]
+        p = nodes.get(s.get("parent_id") or "")
+        if p is not None:
+            n.parent = p
+            p.children.append(n)
+        else:
+            roots.append(n)
+    return roots
+
+
+def _attempt_details(run_dir: Path) -> Dict[int, Dict[str, Any]]:
+    try:
+        trace = json.loads((run_dir / "policy.trace.json").read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    out = {}
+    for a in trace.get("attempts") or []:
+        if isinstance(a, dict) and isinstance(a.get("attempt"), int):
+            out[a["attempt"]] = {k: a.get(k) for k in ("model", "http_status", "error_class", "returncode")
+                                 if a.get(k) not in (None, "")}
+    return out
+
+
+def from_events(run_dir: Path) -> List[Node]:
+    evs = load_events(run_dir)
+    ss = session_start_ts(evs)
+    if ss is not None:
+        evs = [e for e in evs if e["ts_ms"] >= ss]
+    attempts = _attempt_details(run_dir)
+
+    starts: Dict[str, List[int]] = {}
+    flat: List[Node] = []
+    for e in evs:
+        step = str(e.get("step") or "")
+        if e.get("phase") == "start":
+            starts.setdefault(step, []).append(e["ts_ms"])
+            continue
+        if e.get("phase") != "end":
+            continue
+        end = float(e["ts_ms"])
+        pending = starts.get(step) or []
+        if isinstance(e.get("duration_ms"), (int, float)) and e["duration_ms"] >= 0:
+            start = end - e["duration_ms"]
+            if pending:
+                pending.pop()
+        elif pending:
+            start = float(pending.pop())
+        else:
+            continue
+        attrs = {k: e[k] for k in ("error_class", "message", "rc") if e.get(k) not in (None, "")}
+        m = ATTEMPT_RE.search(step)
+        if m and m.group(1):
+            attrs.update(attempts.get(int(m.group(1)), {}))
+            attrs["attempt"] = int(m.group(1))
+        flat.append(Node(step, start, end, e.get("status") != "fail", attrs))
+
+    # nest by time containment: parent = smallest interval that contains the node
+    flat.sort(key=lambda n: (n.start, -n.dur))
+    roots: List[Node] = []
+    stack: List[Node] = []
+    for n in flat:
+        while stack and not (n.start >= stack[-1].start and n.end <= stack[-1].end):
+            stack.pop()
+        if stack:
+            n.parent = stack[-1]
+            stack[-1].children.append(n)
+        else:
+            roots.append(n)
+        stack.append(n)
+    return roots
+
+
+def build_timeline(run_dir: Path) -> Tuple[Optional[Node], str]:
+    spans = load_spans(run_dir)
+    if spans:
+        roots, source = from_spans(spans), "spans"
+    else:
+        roots, source = from_events(run_dir), "events"
+    if not roots:
+        return None, source
+    top = Node("run", min(r.start for r in roots), max(r.end for r in roots),
+               all(r.ok for r in roots))
+    for r in roots:
+        r.parent = top
+        top.children.append(r)
+    # later make steps join the run's trace under the (already finished) policy root:
+    # lift every node that does not fit inside its parent up to the first ancestor that holds it
+    for n, _ in list(walk(top)):
+        p = n.parent
+        if p is None or (n.start >= p.start - 1e-3 and n.end <= p.end + 1e-3):
+            continue
+        p.children.remove(n)
+        while p.parent is not None and not (n.start >= p.start - 1e-3 and n.end <= p.end + 1e-3):
+            p = p.parent
+        if p is top:
+            top.start, top.end = min(top.start, n.start), max(top.end, n.end)
+        n.parent = p
+        p.children.append(n)
+    if len(top.children) == 1:
+        only = top.children[0]
+        only.parent = None
+        return only, source
+    return top, source
+
+
+# ---------------- analysis ----------------
+
+def critical_path(n: Node) -> List[Node]:
+    """
+    Walk back from the end of n: the child that finished last is on the path;
+    continue from that child's start with the children that finished before it.
+    """
+    chosen = []
+    cursor = n.end
+    for c in sorted(n.children, key=lambda c: c.end, reverse=True):
+        if c.end <= cursor + 1e-6:
+            chosen.append(c)
+            cursor = c.start
+    path = [n]
+    for c in reversed(chosen):  # chronological
+        path.extend(critical_path(c))
+    return path
+
+
+def walk(n: Node, depth: int = 0):
+    yield n, depth
+    for c in sorted(n.children, key=lambda c: c.start):
+        yield from walk(c, depth + 1)
+
+
+def _stack(n: Node) -> List[str]:
+    out = []
+    while n is not None:
+        out.append(n.name.replace(";", "_").replace(" ", "_"))
+        n = n.parent
+    return out[::-1]
+
+
+def folded(root: Node) -> List[str]:
+    """flamegraph.pl input: 'a;b;c <self time in microseconds>'."""
+    acc: Dict[str, int] = {}
+    for n, _ in walk(root):
+        us = int(round(n.self_time() * 1000))
+        if us > 0:
+            k = ";".join(_stack(n))
+            acc[k] = acc.get(k, 0) + us
+    return [f"{k} {v}" for k, v in sorted(acc.items())]
+
+
+def _inside_failed_attempt(n: Node) -> bool:
+    p = n.parent
+    while p is not None:
+        if ATTEMPT_RE.search(p.name) and not p.ok:
+            return True
+        p = p.parent
+    return False
+
+
+def retries_overhead(root: Node) -> Tuple[float, int]:
+    """Failed attempts in full, plus failed http/validate rounds inside attempts that later succeeded."""
+    total, n = 0.0, 0
+    for x, _ in walk(root):
+        if x.ok or x is root:
+            continue
+        if ATTEMPT_RE.search(x.name):
+            total += x.dur
+            n += 1
+        elif category(x.name) in ("http", "validation") and not _inside_failed_attempt(x):
+            total += x.dur
+            n += 1
+    return total, n
+
+
+def by_category(root: Node) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for n, _ in walk(root):
+        cat = category(n.name)
+        out[cat] = out.get(cat, 0.0) + n.self_time()
+    return out
+
+
+def _fmt_ms(ms: float) -> str:
+    return f"{ms / 1000:.2f}s" if ms >= 1000 else f"{ms:.1f}ms"
+
+
+def render(run_dir: Path, root: Node, source: str) -> str:
+    wall = root.dur
+    lines = [f"run: {run_dir}", f"source: {source}", f"wall: {_fmt_ms(wall)}", ""]
+
+    lines.append("critical path:")
+    for n in critical_path(root):
+        extra = " ".join(f"{k}={n.attrs[k]}" for k in ("model", "attempt", "http_status", "error_class")
+                         if n.attrs.get(k) not in (None, ""))
+        mark = "  FAIL" if not n.ok else ""
+        lines.append(f"  +{_fmt_ms(n.start - root.start):>9}  {_fmt_ms(n.dur):>9}  "
+                     f"{'  ' * (len(_stack(n)) - 1)}{n.name}{mark}  {extra}".rstrip())
+    lines.append("")
+
+    lines.append("self time by kind:")
+    cats = by_category(root)
+    for cat, ms in sorted(cats.items(), key=lambda kv: kv[1], reverse=True):
+        pct = 100.0 * ms / wall if wall > 0 else 0.0
+        lines.append(f"  {cat:<14} {_fmt_ms(ms):>9}  {pct:5.1f}%")
+    lines.append("")
+
+    ro, rn = retries_overhead(root)
+    pct = 100.0 * ro / wall if wall > 0 else 0.0
+    lines.append(f"retries overhead: {_fmt_ms(ro)} ({pct:.1f}% of wall) in {rn} failed round(s)")
+    return "\n".join(lines) + "\n"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Critical path + flamegraph (folded stacks) for a run.")
+    ap.add_argument("--run-dir", default="", help="default: $RUN_DIR, else artifacts/runs/LATEST")
+    ap.add_argument("--stdout", action="store_true", help="print the text report only, write nothing")
+    args = ap.parse_args()
+
+    run_dir = resolve_run(args.run_dir)
+    if run_dir is None:
+        print("[report] no run: pass --run-dir or set RUN_DIR")
+        return 2
+    root, source = build_timeline(run_dir)
+    if root is None:
+        print(f"[report] no spans or events for {run_dir}")
+        return 1
+
+    text = render(run_dir, root, source)
+    print(text, end="")
+    if args.stdout:
+        return 0
+
+    (run_dir / "report.txt").write_text(text, encoding="utf-8")
+    (run_dir / "report.folded").write_text("\n".join(folded(root)) + "\n", encoding="utf-8")
+    print(f"[report] wrote {run_dir / 'report.txt'} and {run_dir / 'report.folded'} (folded units: us)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
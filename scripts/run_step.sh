@@ -18,8 +18,11 @@ shift
 REPO_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 LATEST_FILE="${REPO_DIR}/artifacts/runs/LATEST"
 
-read_latest() {
-  if [[ -f "${LATEST_FILE}" ]]; then
+# the step's run: explicit RUN_DIR (lib_run handle), else the LATEST convenience pointer
+read_run_dir() {
+  if [[ -n "${RUN_DIR:-}" ]]; then
+    printf '%s' "${RUN_DIR}"
+  elif [[ -f "${LATEST_FILE}" ]]; then
     cat "${LATEST_FILE}" | tr -d '\r\n'
   else
     echo ""
@@ -50,7 +53,7 @@ infer_kind() {
 KIND="${KIND:-}"
 
 t0_ms="$(date +%s%3N)"
-run_dir_before="$(read_latest)"
+run_dir_before="$(read_run_dir)"
 
 if [[ -z "${KIND}" ]]; then
   KIND="$(infer_kind "${run_dir_before}")"
@@ -64,13 +67,14 @@ python3 "${REPO_DIR}/scripts/event_append.py" \
   --ts-ms "${t0_ms}" >/dev/null 2>&1 || true
 
 set +e
-"$@"
+# the step runs inside a span (joins the run's trace; nested tools inherit TRACEPARENT)
+python3 "${REPO_DIR}/scripts/lib_trace.py" run --name "${STEP}" --run-dir "${run_dir_before}" -- "$@"
 rc=$?
 set -e
 
 t1_ms="$(date +%s%3N)"
 dur_ms=$((t1_ms - t0_ms))
-run_dir_after="$(read_latest)"
+run_dir_after="$(read_run_dir)"
 
 if [[ -z "${KIND}" ]]; then
   KIND="$(infer_kind "${run_dir_after}")"
@@ -18,8 +18,11 @@ shift
 REPO_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 LATEST_FILE="${REPO_DIR}/artifacts/runs/LATEST"
 
-read_latest() {
-  if [[ -f "${LATEST_FILE}" ]]; then
+# the step's run: explicit RUN_DIR (lib_run handle), else the LATEST convenience pointer
+read_run_dir() {
+  if [[ -n "${RUN_DIR:-}" ]]; then
+    printf '%s' "${RUN_DIR}"
+  elif [[ -f "${LATEST_FILE}" ]]; then
     cat "${LATEST_FILE}" | tr -d '\r\n'
   else
     echo ""
@@ -37,7 +40,7 @@ infer_kind() {
 KIND="${KIND:-}"
 
 t0_ms="$(date +%s%3N)"
-run_dir_before="$(read_latest)"
+run_dir_before="$(read_run_dir)"
 if [[ -z "${KIND}" ]]; then KIND="$(infer_kind "${run_dir_before}")"; fi
 
 python3 "${REPO_DIR}/scripts/event_append.py" \
@@ -50,13 +53,15 @@ python3 "${REPO_DIR}/scripts/event_append.py" \
 # run command, tee output to step log
 set +e
 tlog="/tmp/step_${STEP}_$$.log"
-"$@" > >(tee "${tlog}") 2> >(tee -a "${tlog}" >&2)
+# the step runs inside a span (joins the run's trace; nested tools inherit TRACEPARENT)
+python3 "${REPO_DIR}/scripts/lib_trace.py" run --name "${STEP}" --run-dir "${run_dir_before}" -- "$@" \
+  > >(tee "${tlog}") 2> >(tee -a "${tlog}" >&2)
 rc=$?
 set -e
 
 t1_ms="$(date +%s%3N)"
 dur_ms=$((t1_ms - t0_ms))
-run_dir_after="$(read_latest)"
+run_dir_after="$(read_run_dir)"
 if [[ -z "${KIND}" ]]; then KIND="$(infer_kind "${run_dir_after}")"; fi
 
 # choose where to store log
@@ -1,49 +1,34 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import csv, json, time
+import csv
+import time
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any
+
+from lib_runcat import open_catalog
 
 ROOT = Path(__file__).resolve().parent.parent
 RUNS_ROOT = ROOT / "artifacts" / "runs"
 OUT = RUNS_ROOT / "runs_summary_v3.csv"
 
-def read_json(p: Path) -> Optional[dict[str, Any]]:
-    try:
-        return json.loads(p.read_text(encoding="utf-8"))
-    except Exception:
-        return None
-
-def iso_from_mtime(p: Path) -> str:
-    # local time + offset
-    t = time.localtime(p.stat().st_mtime)
-    return time.strftime("%Y-%m-%dT%H:%M:%S%z", t)
-
 def main() -> int:
     RUNS_ROOT.mkdir(parents=True, exist_ok=True)
     rows: list[dict[str, Any]] = []
 
-    for d in sorted(RUNS_ROOT.glob("run_*"), key=lambda x: x.stat().st_mtime, reverse=True):
-        if not d.is_dir():
-            continue
-        run_id = d.name
-        meta = read_json(d / "meta.run.json") or {}
-        kind = meta.get("kind") or ("web_smoke" if "web_smoke" in run_id else "unknown")
-        status = meta.get("status") or "unknown"
-        start = meta.get("ts") or meta.get("ts_utc") or meta.get("ts_iso") or iso_from_mtime(d)
-        duration_s = meta.get("duration_s") or ""
-        plan_hash = meta.get("plan_hash") or ""
-        gen_dir = meta.get("gen_dir") or ""
-        rows.append({
-            "run_id": run_id,
-            "run_dir": str(d),
-            "kind": kind,
-            "status": status,
-            "start": start,
-            "duration_s": duration_s,
-            "plan_hash": plan_hash,
-            "gen_dir": gen_dir,
-        })
+    # same order and start / status as the pre-catalog scan: newest dir mtime first,
+    # start = meta ts / ts_utc / ts_iso as written, else the dir mtime (local time + offset)
+    with open_catalog() as cat:
+        for r in cat.list(limit=cat.count() or 1, order="mtime"):
+            rows.append({
+                "run_id": r["run_id"],
+                "run_dir": r["run_dir"],
+                "kind": r["kind"],
+                "status": r["meta_status"] or "unknown",
+                "start": r["meta_ts"] or time.strftime("%Y-%m-%dT%H:%M:%S%z", time.localtime(r["dir_mtime"] or 0)),
+                "duration_s": "" if r["duration_ms"] is None else round(r["duration_ms"] / 1000, 3),
+                "plan_hash": r["plan_hash"] or "",
+                "gen_dir": r["gen_dir"] or "",
+            })
 
     with OUT.open("w", newline="", encoding="utf-8") as f:
         w = csv.DictWriter(f, fieldnames=["run_id","run_dir","kind","status","start","duration_s","plan_hash","gen_dir"])
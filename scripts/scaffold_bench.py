@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Materialization cost per generated project (lib_gensync.sync_tree).
+
+Synthetic python-cli plans of growing size are written into fresh temp dirs:
+  - legacy      resolve() + mkdir(parents) + write_text per file (the old scaffold loop)
+  - sequential  sync_tree(workers=1): one-pass path check, dirs created once, atomic writes
+  - pool        sync_tree(workers=--workers): the opt-in thread pool
+  - pool+direct the same, new files written without temp file + rename
+  - resync      sync_tree again on the unchanged tree (nothing written)
+
+Usage:
+  scaffold_bench.py                       10 / 100 / 1000 files
+  scaffold_bench.py --files 1000 5000 --content-chars 4000 --workers 16
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import lib_gensync
+
+
+def plan_files(n_files: int, content_chars: int, per_dir: int = 20) -> Dict[str, str]:
+    files = {"pyproject.toml": "[project]\nname = 'bench'\n"}
+    body = ("x = 1\n" * (content_chars // 6)) or "x"
+    for i in range(max(1, n_files - 1)):
+        files[f"src/bench/pkg_{i // per_dir}/mod_{i}.py"] = f"# {i}\n" + body
+    return files
+
+
+def legacy_write(target: Path, files: Dict[str, str]) -> None:
+    base = target.resolve()
+    for rel, content in files.items():
+        p = (base / rel).resolve()
+        if not str(p).startswith(str(base) + "/"):
+            raise ValueError(rel)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(content, encoding="utf-8")
+
+
+def best_ms(setup: Callable[[], Path], fn: Callable[[Path], None], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        target = setup()
+        t0 = time.perf_counter()
+        fn(target)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Materialization cost per generated project (lib_gensync).")
+    ap.add_argument("--files", type=int, nargs="+", default=[10, 100, 1000], help="files per synthetic plan")
+    ap.add_argument("--content-chars", type=int, default=2000, help="chars per file")
+    ap.add_argument("--workers", type=int, default=min(32, (os.cpu_count() or 1) + 4),
+                    help="pool size for the pool modes (default: ThreadPoolExecutor's)")
+    ap.add_argument("--repeat", type=int, default=3, help="best of N fresh targets")
+    ap.add_argument("--tmp", default=None, help="parent dir for the targets (default: system temp)")
+    args = ap.parse_args()
+
+    root = Path(tempfile.mkdtemp(prefix="scaffold_bench_", dir=args.tmp))
+    counter = [0]
+
+    def fresh() -> Path:
+        counter[0] += 1
+        return root / f"t{counter[0]}"
+
+    modes: List[tuple] = [
+        ("legacy", lambda t, f: (t.mkdir(), legacy_write(t, f))),
+        ("sequential", lambda t, f: lib_gensync.sync_tree(t, f, {}, workers=1)),
+        ("pool", lambda t, f: lib_gensync.sync_tree(t, f, {}, workers=args.workers)),
+        ("pool+direct", lambda t, f: lib_gensync.sync_tree(t, f, {}, workers=args.workers, direct=True)),
+    ]
+    lines = [f"workers={args.workers} (pool used from {lib_gensync.PARALLEL_MIN} files), "
+             f"{args.content_chars} chars/file, best of {args.repeat}",
+             f"  {'files':>6} " + " ".join(f"{m[0]:>12}" for m in modes) + f" {'resync':>12}"]
+    try:
+        for n in args.files:
+            files = plan_files(n, args.content_chars)
+            row = f"  {len(files):>6} "
+            for _, fn in modes:
+                row += f" {best_ms(fresh, lambda t: fn(t, files), args.repeat):>10.1f}ms"
+            synced = fresh()
+            lib_gensync.sync_tree(synced, files, {})
+            row += f" {best_ms(lambda: synced, lambda t: lib_gensync.sync_tree(t, files, {}), args.repeat):>10.1f}ms"
+            lines.append(row)
+            shutil.rmtree(root)
+            root.mkdir()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    print("\n".join(lines))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
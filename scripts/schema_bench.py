@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Validation cost per plan for the compiled schema validators (lib_schema).
+
+Measures, for plan.schema.json and plan_web.schema.json:
+  - compile: schema file -> python function (paid once per process)
+  - cached load_validator() lookup (what every later validation pays)
+  - validate(plan) for valid and invalid plans of growing size
+  - the same plans with jsonschema, when it happens to be installed
+
+Usage:
+  schema_bench.py                 default sizes
+  schema_bench.py --files 2 10 50 --repeat 2000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import lib_schema
+
+try:
+    import jsonschema  # optional, only for comparison
+except ImportError:  # pragma: no cover
+    jsonschema = None  # type: ignore[assignment]
+
+ROOT = Path(__file__).resolve().parents[1]
+SCHEMAS = ROOT / "apps" / "router-demo" / "schemas"
+
+
+def plan_doc(n_files: int, content_chars: int, valid: bool = True) -> Dict[str, Any]:
+    files = [{"path": "pyproject.toml", "content": "[project]\nname = 'bench'\n"}]
+    files += [{"path": f"src/bench/mod_{i}.py", "content": ("x = 1\n" * (content_chars // 6)) or "x"}
+              for i in range(max(1, n_files - 1))]
+    doc: Dict[str, Any] = {"schema_version": 1, "name": "bench-plan", "type": "python-cli",
+                           "description": "benchmark plan", "files": files,
+                           "run": {"commands": ["pip install -e .", "python -m bench"]}}
+    if not valid:
+        doc["name"] = "Bench"
+        files[-1]["path"] = "../escape.py"
+        doc["run"]["commands"].append(" ")
+    return doc
+
+
+def plan_web_doc(n_pages: int, valid: bool = True) -> Dict[str, Any]:
+    pages = [{"route": "/" if i == 0 else f"/page-{i}", "title": f"Page {i}",
+              "sections": ["Hero", "Features", "CTA"]} for i in range(n_pages)]
+    doc: Dict[str, Any] = {"project_type": "nextjs_site", "name": "bench-site", "app_title": "Bench",
+                           "tagline": "Benchmark site.", "pages": pages}
+    if not valid:
+        doc["name"] = "Bench Site"
+        pages[-1]["route"] = "/Nested/Route"
+    return doc
+
+
+def per_call_us(fn: Callable[[], Any], repeat: int) -> float:
+    fn()
+    best = float("inf")
+    for _ in range(3):
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        best = min(best, (time.perf_counter() - t0) / repeat)
+    return best * 1e6
+
+
+def bench_schema(path: Path, docs: List[tuple], repeat: int) -> List[str]:
+    schema = json.loads(path.read_text(encoding="utf-8"))
+    t0 = time.perf_counter()
+    validate = lib_schema.compile_schema(schema, filename=path.name)
+    compile_ms = (time.perf_counter() - t0) * 1000
+    lib_schema.load_validator(path)
+    cached_us = per_call_us(lambda: lib_schema.load_validator(path), repeat)
+
+    js: Optional[Any] = None
+    if jsonschema is not None:
+        try:
+            js = jsonschema.Draft202012Validator(schema)
+        except Exception:
+            js = None
+
+    lines = [f"{path.name}: compile {compile_ms:.2f}ms, cached load_validator {cached_us:.1f}us",
+             f"  {'plan':<28} {'bytes':>9} {'errors':>6} {'compiled':>11}" + (f" {'jsonschema':>11}" if js else "")]
+    for label, doc in docs:
+        size = len(json.dumps(doc))
+        errs = validate(doc)
+        us = per_call_us(lambda: validate(doc), repeat)
+        row = f"  {label:<28} {size:>9} {len(errs):>6} {us:>9.1f}us"
+        if js is not None:
+            jus = per_call_us(lambda: list(js.iter_errors(doc)), max(1, repeat // 10))
+            row += f" {jus:>9.1f}us"
+        lines.append(row)
+    return lines
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Validation cost per plan (compiled schema validators).")
+    ap.add_argument("--files", type=int, nargs="+", default=[2, 10, 50], help="files per python-cli plan")
+    ap.add_argument("--content-chars", type=int, default=20000, help="chars per file (schema max: 20000)")
+    ap.add_argument("--pages", type=int, nargs="+", default=[1, 6, 12], help="pages per web plan")
+    ap.add_argument("--repeat", type=int, default=1000)
+    args = ap.parse_args()
+
+    plan_docs = []
+    for n in args.files:
+        plan_docs.append((f"{n} files, valid", plan_doc(n, args.content_chars)))
+        plan_docs.append((f"{n} files, invalid", plan_doc(n, args.content_chars, valid=False)))
+    web_docs = []
+    for n in args.pages:
+        web_docs.append((f"{n} pages, valid", plan_web_doc(n)))
+        web_docs.append((f"{n} pages, invalid", plan_web_doc(n, valid=False)))
+
+    out = bench_schema(SCHEMAS / "plan.schema.json", plan_docs, args.repeat)
+    out += [""] + bench_schema(SCHEMAS / "plan_web.schema.json", web_docs, args.repeat)
+    if jsonschema is None:
+        out += ["", "(jsonschema not installed: no comparison column)"]
+    print("\n".join(out))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Export a run's spans (lib_trace) as OTLP-JSON.
+
+  trace_export.py --run-dir artifacts/runs/run_x            -> <run_dir>/trace.otlp.json
+  trace_export.py --run-dir ... --out /tmp/t.json
+  trace_export.py --run-dir ... --tree                       indented span tree with durations
+
+The file follows the OTLP/JSON ExportTraceServiceRequest shape
+(resourceSpans -> scopeSpans -> spans), so it can be posted to any
+collector's /v1/traces or opened in trace viewers that read OTLP.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, List
+
+from lib_run import resolve_run
+from lib_trace import load_spans
+
+SERVICE_NAME = "llm-router"
+SCOPE_NAME = "llm-router.pipeline"
+SPAN_KIND_INTERNAL = 1
+STATUS_OK, STATUS_ERROR = 1, 2
+
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}  # int64 is a string in OTLP/JSON
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    if isinstance(v, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(x) for x in v]}}
+    return {"stringValue": str(v)}
+
+
+def _attrs(d: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in sorted(d.items()) if v is not None]
+
+
+def to_otlp(spans: List[Dict[str, Any]], run_dir: str) -> Dict[str, Any]:
+    out = []
+    for s in spans:
+        attrs = dict(s.get("attrs") or {})
+        if s.get("run_dir"):
+            attrs.setdefault("run_dir", s["run_dir"])
+        o: Dict[str, Any] = {
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "name": s["name"],
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s.get("end_ns") or s["start_ns"]),
+            "attributes": _attrs(attrs),
+            "status": {"code": STATUS_ERROR if s.get("status") == "error" else STATUS_OK},
+        }
+        if s.get("parent_id"):
+            o["parentSpanId"] = s["parent_id"]
+        if s.get("status") == "error" and attrs.get("message"):
+            o["status"]["message"] = str(attrs["message"])
+        out.append(o)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _attrs({"service.name": SERVICE_NAME, "run.dir": run_dir})},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": out}],
+        }]
+    }
+
+
+def print_tree(spans: List[Dict[str, Any]]) -> None:
+    by_parent: Dict[str, List[Dict[str, Any]]] = {}
+    ids = {s["span_id"] for s in spans}
+    for s in spans:
+        p = s.get("parent_id") or ""
+        by_parent.setdefault(p if p in ids else "", []).append(s)
+
+    def walk(parent: str, depth: int) -> None:
+        for s in sorted(by_parent.get(parent, []), key=lambda x: x["start_ns"]):
+            dur = ((s.get("end_ns") or s["start_ns"]) - s["start_ns"]) / 1e6
+            extra = " ".join(f"{k}={v}" for k, v in sorted((s.get("attrs") or {}).items())
+                             if k in ("model", "attempt", "http_status", "error_class", "rc"))
+            mark = " !" if s.get("status") == "error" else ""
+            print(f"{'  ' * depth}{s['name']:<{max(1, 36 - 2 * depth)}} {dur:>10.1f} ms{mark}  {extra}".rstrip())
+            walk(s["span_id"], depth + 1)
+
+    walk("", 0)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Export a run's spans as OTLP-JSON.")
+    ap.add_argument("--run-dir", default="", help="default: $RUN_DIR, else artifacts/runs/LATEST")
+    ap.add_argument("--out", default="", help="default: <run_dir>/trace.otlp.json")
+    ap.add_argument("--tree", action="store_true", help="print the span tree instead of writing OTLP")
+    args = ap.parse_args()
+
+    run_dir = resolve_run(args.run_dir)
+    if run_dir is None:
+        print("[trace] no run: pass --run-dir or set RUN_DIR")
+        return 2
+    spans = load_spans(run_dir)
+    if not spans:
+        print(f"[trace] no spans for {run_dir}")
+        return 1
+    if args.tree:
+        print_tree(spans)
+        return 0
+
+    out = Path(args.out) if args.out else run_dir / "trace.otlp.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(to_otlp(spans, str(run_dir)), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    print(f"[trace] wrote {out} spans={len(spans)} traces={len({s['trace_id'] for s in spans})}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
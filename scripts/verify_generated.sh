@@ -15,21 +15,20 @@ PYY
 run_dir="$ROOT/artifacts/runs/run_generated_smoke_${stamp}_${rand}"
 mkdir -p "$run_dir"
 
-latest_run=""
-if [[ -f "$ROOT/artifacts/runs/LATEST" ]]; then
+# the plan run being verified: RUN_DIR (explicit handle), else LATEST
+latest_run="${RUN_DIR:-}"
+if [[ -z "$latest_run" && -f "$ROOT/artifacts/runs/LATEST" ]]; then
   latest_run="$(cat "$ROOT/artifacts/runs/LATEST" | tr -d '\r\n' || true)"
 fi
 
 gen_dir="${GEN_DIR:-}"
 
 # 1) GEN_DIR env
-# 2) match by .generated_from_run == LATEST
-# 3) newest under apps/generated
+# 2) generated-project index: RUN_DIR / LATEST -> gen dir (recorded by scaffold.py)
+# 3) newest under apps/generated (LATEST only: an explicit RUN_DIR must not verify another job's dir)
 if [[ -z "$gen_dir" && -n "$latest_run" ]]; then
-  match="$(grep -Rsl --fixed-strings "$latest_run" "$ROOT/apps/generated"/*/.generated_from_run 2>/dev/null | head -n 1 || true)"
-  if [[ -n "$match" ]]; then
-    gen_dir="$(dirname "$match")"
-  fi
+  gen_dir="$(python3 "$ROOT/scripts/lib_genindex.py" lookup --run-dir "$latest_run" 2>/dev/null || true)"
+  [[ -n "$gen_dir" || -z "${RUN_DIR:-}" ]] || die "no generated dir recorded for RUN_DIR=$RUN_DIR (scaffold it first, or set GEN_DIR)"
 fi
 
 if [[ -z "$gen_dir" ]]; then
@@ -38,6 +37,12 @@ fi
 
 [[ -n "$gen_dir" ]] || die "cannot resolve gen_dir. Set GEN_DIR=/abs/path/to/apps/generated/<name>"
 
+# the smoke run joins the trace of the plan run it verifies
+if [[ -n "$latest_run" && -f "$latest_run/trace.json" ]]; then
+  cp -f "$latest_run/trace.json" "$run_dir/trace.json" 2>/dev/null || true
+fi
+span() { python3 "$ROOT/scripts/lib_trace.py" run --run-dir "$run_dir" --name "$@"; }
+
 echo "[verify] run_dir=$run_dir"
 echo "[verify] gen_dir=$gen_dir"
 echo "[verify] ts=$(date -Iseconds)" | tee "$run_dir/verify.log"
@@ -108,7 +113,7 @@ source .venv_verify/bin/activate
 python -m pip install -U pip >/dev/null
 
 # Editable install + basic smoke
-python -m pip install -e . | tee -a "$run_dir/verify.log"
+span verify.pip_install -- python -m pip install -e . | tee -a "$run_dir/verify.log"
 
 # Try CLI help if console script exists
 if [[ -n "${PKG_NAME:-}" ]]; then
@@ -128,3 +133,4 @@ else:
 PYY
 
 echo "[ok] generated project smoke test passed" | tee -a "$run_dir/verify.log"
+python3 "$ROOT/scripts/run_catalog.py" upsert --run-dir "$run_dir" >/dev/null 2>&1 || true
@@ -80,29 +80,34 @@ fi
 
 # Resolve gen_dir:
 # 1) GEN_DIR env
-# 2) apps/generated/*/.generated_from_run matches run_dir
-# 3) apps/generated/*__{plan_hash} if plan_hash exists
+# 2) generated-project index: run_dir -> gen dir (recorded by scaffold_web.py)
+# 3) generated-project index: plan_hash -> gen dir, if plan_hash exists
 # 4) apps/generated/websmoke__* newest
 # 5) newest in apps/generated
+# 4) and 5) only when run_dir came from LATEST: with an explicit RUN_DIR a miss is an error,
+# a concurrent job's newer dir must not be verified in its place
 gen_dir="${GEN_DIR:-}"
 
 if [[ -z "$gen_dir" ]]; then
-  # 2) match by .generated_from_run
-  match="$(grep -Rsl --fixed-strings "$run_dir" "$ROOT/apps/generated"/*/.generated_from_run 2>/dev/null | head -n 1 || true)"
-  if [[ -n "$match" ]]; then
-    gen_dir="$(dirname "$match")"
-    echo "[info] gen_dir matched by .generated_from_run: ${gen_dir#$ROOT/}"
+  # 2) indexed lookup by run
+  gen_dir="$(python3 "$ROOT/scripts/lib_genindex.py" lookup --run-dir "$run_dir" 2>/dev/null || true)"
+  if [[ -n "$gen_dir" ]]; then
+    echo "[info] gen_dir matched by run_dir (index): ${gen_dir#$ROOT/}"
   fi
 fi
 
 if [[ -z "$gen_dir" && -n "$plan_hash" ]]; then
-  hit="$(ls -1d "$ROOT/apps/generated/"*__"$plan_hash" 2>/dev/null | head -n 1 || true)"
+  hit="$(python3 "$ROOT/scripts/lib_genindex.py" lookup --plan-hash "$plan_hash" 2>/dev/null || true)"
   if [[ -n "$hit" ]]; then
     gen_dir="$hit"
-    echo "[info] gen_dir matched by plan_hash: ${gen_dir#$ROOT/}"
+    echo "[info] gen_dir matched by plan_hash (index): ${gen_dir#$ROOT/}"
   fi
 fi
 
+if [[ -z "$gen_dir" && -n "${RUN_DIR:-}" ]]; then
+  die "no generated dir recorded for RUN_DIR=$RUN_DIR (scaffold it first, or set GEN_DIR)"
+fi
+
 if [[ -z "$gen_dir" ]]; then
   hit="$(ls -1dt "$ROOT/apps/generated/websmoke__"* 2>/dev/null | head -n 1 || true)"
   if [[ -n "$hit" ]]; then
@@ -149,17 +154,24 @@ fi
 log="$run_dir/verify.log"
 summary="$run_dir/verify_summary.json"
 
+span() { python3 "$ROOT/scripts/lib_trace.py" run --run-dir "$run_dir" --name "$@"; }
+
+# dependencies: shared node_modules cache keyed by deps + lockfile (DEPCACHE=0: plain npm per site)
 (
   cd "$gen_dir"
-  if [[ -f package-lock.json ]]; then
+  if [[ "${DEPCACHE:-1}" != "0" ]]; then
+    echo "[run] depcache install"
+    span verify.npm_install --attr tool=depcache -- \
+      python3 "$ROOT/scripts/lib_depcache.py" install "$gen_dir" --report "$run_dir/depcache.json"
+  elif [[ -f package-lock.json ]]; then
     echo "[run] npm ci"
-    npm ci
+    span verify.npm_install --attr tool=npm_ci -- npm ci
   else
     echo "[run] npm install"
-    npm install
+    span verify.npm_install --attr tool=npm_install -- npm install
   fi
   echo "[run] npm run build"
-  npm run build
+  span verify.next_build -- npm run build
 ) | tee "$log"
 
 # If plan_hash still empty, try derive from folder name suffix: name__hash
@@ -183,3 +195,4 @@ open(sys.argv[1], "w", encoding="utf-8").write(json.dumps(out, indent=2) + "\n")
 PY
 
 echo "[ok] web build passed"
+python3 "$ROOT/scripts/run_catalog.py" upsert --run-dir "$run_dir" >/dev/null 2>&1 || true
@@ -4,7 +4,7 @@ set -euo pipefail
 REPO_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 LATEST_FILE="${REPO_DIR}/artifacts/runs/LATEST"
 
-target="${1:-}"
+target="${1:-${RUN_DIR:-}}"
 if [[ -z "${target}" ]]; then
   if [[ -f "${LATEST_FILE}" ]]; then
     target="$(cat "${LATEST_FILE}" | tr -d '\r\n')"
@@ -21,20 +21,8 @@ if [[ ! -f "${target}/plan.web.json" ]]; then
   exit 2
 fi
 
-old_latest=""
-if [[ -f "${LATEST_FILE}" ]]; then
-  old_latest="$(cat "${LATEST_FILE}" | tr -d '\r\n')"
-fi
-
-restore_latest() {
-  if [[ -n "${old_latest}" ]]; then
-    echo "${old_latest}" > "${LATEST_FILE}"
-  fi
-}
-trap restore_latest EXIT
-
-echo "${target}" > "${LATEST_FILE}"
-
+# every step gets the run explicitly; LATEST is left alone
+export RUN_DIR="${target}"
 export KIND="plan_web"
 
 echo "[web_replay] run_dir=${target}"
@@ -6,8 +6,9 @@ cd "$ROOT" || exit 1
 
 source "$ROOT/scripts/load_node.sh" || true
 
-RUN="artifacts/runs/run_web_smoke_$(date +%Y%m%d_%H%M%S)"
-mkdir -p "$RUN"
+# explicit run handle for every step below; LATEST is only updated for convenience
+RUN="$(python3 scripts/lib_run.py create --prefix run_web_smoke)"
+export RUN_DIR="$RUN"
 
 cat > "$RUN/plan.web.json" <<'JSON'
 {
@@ -22,7 +23,7 @@ cat > "$RUN/plan.web.json" <<'JSON'
 }
 JSON
 
-echo "$(pwd)/$RUN" > artifacts/runs/LATEST
+python3 scripts/lib_run.py set-latest "$RUN"
 
-python3 apps/router-demo/scaffold_web.py
+python3 apps/router-demo/scaffold_web.py --run-dir "$RUN"
 ./scripts/verify_generated_web.sh
@@ -7,9 +7,12 @@ import subprocess
 from datetime import datetime, timezone
 from pathlib import Path
 
+from lib_append import append_line
+from lib_run import resolve_run
+from lib_runcat import upsert_quiet
+
 ROOT = Path(__file__).resolve().parents[1]
 RUNS_DIR = ROOT / "artifacts" / "runs"
-LATEST = RUNS_DIR / "LATEST"
 EVENTS = ROOT / "logs" / "events.jsonl"
 
 def now_utc_iso() -> str:
@@ -100,17 +103,14 @@ def verify_status(run_dir: Path) -> str:
 
 def main() -> int:
     ap = argparse.ArgumentParser()
-    ap.add_argument("--run-dir", default="")
+    ap.add_argument("--run-dir", default="", help="default: $RUN_DIR, else artifacts/runs/LATEST")
     ap.add_argument("--append-events", action="store_true")
     args = ap.parse_args()
 
-    if args.run_dir:
-        run_dir = Path(args.run_dir)
-    else:
-        if not LATEST.exists():
-            print("[meta] Missing artifacts/runs/LATEST")
-            return 2
-        run_dir = Path(LATEST.read_text(encoding="utf-8").strip())
+    run_dir = resolve_run(args.run_dir, RUNS_DIR)
+    if run_dir is None:
+        print("[meta] no run: pass --run-dir, set RUN_DIR or create artifacts/runs/LATEST")
+        return 2
 
     if not run_dir.exists():
         print(f"[meta] run_dir not found: {run_dir}")
@@ -176,8 +176,9 @@ def main() -> int:
     meta_path.write_text(json.dumps(meta, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
 
     if args.append_events:
-        EVENTS.parent.mkdir(parents=True, exist_ok=True)
-        EVENTS.open("a", encoding="utf-8").write(json.dumps(meta, ensure_ascii=False) + "\n")
+        append_line(EVENTS, json.dumps(meta, ensure_ascii=False))
+
+    upsert_quiet([run_dir])
 
     print(f"[meta] OK run_dir={run_dir} status={status} kind={kind}")
     return 0